@@ -75,6 +75,10 @@
 #elif defined __MEASUREMENT__CACHE
   #define MEASURE_CACHE
 #endif
+
+#ifdef __UART_PROTOCOL__BINARY
+  #define UART_BINARY_FRAMES
+#endif
   
 #endif // CONFIG_H
 
@@ -0,0 +1,31 @@
+#ifndef _UART_FRAME_H
+#define _UART_FRAME_H
+
+#include <stdint.h>
+
+// Binary measurement protocol (enabled by UART_PROTOCOL=binary in
+// Makefile.config). Frames are decoded by plumber/classification/uart_frames.py:
+//
+//   magic    4 bytes  "\0PLB"
+//   type     u8       UART_FRAME_TYPE_CACHE or UART_FRAME_TYPE_INT
+//   length   u32      length of the payload
+//   payload  length bytes
+//   checksum u32      Adler-32 of type, length and payload
+//
+// All integers are little endian.
+
+#define UART_FRAME_TYPE_CACHE (1)
+#define UART_FRAME_TYPE_INT   (2)
+
+// size of one cache line entry of a cache frame: set u16, tag u32
+#define UART_FRAME_CACHE_LINE_SIZE (6)
+
+// cache frame: level u8, count u32, count * (set u16, tag u32)
+void uart_frame_cache_begin(uint8_t level, uint32_t count);
+void uart_frame_cache_line(uint16_t set, uint32_t tag);
+void uart_frame_end();
+
+// int frame: name length u8, name, value u64
+void uart_frame_int(const char* name, uint64_t value);
+
+#endif
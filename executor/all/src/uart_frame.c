@@ -0,0 +1,82 @@
+#include "config.h"
+
+#ifdef UART_BINARY_FRAMES
+
+#include <stdint.h>
+#include "uart.h"
+#include "uart_frame.h"
+
+#define ADLER32_MOD (65521)
+
+// running Adler-32 checksum of the current frame
+static uint32_t frame_adler_a;
+static uint32_t frame_adler_b;
+
+static void frame_putchar(uint8_t c) {
+  frame_adler_a = (frame_adler_a + c) % ADLER32_MOD;
+  frame_adler_b = (frame_adler_b + frame_adler_a) % ADLER32_MOD;
+  uart_putchar((char)c);
+}
+
+static void frame_put_u16(uint16_t value) {
+  frame_putchar(value & 0xff);
+  frame_putchar((value >> 8) & 0xff);
+}
+
+static void frame_put_u32(uint32_t value) {
+  for (int i = 0; i < 4; i++) {
+    frame_putchar((value >> (8 * i)) & 0xff);
+  }
+}
+
+static void frame_put_u64(uint64_t value) {
+  for (int i = 0; i < 8; i++) {
+    frame_putchar((value >> (8 * i)) & 0xff);
+  }
+}
+
+static void frame_begin(uint8_t type, uint32_t length) {
+  // the magic is not part of the checksum
+  uart_putchar('\0');
+  uart_putchar('P');
+  uart_putchar('L');
+  uart_putchar('B');
+  frame_adler_a = 1;
+  frame_adler_b = 0;
+  frame_putchar(type);
+  frame_put_u32(length);
+}
+
+void uart_frame_end() {
+  uint32_t checksum = (frame_adler_b << 16) | frame_adler_a;
+  for (int i = 0; i < 4; i++) {
+    uart_putchar((char)((checksum >> (8 * i)) & 0xff));
+  }
+}
+
+void uart_frame_cache_begin(uint8_t level, uint32_t count) {
+  frame_begin(UART_FRAME_TYPE_CACHE, 1 + 4 + count * UART_FRAME_CACHE_LINE_SIZE);
+  frame_putchar(level);
+  frame_put_u32(count);
+}
+
+void uart_frame_cache_line(uint16_t set, uint32_t tag) {
+  frame_put_u16(set);
+  frame_put_u32(tag);
+}
+
+void uart_frame_int(const char* name, uint64_t value) {
+  uint8_t name_length = 0;
+  while (name[name_length] != '\0') {
+    name_length++;
+  }
+  frame_begin(UART_FRAME_TYPE_INT, 1 + name_length + 8);
+  frame_putchar(name_length);
+  for (uint8_t i = 0; i < name_length; i++) {
+    frame_putchar((uint8_t)name[i]);
+  }
+  frame_put_u64(value);
+  uart_frame_end();
+}
+
+#endif // UART_BINARY_FRAMES
@@ -1,5 +1,7 @@
+#include "config.h"
 #include "cache.h"
 #include "lib/printf.h"
+#include "uart_frame.h"
 
 #define BARRIER_DSB_ISB() __asm__ __volatile__("DSB SY \t\n ISB \t\n")
 
@@ -368,6 +370,24 @@ void print_cache_full(cache_state c) {
 }
 
 void print_cache_valid(cache_state c) {
+#ifdef UART_BINARY_FRAMES
+  uint32_t count = 0;
+  for (uint64_t set=0; set<SETS; set++) {
+    for (uint64_t way=0; way<WAYS; way++) {
+      count += c[set][way].valid ? 1 : 0;
+    }
+  }
+  uart_frame_cache_begin(1, count);
+  for (uint64_t set=0; set<SETS; set++) {
+    for (uint64_t way=0; way<WAYS; way++) {
+      if (c[set][way].valid) {
+        uart_frame_cache_line(set, c[set][way].tag);
+      }
+    }
+  }
+  uart_frame_end();
+  return;
+#endif
   printf("----\n");
   printf("print_cache_valid\n");
   printf("L1 output\n");
@@ -384,6 +404,24 @@ void print_cache_valid(cache_state c) {
 }
 
 void print_cache_l2_valid(cache_l2_state c) {
+#ifdef UART_BINARY_FRAMES
+  uint32_t count = 0;
+  for (uint64_t set=0; set<SETS_L2; set++) {
+    for (uint64_t way=0; way<WAYS_L2; way++) {
+      count += c[set][way].valid ? 1 : 0;
+    }
+  }
+  uart_frame_cache_begin(2, count);
+  for (uint64_t set=0; set<SETS_L2; set++) {
+    for (uint64_t way=0; way<WAYS_L2; way++) {
+      if (c[set][way].valid) {
+        uart_frame_cache_line(set, c[set][way].tag);
+      }
+    }
+  }
+  uart_frame_end();
+  return;
+#endif
   printf("----\n");
   printf("print_cache_valid\n");
   printf("L2 output\n");
@@ -1,5 +1,7 @@
 #include <stdio.h>
+#include "config.h"
 #include "cache.h" 
+#include "uart_frame.h"
 
 /* ******************************************************************** */
 /* Test code.                                                         */
@@ -73,7 +75,11 @@ __asm__ __volatile__(".include \"all/inc/experiment/nop.h\"" : :);
    } while (liter > 0);
   disable_pmu(1);
   cnt1 = read_pmu(1); 
+#ifdef UART_BINARY_FRAMES
+  uart_frame_int("mispredictions", cnt1);
+#else
   printf("Number of mispredicted branches is %d \n", cnt1);
+#endif
   
 }
  
@@ -2,25 +2,25 @@
 __author__ = 'jordygennissen'
 
 import sys
-import angr
 
 from asmregex.PatternMatcher import * 
+from asmregex.DisassemblyCache import DisassemblyCache
 
 def main(binary, patternfile, pat=None):
   """Checks one binary on all patterns given in the file of arg2, and reports the amount of matches only"""
   m = AssemblyMatcher() 
   m.loadPatternFromFile(patternfile)
-  angrproject = angr.Project(binary)
-  m.loadBinaries(angrproject=angrproject)
+  m.loadBinaries(bindir=binary, cache=DisassemblyCache())  # only disassembles the binary on the first run
   print('On binary ' + binary)
   if pat is not None and pat in m.patterns.keys():
     print('On ' + pat + ' only')
     matches = m.match(pattern=pat)
     return
-  for patname in m.patterns.keys():
+  matches_per_pattern = m.match_many()  # all patterns in one pass over the binary
+  for patname, matches in matches_per_pattern.items():
     print('='*20)
     print('On '+patname)
-    matches = m.match(pattern=patname)
+    m.print_matches(matches)
     #if len(matches) > 0:
     #  print(str(len(matches)) + ' matches found in ' + patname + ':')
       
@@ -1,5 +1,9 @@
+import array
+import collections.abc
 import functools
+import json
 import numpy as np
+import os
 import sys
 
 
@@ -361,3 +365,214 @@ class AssemblyList(list):
       max(self.LCS2(other, i + 1, j), self.LCS2(other, i, j + 1))
     )
     # raise NotImplementedError('Coming soon...')
+
+
+class InstructionTable(object):
+  """Columnar, array-backed list of assembly instructions, as loaded by the BinaryLoaders
+
+  Opcodes and operands (arguments) are interned: every distinct string is stored once, and the instructions
+  refer to them by id. The arguments of instruction i are arg_ids[arg_offsets[i]:arg_offsets[i+1]].
+  Indexing the table materializes an AssemblyInstruction, so it can be used like an AssemblyList. The
+  matchers read the columns directly instead (opcode_at, args_at).
+
+  :attr opcodes: list of the distinct opcodes, indexed by opcode id
+  :attr operands: list of the distinct operands, indexed by operand id
+  :attr opcode: numpy array with the opcode id per instruction
+  :attr arg_offsets: numpy array with the offset of the arguments of every instruction in arg_ids, plus the end
+  :attr arg_ids: numpy array with the operand ids of all arguments
+  :attr addresses: numpy array with the address per instruction
+  """
+
+  def __init__(self, opcodes, operands, opcode, arg_offsets, arg_ids, addresses):
+    self.opcodes = opcodes
+    self.operands = operands
+    self.opcode = opcode
+    self.arg_offsets = arg_offsets
+    self.arg_ids = arg_ids
+    self.addresses = addresses
+
+  COLUMNS = ['opcode', 'arg_offsets', 'arg_ids', 'addresses']
+
+  def save(self, directory):
+    """Saves the table into a directory: one .npy file per column and the interned strings in strings.json"""
+    for column in InstructionTable.COLUMNS:
+      np.save(os.path.join(directory, column + '.npy'), getattr(self, column))
+    with open(os.path.join(directory, 'strings.json'), 'w') as strings_file:
+      json.dump({'opcodes': self.opcodes, 'operands': self.operands}, strings_file)
+
+  @staticmethod
+  def load(directory, mmap=True):
+    """Loads a table saved by save()
+
+    :param directory: directory the table has been saved to
+    :param mmap: whether to memory-map the columns (read-only) instead of reading them into memory
+    :return: InstructionTable
+    """
+    with open(os.path.join(directory, 'strings.json'), 'r') as strings_file:
+      strings = json.load(strings_file)
+    columns = [np.load(os.path.join(directory, column + '.npy'), mmap_mode='r' if mmap else None)
+               for column in InstructionTable.COLUMNS]
+    return InstructionTable(strings['opcodes'], strings['operands'], *columns)
+
+  @staticmethod
+  def from_instructions(asmlist):
+    """Builds the table of a list of assembly objects"""
+    builder = InstructionTableBuilder()
+    for asm in asmlist:
+      builder.append(asm['opcode'], asm['args'], asm['addr'])
+    return builder.build()
+
+  def __len__(self):
+    return len(self.opcode)
+
+  def __repr__(self):
+    return '<InstructionTable of size %d>' % len(self)
+
+  def __getitem__(self, key):
+    if isinstance(key, slice):
+      return AssemblyList([self[i] for i in range(*key.indices(len(self)))])
+    if key < 0:
+      key += len(self)
+    if not 0 <= key < len(self):
+      raise IndexError('Instruction index out of range: %d' % key)
+    asm = AssemblyInstruction()
+    asm['opcode'] = self.opcodes[self.opcode[key]]
+    asm['args'] = self.args_at(key)
+    asm['addr'] = int(self.addresses[key])
+    return asm
+
+  def __iter__(self):
+    for i in range(0, len(self)):
+      yield self[i]
+
+  def opcode_at(self, index):
+    """Returns the opcode of the instruction at index"""
+    return self.opcodes[self.opcode[index]]
+
+  def arg_ids_at(self, index):
+    """Returns the operand ids of the arguments of the instruction at index"""
+    return self.arg_ids[self.arg_offsets[index]:self.arg_offsets[index + 1]].tolist()
+
+  def args_at(self, index):
+    """Returns the arguments of the instruction at index"""
+    operands = self.operands
+    return [operands[arg_id] for arg_id in self.arg_ids_at(index)]
+
+  def address_index(self):
+    """Returns the mapping from address to index of this table"""
+    return AddressIndex(self.addresses)
+
+  def opcode_index(self):
+    """Returns the inverted index from opcode to the indices of the instructions with that opcode"""
+    index = dict()
+    order = np.argsort(self.opcode, kind='stable')
+    counts = np.bincount(self.opcode, minlength=len(self.opcodes))
+    offset = 0
+    for opcode_id in range(0, len(self.opcodes)):
+      if counts[opcode_id] > 0:
+        index[self.opcodes[opcode_id]] = order[offset:offset + counts[opcode_id]].tolist()
+      offset += counts[opcode_id]
+    return index
+
+
+class InstructionTableBuilder(object):
+  """Collects instructions one by one and builds an InstructionTable of them
+
+  :attr opcode_ids: dict from opcode to its id
+  :attr operand_ids: dict from operand to its id
+  """
+
+  def __init__(self):
+    self.opcode_ids = dict()
+    self.operand_ids = dict()
+    self.opcode = array.array('i')
+    self.arg_offsets = array.array('q', [0])
+    self.arg_ids = array.array('i')
+    self.addresses = array.array('Q')
+
+  def __len__(self):
+    return len(self.opcode)
+
+  def append(self, opcode, args, addr):
+    """Adds an instruction
+
+    :param opcode: opcode string
+    :param args: list of argument strings, None for no arguments
+    :param addr: address of the instruction
+    """
+    self.opcode.append(self.opcode_ids.setdefault(opcode, len(self.opcode_ids)))
+    for arg in (args if args is not None else []):
+      self.arg_ids.append(self.operand_ids.setdefault(arg, len(self.operand_ids)))
+    self.arg_offsets.append(len(self.arg_ids))
+    self.addresses.append(addr)
+
+  def build(self):
+    """Returns the InstructionTable of all instructions added"""
+    return InstructionTable(
+      list(self.opcode_ids.keys()), list(self.operand_ids.keys()),
+      np.array(self.opcode, dtype=np.int32), np.array(self.arg_offsets, dtype=np.int64),
+      np.array(self.arg_ids, dtype=np.int32), np.array(self.addresses, dtype=np.uint64))
+
+
+class AddressIndex(collections.abc.Mapping):
+  """Mapping from the address of an instruction to its index, like the address_map dicts of the BinaryLoaders,
+  but looked up in the address array of an InstructionTable with a binary search
+
+  :attr addresses: numpy array with the address per instruction
+  :attr order: the indices of the instructions sorted by address, None if the addresses are sorted already
+  """
+
+  def __init__(self, addresses):
+    self.addresses = addresses
+    self.order = None
+    if len(addresses) > 1 and np.any(addresses[1:] < addresses[:-1]):
+      self.order = np.argsort(addresses, kind='stable')
+
+  def __getitem__(self, addr):
+    if isinstance(addr, (int, np.integer)) and 0 <= addr < 2**64:
+      pos = int(np.searchsorted(self.addresses, addr, sorter=self.order))
+      if pos < len(self.addresses):
+        index = pos if self.order is None else int(self.order[pos])
+        if self.addresses[index] == addr:
+          return index
+    raise KeyError(addr)
+
+  def __iter__(self):
+    for index in (range(0, len(self.addresses)) if self.order is None else self.order):
+      yield int(self.addresses[index])
+
+  def __len__(self):
+    return len(self.addresses)
+
+
+def build_opcode_index(asmlist):
+  """Builds an inverted index from opcode to the indices of the assembly objects with that opcode
+
+  Used by the AssemblyMatcher to only start matching at instructions a pattern can begin with.
+  :param asmlist: list of assembly objects or InstructionTable
+  :return: dict from opcode to an ascending list of indices in asmlist
+  """
+  if isinstance(asmlist, InstructionTable):
+    return asmlist.opcode_index()
+  index = dict()
+  for i in range(0, len(asmlist)):
+    opcode = asmlist[i]['opcode']
+    if opcode in index:
+      index[opcode].append(i)
+    else:
+      index[opcode] = [i]
+  return index
+
+
+def opcode_at(asmlist, index):
+  """Returns the opcode of the instruction at index of a list of assembly objects or an InstructionTable"""
+  if isinstance(asmlist, InstructionTable):
+    return asmlist.opcode_at(index)
+  return asmlist[index]['opcode']
+
+
+def args_at(asmlist, index):
+  """Returns the arguments of the instruction at index of a list of assembly objects or an InstructionTable"""
+  if isinstance(asmlist, InstructionTable):
+    return asmlist.args_at(index)
+  return asmlist[index]['args']
@@ -4,13 +4,9 @@ import os
 import sys
 import logging
 
-try:
-  import angr
-except ImportError as err:
-  print("Error while importing module angr: %s" % str(err))
-  sys.exit(0)
+import angr  # only imported when this backend is used, see asmregex.binary_loader_backend
 
-from asmregex import AssemblyInstruction, AssemblyList
+from asmregex import InstructionTableBuilder, build_opcode_index
 
 
 class BinaryLoader ( object ):
@@ -36,6 +32,7 @@ class BinaryLoader ( object ):
     self.includes = includes if includes is not None else []
     self.assemblies = []
     self.mappings = []
+    self.opcode_indices = []
     
   def get(self, id=0):
     """
@@ -56,18 +53,30 @@ class BinaryLoader ( object ):
       self.reload_all()
     return self.assemblies, self.mappings
 
+  def get_opcode_indices(self):
+    """
+    Returns the inverted opcode indices of all loaded asm object lists, see build_opcode_index
+    :return: a list of dicts from opcode to the indices of the instructions with that opcode
+    """
+    if len(self.assemblies) == 0:
+      self.reload_all()
+    return self.opcode_indices
+
   def reload_all(self):
     self.assemblies = []
     self.mappings = []
+    self.opcode_indices = []
     # main binary
     asmlist, address_map = self.load_binary()
     self.assemblies.append(asmlist)
     self.mappings.append(address_map)
+    self.opcode_indices.append(build_opcode_index(asmlist))
     # all dynamically included shared objects
     for include in self.includes:
       asmlist, address_map = self.load_binary(include_obj=include)
       self.assemblies.append(asmlist)
       self.mappings.append(address_map)
+      self.opcode_indices.append(build_opcode_index(asmlist))
     
   def load_function(self, function_name="main"):
     symbol_obj = self.angrproj.loader.find_symbol(function_name)
@@ -88,9 +97,11 @@ class BinaryLoader ( object ):
     return self.load_slice(binary.min_addr, size=(binary.max_addr - binary.min_addr))
     
   def _load_capstone_insns(self, asmblock):
-    asmlist = AssemblyList()
-    address_map = dict()
-    count = 0
+    """Reformats the capstone instructions into an InstructionTable
+
+    :return: tuple (InstructionTable, AddressIndex from address to index in the table)
+    """
+    builder = InstructionTableBuilder()
     invalid_ctr = 0
     for i in range(0, len(asmblock) ):
       if not asmblock[i].insn.mnemonic:  # Not sure if still needed.
@@ -103,15 +114,8 @@ class BinaryLoader ( object ):
         self.l.warning(str(invalid_ctr) +
                        ' consecutive bytes labelled "invalid" until ' + "0x%02x" % asmblock[i].insn.address)
         invalid_ctr = 0
-      asm = AssemblyInstruction()
-      #asm['disasm'] = asmblock[i].insn.mnemonic + ' ' + asmblock[i].insn.op_str
-      asm['opcode'] = asmblock[i].insn.mnemonic
-      
-      for arg in asmblock[i].insn.op_str.split(','):
-        asm['args'].append(arg.replace('ptr', '').replace(' ', ''))  # remove spaces
-      asm['addr'] = asmblock[i].insn.address
-      asmlist.append(asm)
-      address_map[asm['addr']] = count
-      count += 1
-    return asmlist, address_map
-
+      #disasm = asmblock[i].insn.mnemonic + ' ' + asmblock[i].insn.op_str
+      args = [arg.replace('ptr', '').replace(' ', '') for arg in asmblock[i].insn.op_str.split(',')]  # remove spaces
+      builder.append(asmblock[i].insn.mnemonic, args, asmblock[i].insn.address)
+    table = builder.build()
+    return table, table.address_index()
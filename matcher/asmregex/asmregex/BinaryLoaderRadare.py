@@ -5,7 +5,9 @@ import sys
 import json
 import logging
 
-from asmregex import AssemblyInstruction
+import r2pipe  # https://github.com/countercept/radare2-scripts/blob/master/r2_bin_carver.py
+
+from asmregex import InstructionTableBuilder, build_opcode_index
 
 class BinaryLoader ( object ):
   """Static class loading a binary using Radare2 (http://www.radare.org/r/) and the python pipe r2pipe.
@@ -20,11 +22,7 @@ class BinaryLoader ( object ):
     self.l = logging.getLogger("AsmRegex")
     self.assemblies = []
     self.mappings = []
-    try:  # https://github.com/countercept/radare2-scripts/blob/master/r2_bin_carver.py
-      import r2pipe
-    except ImportError as err:
-      print("Error while importing module r2pipe: %s" % str(err))
-      sys.exit(0)
+    self.opcode_indices = []
 
   def get(self, id=0):
     if id != 0:
@@ -39,14 +37,25 @@ class BinaryLoader ( object ):
     if len(self.assemblies) == 0:
       self.reload_all()
     return self.assemblies, self.mappings
+
+  def get_opcode_indices(self):
+    """
+    Returns the inverted opcode indices of all loaded asm object lists, see build_opcode_index
+    :return: a list of dicts from opcode to the indices of the instructions with that opcode
+    """
+    if len(self.assemblies) == 0:
+      self.reload_all()
+    return self.opcode_indices
   
   def reload_all(self):
     self.assemblies = []
     self.mappings = []
+    self.opcode_indices = []
     # main binary
     asmlist, address_map = self.load_binary()
     self.assemblies.append(asmlist)
     self.mappings.append(address_map)
+    self.opcode_indices.append(build_opcode_index(asmlist))
     return  # includes are not (and will not be) implemented for Radare.
     # all dynamically included shared objects
   """
@@ -85,8 +94,8 @@ class BinaryLoader ( object ):
     :param file_path:
     :returns: tuple (asmlist, address_map)
         WHERE
-        list asmlist is a list of assembly objects
-        dict address_map is a mapping from the assembly offset/address to the index in the asmlist
+        InstructionTable asmlist is the table of the assembly instructions
+        AddressIndex address_map is a mapping from the assembly offset/address to the index in the asmlist
     """
     r2 = None
     try:
@@ -98,9 +107,7 @@ class BinaryLoader ( object ):
     BinaryLoader()._set_bytesize(r2)
     r2obj = json.loads(r2.cmd("pdj"))
     #CFG = json.loads(r2.cmd('agCj'))
-    asmlist = AssemblyList()
-    address_map = dict()
-    count = 0
+    builder = InstructionTableBuilder()
     invalid_ctr = 0
     for i in range(0, len(r2obj)):
       if 'opcode' not in r2obj[i]:  # TODO: Find out why and find a better solution
@@ -113,18 +120,11 @@ class BinaryLoader ( object ):
       elif invalid_ctr > 4:
         self.l.warning(str(invalid_ctr) + ' consecutive bytes labelled "invalid" until ' + "0x%02x" % r2obj[i]['offset'])
         invalid_ctr = 0
-      asm = AssemblyInstruction()
-      #asm['disasm'] = r2obj[i]['opcode']
+      #disasm = r2obj[i]['opcode']
       split = r2obj[i]['opcode'].split(' ',1)
-      asm['opcode'] = split[0]
-      if len(split) < 2:
-        asm['args'] = None
-      else: 
-        asm['args'] = list()
-        for arg in split[1].split(','): 
-          asm['args'].append(arg.replace(' ', '')) # remove spaces
-      asm['addr'] = r2obj[i]['offset']
-      asmlist.append(asm)
-      address_map[asm['addr']] = count
-      count += 1
-    return asmlist, address_map
+      args = None
+      if len(split) >= 2:
+        args = [arg.replace(' ', '') for arg in split[1].split(',')] # remove spaces
+      builder.append(split[0], args, r2obj[i]['offset'])
+    table = builder.build()
+    return table, table.address_index()
@@ -0,0 +1,104 @@
+__author__ = 'jordygennissen'
+
+# global
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+
+# local
+from asmregex.Assembly import InstructionTable
+
+
+class DisassemblyCache ( object ):
+  """On-disk cache of the disassembly of binaries, so that a binary is only disassembled once
+
+  Every entry is the InstructionTable of one binary, saved as memory-mappable .npy files (see InstructionTable.save).
+  Entries are keyed by the SHA-256 of the content of the binary and the version of the loader that disassembled it,
+  so a changed binary or loader never hits an outdated entry. The instructions hold absolute addresses (also in the
+  arguments, e.g. jump targets), so an object that is mapped at a given base address, e.g. a shared object in an angr
+  project, is additionally keyed by that base. Hashing a large binary takes a while: callers that
+  look a binary up and then store it pass the digest to both.
+
+  :attr directory: the directory holding the entries
+  :attr l: AsmRegex logger
+  """
+
+  def __init__(self, directory=None):
+    """
+    :param directory: directory to keep the cache in, None for the default (see default_directory)
+    """
+    self.directory = DisassemblyCache.default_directory() if directory is None else directory
+    self.l = logging.getLogger("AsmRegex")
+
+  @staticmethod
+  def default_directory():
+    """Returns $XDG_CACHE_HOME/asmregex, or ~/.cache/asmregex"""
+    cache_home = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_home, 'asmregex')
+
+  @staticmethod
+  def digest(binary_path):
+    """Returns the SHA-256 of the content of a binary, which identifies the binary in the cache"""
+    digest = hashlib.sha256()
+    with open(binary_path, 'rb') as binary:
+      for block in iter(lambda: binary.read(1 << 20), b''):
+        digest.update(block)
+    return digest.hexdigest()
+
+  @staticmethod
+  def key(digest, loader_version, base=None):
+    """Returns the cache key of a binary: SHA-256 of its digest (see digest), the loader version and the base address
+    the binary is mapped at (None: the default of the loader)"""
+    key = digest + '\0' + loader_version
+    if base is not None:
+      key += '\0%x' % base
+    return hashlib.sha256(key.encode()).hexdigest()
+
+  def _entry(self, binary_path, loader_version, digest, base):
+    if digest is None:
+      digest = DisassemblyCache.digest(binary_path)
+    return os.path.join(self.directory, DisassemblyCache.key(digest, loader_version, base))
+
+  def load(self, binary_path, loader_version, digest=None, base=None):
+    """Returns the cached disassembly of a binary
+
+    :param binary_path: path to the binary
+    :param loader_version: version of the loader that would disassemble the binary
+    :param digest: digest of the binary (see digest), computed if None
+    :param base: base address the binary is mapped at, None for the default of the loader
+    :return: memory-mapped InstructionTable, None if the binary is not in the cache
+    """
+    entry = self._entry(binary_path, loader_version, digest, base)
+    if not os.path.isdir(entry):
+      self.l.debug('Cache miss for ' + binary_path)
+      return None
+    self.l.debug('Cache hit for ' + binary_path)
+    return InstructionTable.load(entry)
+
+  def store(self, binary_path, loader_version, table, digest=None, base=None):
+    """Stores the disassembly of a binary
+
+    The entry is written to a temporary directory first and then renamed, so concurrent users of the cache never
+    see a partial entry.
+    :param binary_path: path to the binary
+    :param loader_version: version of the loader that disassembled the binary
+    :param table: InstructionTable of the binary
+    :param digest: digest of the binary (see digest), computed if None
+    :param base: base address the binary is mapped at, None for the default of the loader
+    :return: None
+    """
+    entry = self._entry(binary_path, loader_version, digest, base)
+    if os.path.isdir(entry):
+      return
+    os.makedirs(self.directory, exist_ok=True)
+    tmp_entry = tempfile.mkdtemp(dir=self.directory, prefix='.tmp-')
+    try:
+      table.save(tmp_entry)
+      os.rename(tmp_entry, entry)
+      self.l.debug('Stored disassembly of %s in the cache' % binary_path)
+    except OSError as err:
+      shutil.rmtree(tmp_entry, ignore_errors=True)
+      if not os.path.isdir(entry):  # otherwise, it has been stored by someone else in the meantime
+        self.l.warning('Cannot store the disassembly of %s in the cache: %s' % (binary_path, str(err)))
@@ -0,0 +1,373 @@
+from __future__ import annotations
+from typing import FrozenSet, List, Optional, Set, Tuple
+
+__author__ = 'jordygennissen'
+
+# global
+import bisect
+import logging
+
+# local
+from asmregex.PatternPiece import *
+
+class PatternAutomaton ( object ):
+  """Assembly regex compiled into a Thompson-style automaton over instructions
+
+  The PatternPiece list of the parser is compiled into a small program with four kinds of instructions:
+  CONSUME (match one assembly instruction against an AsmPP), SPLIT (continue at two places, the first
+  one preferred), JMP and ACCEPT. Repetitions are unrolled: {a,b} becomes a copies of the subpattern
+  followed by b-a optional copies, so that the program counter is the complete matching state.
+
+  Matching simulates all threads in parallel (Pike VM), ordered by priority, such that the result is
+  the match the backtracking AssemblyMatcherIterator would find first: lazy/greedy repetitions and the
+  order of or-alternatives are respected. Matching is linear in the number of instructions times the
+  size of the program.
+
+  Back-references (constraints) depend on the path taken through the pattern and cannot be simulated
+  this way: patterns with constraints are matched by the AssemblyMatcherIterator instead, see supports().
+
+  :attr ops: instruction kind per program counter
+  :attr x: CONSUME: the AsmPP, SPLIT: preferred pc, JMP: target pc
+  :attr y: SPLIT: alternative pc
+  :attr l: AsmRegex logger
+  """
+  CONSUME = 0
+  SPLIT = 1
+  JMP = 2
+  ACCEPT = 3
+
+  def __init__(self, patternList):
+    """Compiles a parsed assembly regex
+
+    :param patternList: parsed assembly pattern, see PatternParser.fromString
+    """
+    if not PatternAutomaton.supports(patternList):
+      raise RuntimeError('Patterns with constraints or jumps cannot be compiled into an automaton.')
+    self.l = logging.getLogger("AsmRegex")
+    self.pattern = patternList
+    self.ops: List[int] = []
+    self.x: List = []
+    self.y: List[int] = []
+    self._compile_range(0, len(patternList))
+    self._emit(PatternAutomaton.ACCEPT)
+    self.l.debug('Pattern compiled into %d automaton instructions' % len(self.ops))
+
+  @staticmethod
+  def supports(patternList):
+    """Returns whether the pattern can be matched by the automaton (no constraints, no jumps)"""
+    for piece in patternList:
+      if piece.Type == PPType.ASM and (len(piece.constraints) > 0 or piece.jmp):
+        return False
+    return True
+
+  @staticmethod
+  def first_opcodes(patternList) -> Optional[FrozenSet[str]]:
+    """Returns the opcodes a match of the pattern can start with
+
+    Used to only start matching at the instructions with one of these opcodes (see build_opcode_index).
+    :param patternList: parsed assembly pattern
+    :return: set of opcodes, or None if a match can start anywhere: if the first instruction can be any
+             instruction (any, or an inverted opcode), or if the pattern can match without instructions
+    """
+    opcodes, nullable = PatternAutomaton._first_opcodes(patternList, 0, len(patternList))
+    if opcodes is None or nullable:
+      return None
+    return frozenset(opcodes)
+
+  @staticmethod
+  def _first_opcodes(patternList, begin, end):
+    """Computes the first opcodes of the pattern pieces [begin, end)
+
+    :return: tuple (set of opcodes or None for any opcode, whether the pieces can match without instructions).
+             Pieces that are not nested as expected (the parser does not always nest an OR inside a repetition)
+             give None, so the prefilter never makes such a pattern unmatchable.
+    """
+    opcodes: Set[str] = set()
+    i = begin
+    while i < end:
+      piece = patternList[i]
+      if piece.Type == PPType.ASM:
+        if piece.invert_opcode or 'any' in piece.opcode:
+          return None, False
+        opcodes.update(piece.opcode)
+        return opcodes, False
+      elif piece.Type == PPType.BEGIN:
+        tracker = piece.tracker
+        if not i < tracker.end < end:
+          return None, False
+        sub, nullable = PatternAutomaton._first_opcodes(patternList, i + 1, tracker.end)
+        if sub is None:
+          return None, False
+        opcodes.update(sub)
+        if (tracker.staticmin or 0) > 0 and not nullable:
+          return opcodes, False
+        i = tracker.end + 1
+      elif piece.Type == PPType.OR:
+        tracker = piece.tracker
+        if not i < tracker.middle < tracker.end < end:
+          return None, False
+        first, first_nullable = PatternAutomaton._first_opcodes(patternList, i + 1, tracker.middle)
+        second, second_nullable = PatternAutomaton._first_opcodes(patternList, tracker.middle + 1, tracker.end)
+        if first is None or second is None:
+          return None, False
+        opcodes.update(first)
+        opcodes.update(second)
+        if not first_nullable and not second_nullable:
+          return opcodes, False
+        i = tracker.end + 1
+      else:
+        return None, False
+    return opcodes, True
+
+  @staticmethod
+  def max_span(patternList) -> Optional[int]:
+    """Returns the maximum number of instructions a match of the pattern can consist of
+
+    :param patternList: parsed assembly pattern
+    :return: the maximum length of a match, None if it is unbounded (a repetition without maximum)
+    """
+    return PatternAutomaton._max_span(patternList, 0, len(patternList))
+
+  @staticmethod
+  def _max_span(patternList, begin, end):
+    """Computes the maximum length of a match of the pattern pieces [begin, end), None if unbounded or if the
+    pieces are not nested as expected"""
+    span = 0
+    i = begin
+    while i < end:
+      piece = patternList[i]
+      if piece.Type == PPType.ASM:
+        span += 1
+        i += 1
+      elif piece.Type == PPType.BEGIN:
+        tracker = piece.tracker
+        sub = PatternAutomaton._max_span(patternList, i + 1, tracker.end)
+        if sub is None or (sub > 0 and not tracker.staticmax):  # see _compile_repetition for the maximum
+          return None
+        span += sub * (tracker.staticmax or 0)
+        i = tracker.end + 1
+      elif piece.Type == PPType.OR:
+        tracker = piece.tracker
+        first = PatternAutomaton._max_span(patternList, i + 1, tracker.middle)
+        second = PatternAutomaton._max_span(patternList, tracker.middle + 1, tracker.end)
+        if first is None or second is None:
+          return None
+        span += max(first, second)
+        i = tracker.end + 1
+      else:
+        return None  # not nested as expected, see _first_opcodes
+    return span
+
+  def __len__(self):
+    return len(self.ops)
+
+  def _emit(self, op, x=None, y=None):
+    self.ops.append(op)
+    self.x.append(x)
+    self.y.append(y)
+    return len(self.ops) - 1
+
+  def _compile_range(self, begin, end):
+    """Compiles the pattern pieces [begin, end) into the program"""
+    i = begin
+    while i < end:
+      piece = self.pattern[i]
+      if piece.Type == PPType.ASM:
+        self._emit(PatternAutomaton.CONSUME, piece)
+        i += 1
+      elif piece.Type == PPType.BEGIN:
+        tracker = piece.tracker
+        self._compile_repetition(i + 1, tracker.end, tracker)
+        i = tracker.end + 1
+      elif piece.Type == PPType.OR:
+        tracker = piece.tracker
+        split = self._emit(PatternAutomaton.SPLIT)
+        self.x[split] = len(self.ops)
+        self._compile_range(i + 1, tracker.middle)
+        jmp = self._emit(PatternAutomaton.JMP)
+        self.y[split] = len(self.ops)
+        self._compile_range(tracker.middle + 1, tracker.end)
+        self.x[jmp] = len(self.ops)
+        i = tracker.end + 1
+      else:
+        raise RuntimeError('Unexpected pattern piece while compiling: ' + str(piece.Type))
+
+  def _compile_repetition(self, begin, end, tracker):
+    """Compiles a repeated subpattern (pattern pieces [begin, end)) according to its tracker"""
+    # A minimum of None is no minimum. A maximum of None or 0 is no maximum: the RepetitionTracker
+    # only counts down a maximum that is set and above 0.
+    minimum = tracker.staticmin or 0
+    maximum = tracker.staticmax or None
+    for _ in range(minimum):
+      self._compile_range(begin, end)
+    if maximum is None:
+      # L1: split L2, L3; L2: body; jmp L1; L3:
+      split = self._emit(PatternAutomaton.SPLIT)
+      body = len(self.ops)
+      self._compile_range(begin, end)
+      self._emit(PatternAutomaton.JMP, split)
+      self._set_split(split, body, len(self.ops), tracker.is_lazy)
+      return
+    # optional copies, nested: (body (body ...)?)?
+    splits = []
+    for _ in range(maximum - minimum):
+      splits.append(self._emit(PatternAutomaton.SPLIT))
+      body = len(self.ops)
+      self._compile_range(begin, end)
+      self.x[splits[-1]] = body
+    for split in splits:
+      self._set_split(split, self.x[split], len(self.ops), tracker.is_lazy)
+
+  def _set_split(self, split, body, exit, lazy):
+    # lazy repetitions prefer to leave the loop, greedy ones to repeat
+    self.x[split], self.y[split] = (exit, body) if lazy else (body, exit)
+
+  def _closure(self, threads, visited, pc, start, pos):
+    """Adds the thread at pc and all threads reachable from it without consuming an instruction.
+
+    Threads are appended in priority order; a pc that was already reached in this step by a thread
+    of higher priority is not added again.
+    :return: the match (start, end) if the closure reaches ACCEPT, None otherwise. Lower priority
+             threads are not added after an ACCEPT.
+    """
+    ops, x, y = self.ops, self.x, self.y
+    stack = [pc]
+    while stack:
+      pc = stack.pop()
+      if pc in visited:
+        continue
+      visited.add(pc)
+      op = ops[pc]
+      if op == PatternAutomaton.CONSUME:
+        threads.append((pc, start))
+      elif op == PatternAutomaton.SPLIT:
+        stack.append(y[pc])
+        stack.append(x[pc])
+      elif op == PatternAutomaton.JMP:
+        stack.append(x[pc])
+      else:  # ACCEPT
+        return (start, pos)
+    return None
+
+  @staticmethod
+  def _is_candidate(candidates, pos):
+    k = bisect.bisect_left(candidates, pos)
+    return k < len(candidates) and candidates[k] == pos
+
+  def search(self, asm_list, begin=0, end=None, candidates=None):
+    """Finds the matches starting in [begin, end), with the semantics of AssemblyMatcherIterator.match_all:
+    at most one match (the preferred one) per start, and after a match, the next start is the
+    instruction after the last matched instruction.
+
+    :param asm_list: haystack, list of assembly objects or InstructionTable
+    :param begin: first start index
+    :param end: start index to stop at (excl.), None for the end of the list
+    :param candidates: ascending list of the only start indices a match can begin at (see first_opcodes),
+                       None to try every start. While no match is in progress, the search skips ahead
+                       to the next candidate.
+    :return: list of matches as (start, end) index pairs, end exclusive
+    """
+    scan = AutomatonScan(self, asm_list, begin=begin, end=end, candidates=candidates)
+    scan.run()
+    return scan.matches
+
+  def match_all(self, asm_list, candidates=None):
+    """Returns all matches, like AssemblyMatcherIterator.match_all
+
+    :param asm_list: haystack, list of assembly objects
+    :param candidates: ascending list of the only start indices a match can begin at, None for all
+    :return: list of matches (match == list of assembly instructions)
+    """
+    if not asm_list or not self.pattern:
+      raise RuntimeError( "I don't have both an asmregex and a binary yet!" )
+    return [[asm_list[i] for i in range(start, end)] for start, end in self.search(asm_list, candidates=candidates)]
+
+
+
+class AutomatonScan ( object ):
+  """A resumable search of a PatternAutomaton over a list of assembly objects, see PatternAutomaton.search
+
+  run(limit) processes the instructions up to the limit only, so that several scans can go through
+  the same assembly list in lockstep (AssemblyMatcher.match_many).
+
+  :attr automaton: the PatternAutomaton
+  :attr asm_list: haystack, list of assembly objects
+  :attr end: start index to stop at (excl.)
+  :attr candidates: ascending list of the only start indices, None for all
+  :attr pieces: per program counter, the object whose match_at(asm_list, index) checks a CONSUME instruction
+  :attr pos: index of the next instruction to consume
+  :attr threads: running threads (pc, start) in priority order
+  :attr visited: program counters reached by the threads in the current step
+  :attr best: preferred match (start, end) found so far for the current start, None if there is none
+  :attr matches: list of matches found, as (start, end) index pairs, end exclusive
+  """
+
+  def __init__(self, automaton, asm_list, begin=0, end=None, candidates=None, pieces=None):
+    """
+    :param pieces: replaces the AsmPPs of the automaton: list of objects with a match_at(asm_list, index)
+                   function per program counter, e.g. to share the checks between scans. None for the automaton's own
+    """
+    self.automaton = automaton
+    self.asm_list = asm_list
+    self.end = len(asm_list) if end is None else min(end, len(asm_list))
+    self.candidates = candidates
+    self.pieces = automaton.x if pieces is None else pieces
+    self.pos = begin
+    self.threads: List[Tuple[int, int]] = []
+    self.visited: Set[int] = set()
+    self.best: Optional[Tuple[int, int]] = None
+    self.matches: List[Tuple[int, int]] = []
+
+  def idle(self):
+    """Returns whether no match is in progress, i.e. the scan can skip to any later start"""
+    return self.best is None and not self.threads
+
+  def run(self, limit=None):
+    """Continues the search until the next instruction to consume is at index limit (or further)
+
+    :param limit: index to stop at, None to finish the search
+    :return: self
+    """
+    automaton, asm_list, candidates = self.automaton, self.asm_list, self.candidates
+    x = self.pieces
+    n = len(asm_list)
+    end = self.end
+    matches = self.matches
+    threads, visited, best, pos = self.threads, self.visited, self.best, self.pos
+    while limit is None or pos < limit:
+      if best is None and pos < end:
+        if candidates is not None and not threads:
+          # nothing in progress, skip ahead to the next possible start
+          k = bisect.bisect_left(candidates, pos)
+          pos = candidates[k] if k < len(candidates) else end
+        if pos < end and (candidates is None or PatternAutomaton._is_candidate(candidates, pos)):
+          # start a new attempt at the lowest priority
+          best = automaton._closure(threads, visited, 0, pos, pos)
+      if not threads or pos >= n:
+        if best is not None:
+          matches.append(best)
+          # continue after the last matched instruction (or after an empty match)
+          pos = best[1] if best[1] > best[0] else best[0] + 1
+          best = None
+        elif pos >= end:
+          break
+        else:
+          pos += 1
+        threads = []
+        visited = set()
+        continue
+      # consume the instruction at pos in all threads, in priority order
+      next_threads: List[Tuple[int, int]] = []
+      next_visited: Set[int] = set()
+      for pc, start in threads:
+        if x[pc].match_at(asm_list, pos):
+          accepted = automaton._closure(next_threads, next_visited, pc + 1, start, pos + 1)
+          if accepted is not None:
+            # threads of lower priority can only find less preferred matches
+            best = accepted
+            break
+      threads = next_threads
+      visited = next_visited
+      pos += 1
+    self.threads, self.visited, self.best, self.pos = threads, visited, best, pos
+    return self
@@ -1,23 +1,39 @@
 __author__ = 'jordygennissen'
 
 # global
-import copy
+import bisect
+import importlib
+import importlib.util
 import logging  # Is used, even if pycharm says it is not
+import os
 import sys
-try:
-  import angr  # for testing purposes, because loadBinaries gets an angr Project to pass on to the loader.
-  import asmregex.BinaryLoaderAngr as BinaryLoader
-except ImportError as e:
-  try:
-    import r2pipe
-    import asmregex.BinaryLoaderRadare as BinaryLoader
-  except ImportError as e:
-    raise RuntimeError('No angr no R2Pipe found. Can\'t load assembly code')
+from concurrent.futures import ProcessPoolExecutor
+
+# Binary loader backends in order of preference: (required module, loader module, loader version).
+# The loader module is only imported when a binary is loaded, and not at all on a DisassemblyCache hit.
+# Bump the loader version whenever the output of a loader changes, to invalidate the cached disassemblies.
+BINARY_LOADERS = [
+  ('angr', 'asmregex.BinaryLoaderAngr', 'angr-capstone-1'),
+  ('r2pipe', 'asmregex.BinaryLoaderRadare', 'radare2-1'),
+]
+
+def binary_loader_backend():
+  """Returns the first binary loader backend whose required module is installed, without importing it
+
+  :return: tuple (loader module name, loader version)
+  """
+  for required, module, version in BINARY_LOADERS:
+    if importlib.util.find_spec(required) is not None:
+      return module, version
+  raise RuntimeError('No angr no R2Pipe found. Can\'t load assembly code')
 
 
 
 # local
 from asmregex.PatternPiece import *
+from asmregex.Assembly import InstructionTable, build_opcode_index, opcode_at, args_at
+from asmregex.DisassemblyCache import DisassemblyCache
+from asmregex.PatternAutomaton import PatternAutomaton, AutomatonScan
 import asmregex.PatternParser as PatternParser
 
 class AssemblyMatcher ( object ) : 
@@ -25,16 +41,26 @@ class AssemblyMatcher ( object ) :
   
   :attr patterns: dict of asmregex patterns.
         Needs as least one pattern on 'main'. Secondary patterns currently unimplemented.
-  :attr asms: list of a list of assembly objects, the haystacks
+  :attr automata: dict of the patterns compiled into automata, None for patterns the automaton
+        cannot match (see PatternAutomaton.supports)
+  :attr first_opcodes: dict of the opcodes a match of the pattern can start with, None if it can start anywhere
+  :attr asms: list of a list of assembly objects (InstructionTables, when loaded from a binary), the haystacks
   :attr address_maps: a list of mappings from the assembly offset/address to the index in the asmlist
+        (AddressIndex, when loaded from a binary)
+  :attr opcode_indices: a list of mappings from opcode to the indices in the asmlist with that opcode
   :attr l: AsmRegex logger
+  :attr static MIN_CHUNK_SIZE: the minimum number of start indices a worker of find_matches_parallel gets
   """
+  MIN_CHUNK_SIZE = 10000
 
   def __init__(self):
     """Initialises an AssemblyMatcher Object """
     self.patterns = dict()
+    self.automata = dict()
+    self.first_opcodes = dict()
     self.asms = []
     self.address_maps = []
+    self.opcode_indices = []
     self.l = logging.getLogger("AsmRegex")
     # handler = logging.StreamHandler()
     # formatter = logging.Formatter(
@@ -90,26 +116,84 @@ class AssemblyMatcher ( object ) :
     self.l.debug('P: ' + patternstring)
     stripped = ''.join(patternstring.split()) # remove whitespace
     self.patterns[pattern] = PatternParser.PatternParser().fromString(stripped)
+    self.automata[pattern] = None
+    if PatternAutomaton.supports(self.patterns[pattern]):
+      try:
+        self.automata[pattern] = PatternAutomaton(self.patterns[pattern])
+      except RuntimeError as err:
+        self.l.warning('Pattern "%s" cannot be compiled (%s), matching by backtracking' % (pattern, str(err)))
+    else:
+      self.l.debug("Pattern has constraints, matching by backtracking")
+    self.first_opcodes[pattern] = PatternAutomaton.first_opcodes(self.patterns[pattern])
     self.l.debug("Pattern loaded")
     return self
 
-  def loadBinary(self, binary):
+  def loadBinary(self, binary, cache=None):
     """Loads a single binary and retrieves the assembly code
     Uses the old BinaryLoader based on radare2
     
     :param binary: path to the binary to be loaded
+    :param cache: DisassemblyCache to use, None for no cache
     :return: self
     """
-    return self.loadBinaries(bindir=binary)
+    return self.loadBinaries(bindir=binary, cache=cache)
  
-  def loadBinaries(self, angrproject=None, bindir=None, includes=list()):
-    loader = BinaryLoader.BinaryLoader(angrproject=angrproject, bindir=bindir, includes=includes)
+  def loadBinaries(self, angrproject=None, bindir=None, includes=list(), cache=None):
+    """Loads a binary (and the given shared objects) and retrieves the assembly code
+
+    :param angrproject: angr project of the binary, or None to load the binary at bindir
+    :param bindir: path to the binary to be loaded, if there is no angr project
+    :param includes: angr objects of the shared objects to load too (see BinaryLoaderAngr)
+    :param cache: DisassemblyCache to take the assembly code from, and to store it in on a miss. None for no cache.
+    :return: self
+    """
+    paths = []  # of the binaries to be loaded, None if unknown
+    digests = []  # of the binaries, hashed once for the lookup and for storing them on a miss
+    bases = []  # addresses the binaries are mapped at, None for the default of the loader
+    if cache is not None:
+      objects = ([] if angrproject is None else [angrproject.loader.all_objects[0]]) + list(includes)
+      paths.append(bindir if angrproject is None else getattr(objects[0], 'binary', None))
+      paths.extend(getattr(include, 'binary', None) for include in includes)
+      paths = [path if path is not None and os.path.isfile(path) else None for path in paths]
+      digests = [DisassemblyCache.digest(path) if path is not None else None for path in paths]
+      bases = ([None] if angrproject is None else []) + [getattr(obj, 'mapped_base', None) for obj in objects]
+      if None not in paths:
+        # the disassembly of any loader will do, in order of preference, so that a hit needs no loader installed
+        for _, _, version in BINARY_LOADERS:
+          tables = [cache.load(path, version, digest, base) for path, digest, base in zip(paths, digests, bases)]
+          if None not in tables:
+            self.l.debug('%d binaries loaded from the cache' % len(tables))
+            for table in tables:
+              self.loadAssembly(table)
+            return self
+    module, version = binary_loader_backend()
+    loader = importlib.import_module(module).BinaryLoader(angrproject=angrproject, bindir=bindir, includes=includes)
     asms, mappings = loader.get_all()
     self.l.debug('%d patterns loaded' %len(asms))
     self.asms.extend(asms)
     self.address_maps.extend(mappings)
+    self.opcode_indices.extend(loader.get_opcode_indices())
+    for path, digest, base, table in zip(paths, digests, bases, asms):
+      if path is not None and isinstance(table, InstructionTable):
+        cache.store(path, version, table, digest, base)
     return self
-  
+
+  def loadAssembly(self, asmlist, address_map=None):
+    """Loads assembly code that is already in memory, e.g. disassembled by other means
+
+    :param asmlist: InstructionTable or list of assembly objects
+    :param address_map: mapping from the assembly offset/address to the index in the asmlist, built if None
+    :return: self
+    """
+    if address_map is None and isinstance(asmlist, InstructionTable):
+      address_map = asmlist.address_index()
+    elif address_map is None:
+      address_map = {asm['addr']: i for i, asm in enumerate(asmlist)}
+    self.asms.append(asmlist)
+    self.address_maps.append(address_map)
+    self.opcode_indices.append(build_opcode_index(asmlist))
+    return self
+
   def replace_fcn(self, pattern="main", ):
     #  TODO: Decide if I want to implement/use this anyway, and if so, decide if it goes here or within the matcher
     #  TODO: The idea was to have placeholders for a function name, jit converted to the address of the function
@@ -130,6 +214,12 @@ class AssemblyMatcher ( object ) :
     if len(self.patterns) == 0: 
       raise RuntimeError( "No expressions loaded!")
     matches = self.find_matches(pattern=pattern, assembly_id=assembly_id)
+    self.print_matches(matches, assembly_id=assembly_id)
+    return matches
+
+  def print_matches(self, matches, assembly_id = 0):
+    """Prettyprints a list of matches on the given loaded binary """
+    address_map = self.address_maps[assembly_id]
     print('-'*20)
     print('Found %d matches' % len(matches))
     for match in matches:
@@ -140,7 +230,6 @@ class AssemblyMatcher ( object ) :
       print('Match length = %d' % len(match))
       print('-'*20)
       self.print_asm(match)
-    return matches
 
   @staticmethod
   def print_asm(asmlist):
@@ -149,16 +238,108 @@ class AssemblyMatcher ( object ) :
       sys.stdout.write('0x%08x\t' % asm['addr'])
       sys.stdout.write(asm['disasm'] + '\n')
   
-  def match_all_binaries(self, pattern="main"):
+  def match_all_binaries(self, pattern="main", jobs=1):
     """
     Matches the given pattern on *all* binaries given (including libs) and returns one big list
     :param pattern: name of the loaded pattern to use for matching
+    :param jobs: number of worker processes, None for one per CPU. With more than one, the binaries (and chunks
+                 of large binaries) are matched in parallel, see find_matches_parallel.
     :return: one big list of all the matches
     """
     matches = list()
-    for i in range(0, len(self.asms)):
-      matches.extend(self.find_matches(pattern=pattern, assembly_id=i))
+    if jobs == 1:
+      for i in range(0, len(self.asms)):
+        matches.extend(self.find_matches(pattern=pattern, assembly_id=i))
+      return matches
+    for assembly_matches in self.find_matches_parallel(pattern=pattern, jobs=jobs):
+      matches.extend(assembly_matches)
     return matches
+
+  def find_matches_parallel(self, pattern="main", assembly_ids=None, jobs=None, chunk_size=None):
+    """
+    Matches the given pattern on several loaded binaries with a pool of worker processes
+    
+    Every binary is split into chunks of start indices, which are matched in parallel. The workers get the loaded
+    binaries once, when the pool starts, and a match starting in a chunk may run into the next one (at most the
+    maximum span of the pattern). The matches of the chunks are merged in order: where a match runs into the next
+    chunk, matching is redone from the end of that match until it agrees with the next chunk. The result is the
+    same as the one of find_matches. Patterns with an unbounded span or with constraints are matched per binary.
+    :param pattern: The name of the loaded pattern to use for matching
+    :param assembly_ids: list of the loaded binaries to match on, None for all of them
+    :param jobs: number of worker processes, None for one per CPU
+    :param chunk_size: number of start indices per chunk, None to spread each binary over all workers
+                       (but at least MIN_CHUNK_SIZE)
+    :return: list of lists of matches (match == list of assembly instructions), one per given binary
+    """
+    assert(pattern in self.patterns)
+    if assembly_ids is None:
+      assembly_ids = range(0, len(self.asms))
+    jobs = os.cpu_count() if jobs is None else jobs
+    automaton = self.automata.get(pattern)
+    span = None if automaton is None else PatternAutomaton.max_span(self.patterns[pattern])
+    self.l.debug('Matching on %d binaries with %d processes, maximum match span %s' % (len(assembly_ids), jobs, str(span)))
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+        initargs=(self.patterns[pattern], automaton, self.asms, self.address_maps)) as executor:
+      tasks = []  # per binary: candidates, chunk bounds, futures
+      for assembly_id in assembly_ids:
+        asm_list = self.asms[assembly_id]
+        candidates = self.start_candidates(pattern=pattern, assembly_id=assembly_id)
+        if automaton is None:
+          tasks.append((candidates, None, [executor.submit(_backtrack_matches, assembly_id, candidates)]))
+          continue
+        size = len(asm_list) if span is None else chunk_size
+        if size is None:
+          size = max(AssemblyMatcher.MIN_CHUNK_SIZE, -(-len(asm_list) // jobs))
+        bounds = list(range(0, len(asm_list), max(size, 1))) + [len(asm_list)]
+        futures = []
+        for begin, end in zip(bounds, bounds[1:]):
+          chunk_candidates = None
+          if candidates is not None:
+            chunk_candidates = candidates[bisect.bisect_left(candidates, begin):bisect.bisect_left(candidates, end)]
+          futures.append(executor.submit(_search_chunk, assembly_id, begin, end, chunk_candidates))
+        tasks.append((candidates, bounds, futures))
+      for assembly_id, (candidates, bounds, futures) in zip(assembly_ids, tasks):
+        asm_list = self.asms[assembly_id]
+        if bounds is None:
+          results.append([[asm_list[i] for i in match] for match in futures[0].result()])
+          continue
+        spans = AssemblyMatcher._merge_chunks(automaton, asm_list, candidates, bounds,
+            [future.result() for future in futures])
+        results.append([[asm_list[i] for i in range(start, end)] for start, end in spans])
+    return results
+
+  @staticmethod
+  def _merge_chunks(automaton, asm_list, candidates, bounds, chunk_spans):
+    """Merges the matches of consecutive chunks into the matches of a sequential search
+    
+    A chunk's search started at its first index, but the sequential search may only restart later, after a match
+    that runs into the chunk. The chunk's matches that start before that restart point are dropped. If the restart
+    point lies within such a match, the chunk's search never tried to start there, so matching is redone from the
+    restart point up to the end of that match, after which both searches continue at the same index.
+    :param automaton: the PatternAutomaton of the pattern
+    :param asm_list: the complete list of assembly objects
+    :param candidates: the start candidates of the pattern (see start_candidates)
+    :param bounds: first start index of every chunk, followed by the length of asm_list
+    :param chunk_spans: per chunk, its matches as (start, end) index pairs in asm_list
+    :return: list of the merged matches as (start, end) index pairs
+    """
+    merged = []
+    restart = 0  # next start index of the sequential search
+    for chunk_end, spans in zip(bounds[1:], chunk_spans):
+      for start, end in spans:
+        follow = end if end > start else start + 1  # where the search restarts after this match
+        if start >= restart:
+          merged.append((start, end))
+          restart = follow
+          continue
+        if restart < follow:
+          for resync in automaton.search(asm_list, begin=restart, end=follow, candidates=candidates):
+            merged.append(resync)
+            restart = resync[1] if resync[1] > resync[0] else resync[0] + 1
+          restart = max(restart, follow)
+      restart = max(restart, chunk_end)  # the chunk tried every start index up to its end
+    return merged
     
 
   def find_matches(self, pattern="main", assembly_id = 0):
@@ -170,28 +351,160 @@ class AssemblyMatcher ( object ) :
     :return: list of matches (match == list of assembly instructions)
     """
     assert(pattern in self.patterns)
+    candidates = self.start_candidates(pattern=pattern, assembly_id=assembly_id)
+    if self.automata.get(pattern) is not None:
+      return self.automata[pattern].match_all(self.asms[assembly_id], candidates=candidates)
     matcher = AssemblyMatcherIterator(self.patterns[pattern],
         asm_list = self.asms[assembly_id], address_map = self.address_maps[assembly_id])
     self.l.debug("Matcher created. ")
-    return matcher.match_all()
+    return matcher.match_all(candidates=candidates)
+
+  def match_many(self, patterns=None, assembly_id = 0):
+    """
+    Matches several loaded patterns in a single pass over the given loaded assembly code
+    
+    Every instruction is visited once and only handed to the patterns that are in the middle of a match,
+    or that can start with its opcode (see PatternAutomaton.first_opcodes). Patterns that are not compiled
+    into an automaton (i.e. with constraints) are matched one by one by backtracking.
+    :param patterns: list of names of the loaded patterns to match, None for all loaded patterns
+    :param assembly_id: which loaded binary to match on. Typically 0 is main binary, 0< is for libs etc.
+    :return: dict from pattern name to its list of matches, the same as find_matches
+    """
+    if patterns is None:
+      patterns = list(self.patterns.keys())
+    asm_list = self.asms[assembly_id]
+    results = dict()
+    scans = dict()
+    checks = dict()  # AsmPP key -> _SharedCheck, so equal pieces of different patterns are checked once
+    dispatch = dict()  # opcode -> scans of the patterns that can start with it
+    anywhere = []  # scans of the patterns that can start at any instruction
+    for pattern in patterns:
+      assert(pattern in self.patterns)
+      if self.automata.get(pattern) is None:
+        results[pattern] = self.find_matches(pattern=pattern, assembly_id=assembly_id)
+        continue
+      automaton = self.automata[pattern]
+      pieces = [None] * len(automaton)
+      for pc in range(0, len(automaton)):
+        if automaton.ops[pc] == PatternAutomaton.CONSUME:
+          pieces[pc] = checks.setdefault(automaton.x[pc].key(), _SharedCheck(automaton.x[pc]))
+      scans[pattern] = AutomatonScan(automaton, asm_list, pieces=pieces)
+      if self.first_opcodes[pattern] is None:
+        anywhere.append(scans[pattern])
+      else:
+        for opcode in self.first_opcodes[pattern]:
+          dispatch.setdefault(opcode, []).append(scans[pattern])
+    self.l.debug('Matching %d patterns in one pass' % len(scans))
+    active = []  # scans with a match in progress
+    for pos in range(0, len(asm_list)):
+      woken = [scan for scan in anywhere + dispatch.get(opcode_at(asm_list, pos), []) if scan.idle()]
+      for scan in woken:
+        scan.pos = pos  # an idle scan skipped the instructions it cannot start with
+      stepping = active + woken
+      for scan in stepping:
+        scan.run(pos + 1)
+      active = [scan for scan in stepping if not scan.idle()]
+    for scan in active:
+      scan.run()
+    for pattern, scan in scans.items():
+      results[pattern] = [[asm_list[i] for i in range(start, end)] for start, end in scan.matches]
+    return {pattern: results[pattern] for pattern in patterns}
+
+  def start_candidates(self, pattern="main", assembly_id = 0):
+    """
+    Returns the indices a match of the pattern can start at, using the opcode index of the assembly
+    
+    :param pattern: The name of the loaded pattern
+    :param assembly_id: which loaded binary to match on
+    :return: ascending list of indices in the asmlist, None if a match can start at any index
+    """
+    first_opcodes = self.first_opcodes.get(pattern)
+    if first_opcodes is None:
+      return None
+    if assembly_id >= len(self.opcode_indices):  # assembly not loaded by a loader
+      self.opcode_indices.extend(build_opcode_index(asm) for asm in self.asms[len(self.opcode_indices):])
+    opcode_index = self.opcode_indices[assembly_id]
+    candidates = []
+    for opcode in first_opcodes:
+      candidates.extend(opcode_index.get(opcode, []))
+    candidates.sort()
+    self.l.debug('%d of %d instructions can start a match' % (len(candidates), len(self.asms[assembly_id])))
+    return candidates
+
+
+
+# state of the worker processes of AssemblyMatcher.find_matches_parallel, see _init_worker
+_worker_pattern = None
+_worker_automaton = None
+_worker_asms = None
+_worker_address_maps = None
+
+
+def _init_worker(patternList, automaton, asms, address_maps):
+  """Initialises a worker of find_matches_parallel with the pattern and the loaded binaries, so the tasks
+  only contain indices"""
+  global _worker_pattern, _worker_automaton, _worker_asms, _worker_address_maps
+  _worker_pattern = patternList
+  _worker_automaton = automaton
+  _worker_asms = asms
+  _worker_address_maps = address_maps
 
 
+def _search_chunk(assembly_id, begin, end, candidates):
+  """Worker of find_matches_parallel: the matches of the automaton that start in [begin, end)"""
+  return _worker_automaton.search(_worker_asms[assembly_id], begin=begin, end=end, candidates=candidates)
+
+
+def _backtrack_matches(assembly_id, candidates):
+  """Worker of find_matches_parallel: all matches by backtracking, as lists of indices in the asm list"""
+  address_map = _worker_address_maps[assembly_id]
+  matcher = AssemblyMatcherIterator(_worker_pattern, asm_list = _worker_asms[assembly_id], address_map = address_map)
+  return [[address_map[asm['addr']] for asm in match] for match in matcher.match_all(candidates=candidates)]
+
+
+class _SharedCheck ( object ):
+  """Wraps an AsmPP for AssemblyMatcher.match_many and remembers its result on the last instruction.
+
+  All scans that check equal pieces on the same instruction (in the same step of the pass) get one AsmPP check.
+  """
+  __slots__ = ['piece', 'index', 'result']
+
+  def __init__(self, piece):
+    self.piece = piece
+    self.index = -1
+    self.result = False
+
+  def match_at(self, asmlist, index):
+    if index != self.index:
+      self.index = index
+      self.result = self.piece.match_at(asmlist, index)
+    return self.result
+
 
 class AssemblyMatcherIterator ( object ) :
   """Class to match an assembly regex to a list of assembly objects
   
   :attr l: AsmRegex logger
   :attr pattern: assembly regex
-  :attr asm: list of assemply objects
-  :attr amap: a mapping from the assembly offset/address to the index in the asmlist, used for e.g. jumps
+  :attr asm: list of assemply objects or InstructionTable
+  :attr amap: a mapping from the assembly offset/address to the index in the asmlist (dict or AddressIndex),
+        used for e.g. jumps
   :attr pptr: "pattern pointer" to the current location in the pattern to be matched
   :attr asmptr: "asm pointer" to the current location in the assembly list to be matched
-  :attr unexplored: list of states that have been stored for later matching due to a choice in matching (repetition)
+  :attr unexplored: stack of states that have been stored for later matching due to a choice in matching (repetition)
         i.e. when using '?', you can either match one or continue without matching, the other gets stored here.
+        A state is a tuple (startptr, asmptr, tracker_stack, asmatch, bindings, pptr).
   :attr startptr: pointer to the first assembly object where matching started
-  :attr tracker_stack: list/stack of Begin/End trackers while matching
-  :attr asmatch: list of the current assembly object being matched
+  :attr tracker_stack: stack of Begin/End trackers while matching, as an immutable linked list of
+        (tracker, amount of full repetitions done, rest of the stack) tuples, None when empty
+  :attr asmatch: the indices of the assembly objects matched so far, as an immutable linked list of
+        (index, rest of the match) tuples in reverse order, None when empty
+  :attr bindings: dict from constraint name to the operand (part) bound to it so far, see AsmPP.match_bound.
+        It is never modified, only replaced (copy on write).
   :attr matches: list of succesful matches
+
+  The tracker stack, the match and the bindings are never modified, only replaced, so saving and restoring a
+  state does not copy anything.
   """
 
   def __init__(self, patternList, asm_list = None, address_map = None):
@@ -209,123 +522,116 @@ class AssemblyMatcherIterator ( object ) :
     self.asmptr = 0
     self.unexplored = [] 
     self.startptr = 0 
-    self.tracker_stack = []
-    self.asmatch = []
+    self.tracker_stack = None
+    self.asmatch = None
+    self.bindings = dict()
     self.matches = []
 
-  def _print_trackerstack(self, trackerstack):
-    stacks = str(trackerstack[0].subno)
-    for i in range(1, len(trackerstack)):
-      stacks += ', ' + str(trackerstack[i].subno)
-    self.l.debug('Tracker stack ids: ' + stacks)
-    self.l.debug('Tracker stack size: ' + str(len(trackerstack)))
+  def _print_trackerstack(self, tracker_stack):
+    frames = []
+    while tracker_stack is not None:
+      frames.append(str(tracker_stack[0].subno) + ':' + str(tracker_stack[1]))
+      tracker_stack = tracker_stack[2]
+    self.l.debug('Tracker stack ids (top first): ' + ', '.join(frames))
+    self.l.debug('Tracker stack size: ' + str(len(frames)))
 
     
   def _print_unexplored(self):
     # PRINTS DEBUG INFO
     for j in range(0, len(self.unexplored)):
       self.l.debug('On unexplored ' + str(j))
-      self._print_trackerstack(self.unexplored[j]['tracker_stack'])
+      self._print_trackerstack(self.unexplored[j][2])
 
+  def _asmatch_list(self):
+    """Returns the assembly objects matched so far, in matching order"""
+    indices = []
+    node = self.asmatch
+    while node is not None:
+      indices.append(node[0])
+      node = node[1]
+    indices.reverse()
+    return [self.asm[i] for i in indices]
 
-  def _copy_trackerstack(self):
-    """ didn't work properly before, so keeping this code just in case for now
-    tracker_stack_copy = list()
-    for tracker in self.tracker_stack:
-      tracker_copy = copy.deepcopy(tracker)
-      tracker_stack_copy.append(tracker_copy)
-      self.l.info('Copying tracker: ' + str(tracker.subno))
-    self.l.debug(str(len(tracker_stack_copy)) + ' trackers copied ')
-    """
-    return copy.deepcopy(self.tracker_stack)
-
-  def _save_unexplored_state(self, tracker, start=False):
-    """Saves the unprioritised state, taking into account laziness of the subpattern
+  def _save_unexplored_state(self):
+    """Saves the unprioritised state of the choice given by the tracker on top of the tracker stack,
+    taking into account laziness of the subpattern
     
-    :param tracker: tracker of the subpattern that gave the choice
-    :param start: boolean telling whether this is at the beginning of the first match (on minimum repetition 0, like *?)
     :return: None
     """
-    state = dict() 
-    state['startptr'] = self.startptr
-    state['asmptr'] = self.asmptr
-    tracker_stack_copy = self._copy_trackerstack()
-    state['tracker_stack'] = tracker_stack_copy
-    state['asmatch'] = copy.copy(self.asmatch)  # No deepcopy needed as these are immutable
-    state['pptr'] = tracker.get_alternative_pptr() + 1  # +1 is because normally it gets updated after this next_match
-    if type(tracker) is RepetitionTracker and tracker.loop_priority():
-      # is greedy repetition , so save the lazy one for later
-      state['tracker_stack'].pop()  # remove the loop
-    elif not start:
-      state['tracker_stack'][-1].update()  # update the tracker, we did a full iteration
-    self.unexplored.append(state)
-    self.l.debug('From _save_state (end):')
-    self._print_unexplored()
+    tracker, count, rest = self.tracker_stack
+    tracker_stack = self.tracker_stack
+    if type(tracker) is RepetitionTracker:
+      pptr = tracker.alternative_pptr_after(count)
+      if tracker.loop_priority_after(count):
+        # is greedy repetition , so save the lazy one for later
+        tracker_stack = rest  # remove the loop
+      # a lazy repetition saves the loop; its count has already been updated for the full iteration in _check_end
+    else:
+      pptr = tracker.get_alternative_pptr()
+    # +1 is because normally it gets updated after this next_match
+    self.unexplored.append((self.startptr, self.asmptr, tracker_stack, self.asmatch, self.bindings, pptr + 1))
+    if self.l.isEnabledFor(logging.DEBUG):
+      self.l.debug('From _save_state (end):')
+      self._print_unexplored()
 
   def _pop_unexplored_state(self):
     """Retrieves the saved, unexplored state as the own state to explore
     
     :return: None
     """
-    self.l.debug('From pop_state (begin):')
-    self._print_unexplored()
-    state = self.unexplored.pop() 
-    self.startptr = state['startptr']
-    self.asmptr = state['asmptr']
-    # mind that the objects don't align with 'end' anymore!
-    self.tracker_stack = state['tracker_stack'] 
-    self.asmatch = state['asmatch']
-    self.pptr = state['pptr']
-    self.l.debug('Popped to ' + str(self.pptr))
-    
-    return 
+    if self.l.isEnabledFor(logging.DEBUG):
+      self.l.debug('From pop_state (begin):')
+      self._print_unexplored()
+    self.startptr, self.asmptr, self.tracker_stack, self.asmatch, self.bindings, self.pptr = self.unexplored.pop()
+    self.l.debug('Popped to %d', self.pptr)
 
   def _check_begin(self):
     """Gets executed at a "Begin" PatternPiece, handles what needs to be done (e.g. checking for skips on repeat=*)
     
     :return: None
     """
-    tracker = self.pattern[self.pptr].tracker.reset()
+    tracker = self.pattern[self.pptr].tracker
     assert(type(tracker) is RepetitionTracker)
-    self.tracker_stack.append(tracker)
+    self.tracker_stack = (tracker, 0, self.tracker_stack)
     # check if no-repeat is allowed first 
     # Maybe need to check if allowed, but {0,0} repeat doesn't make sense
-    if not tracker.forced: 
+    if not tracker.forced_after(0):
       # Save the looping state and take the preferred one
-      self._save_unexplored_state(tracker, start=True)
+      self._save_unexplored_state()
       if tracker.is_lazy:  # greedy one is saved, jump towards after the match
         self.l.debug('Lazy skip jump')
         self.pptr = tracker.end
-        self.tracker_stack.pop()  # remove the tracker on a jump as we're not looping this one anymore
+        self.tracker_stack = self.tracker_stack[2]  # remove the tracker on a jump as we're not looping this one anymore
         
   def _check_or(self):
     """Gets executed at an "Or" PatternPiece, saving the alternative or and saving the tracker"""
-    tracker = self.pattern[self.pptr].tracker.reset()
+    tracker = self.pattern[self.pptr].tracker
     assert(type(tracker) is OrTracker)
-    self.tracker_stack.append(tracker)
-    self._save_unexplored_state(tracker, start=True)
+    self.tracker_stack = (tracker, 0, self.tracker_stack)
+    self._save_unexplored_state()
 
   def _check_end(self):
     """Gets executed at an "End" PatternPiece, handles what needs to be done (e.g. check for repetitions)
     
     :return: None
     """
-    if len(self.tracker_stack) == 0:
+    if self.tracker_stack is None:
       raise RuntimeError('End PatternPiece detected on an empty tracker stack.')
-    tracker = self.tracker_stack[-1]
+    tracker, count, rest = self.tracker_stack
     if type(tracker) is OrTracker:
       self.pptr = tracker.get_preferred_pptr()
-      self.tracker_stack.pop()
+      self.tracker_stack = rest
     elif type(tracker) is RepetitionTracker:
-      tracker.update() # we're at the end so did one full match
-      if tracker.choice(): # save
-        self.l.debug('Potential end of tracker #' + str(tracker.subno))
-        self._save_unexplored_state(tracker)
+      count += 1  # we're at the end so did one full match
+      self.tracker_stack = (tracker, count, rest)
+      if tracker.choice_after(count): # save
+        self.l.debug('Potential end of tracker #%s', tracker.subno)
+        self._save_unexplored_state()
       else:
-        self.l.debug('No choice on tracker #' + str(tracker.subno))
-      self.pptr = tracker.get_preferred_pptr()
-      if not tracker.loop_priority():
-        self.tracker_stack.pop()
+        self.l.debug('No choice on tracker #%s', tracker.subno)
+      self.pptr = tracker.preferred_pptr_after(count)
+      if not tracker.loop_priority_after(count):
+        self.tracker_stack = rest
     else:
       raise RuntimeError("Unknown tracker type: " + str(type(tracker)))
 
@@ -348,15 +654,15 @@ class AssemblyMatcherIterator ( object ) :
     
     :return: True on a jump, False otherwise
     """
-    asm = self.asm[self.asmptr]
-    if asm['opcode'][0] not in 'jcr': # jump* call ret 
+    opcode = opcode_at(self.asm, self.asmptr)
+    if opcode[0] not in 'jcr': # jump* call ret 
       self.asmptr += 1
       return False 
-    #  if asm['opcode'] == 'jmp': # unconditional, dont automatically jump, only when specified
-    #  return self._asm_jmp(asm['args'][0])
-    if asm['opcode'][0] == 'j' and self.pattern[self.pptr].jmp:
+    #  if opcode == 'jmp': # unconditional, dont automatically jump, only when specified
+    #  return self._asm_jmp(args_at(self.asm, self.asmptr)[0])
+    if opcode[0] == 'j' and self.pattern[self.pptr].jmp:
       # conditional jump
-      return self._asm_jmp(asm['args'][0])
+      return self._asm_jmp(args_at(self.asm, self.asmptr)[0])
     # TODO: Add if call / return + stack 
     self.asmptr += 1 
     return False
@@ -370,9 +676,11 @@ class AssemblyMatcherIterator ( object ) :
       return False
     asmPiece = self.pattern[self.pptr]
     assert(type(asmPiece) is AsmPP)
-    match = asmPiece.match(self.asm[self.asmptr]) 
+    bindings = asmPiece.match_bound(self.asm, self.asmptr, self.bindings)
+    match = bindings is not None
     if match: 
-      self.asmatch.append(self.asm[self.asmptr])
+      self.asmatch = (self.asmptr, self.asmatch)
+      self.bindings = bindings
     self._move_asmptr()
     return match
 
@@ -381,8 +689,9 @@ class AssemblyMatcherIterator ( object ) :
     
     :return: True on match, False on a non-match
     """
-    self.l.debug("Next Match on " + str(self.pptr) + \
-        " -> " + str(self.pattern[self.pptr].Type))
+    if self.l.isEnabledFor(logging.DEBUG):
+      self.l.debug("Next Match on " + str(self.pptr) + \
+          " -> " + str(self.pattern[self.pptr].Type))
     if self.pattern[self.pptr].Type == PPType.BEGIN:
       self._check_begin() 
       return True 
@@ -430,7 +739,7 @@ class AssemblyMatcherIterator ( object ) :
         self.l.debug(
           "Match found! " + (str(max) if max is not None else "all") + " matches to go on start "+ str(self.startptr)
         )
-        self.matches.append(copy.copy(self.asmatch))
+        self.matches.append(self._asmatch_list())
       if len(self.unexplored) > 0: 
         self._pop_unexplored_state()
         new_state = True 
@@ -447,10 +756,11 @@ class AssemblyMatcherIterator ( object ) :
     self.pptr = 0
     self.asmptr = self.startptr
     self.unexplored = [] 
-    self.tracker_stack = []
-    self.asmatch = [] 
+    self.tracker_stack = None
+    self.asmatch = None
+    self.bindings = dict()
  
-  def match_all(self):
+  def match_all(self, candidates=None):
     """Returns all matches it could find.
     
     Max 1 match per start pointer.
@@ -458,6 +768,7 @@ class AssemblyMatcherIterator ( object ) :
     This is a terrible idea if you're matching unconditional jumps (where the jump is taken within pattern matching)
     Or any kind of jump / call / ret once this is implemented.
     Just an FYI
+    :param candidates: ascending list of the only start pointers a match can begin at, None to try all of them
     :return: List of all the matches
     """
     self.l.debug("Match all on regex of size " + str(len(self.pattern))) 
@@ -465,7 +776,14 @@ class AssemblyMatcherIterator ( object ) :
       raise RuntimeError( "I don't have both an asmregex and a binary yet!" )
     start = 0 # need to be able to jump the loop
     while start < len(self.asm):
-      self.l.debug('Matching next start pointer: ' + str(start) + ' @ ' + '0x%08x\t' % self.asm[start]['addr'] )
+      if candidates is not None:
+        # skip the start pointers that cannot match
+        k = bisect.bisect_left(candidates, start)
+        if k == len(candidates):
+          break
+        start = candidates[k]
+      if self.l.isEnabledFor(logging.DEBUG):  # avoids creating the assembly object of an InstructionTable
+        self.l.debug('Matching next start pointer: ' + str(start) + ' @ ' + '0x%08x\t' % self.asm[start]['addr'] )
       self.startptr = start 
       self.reset_state()
       failed = self.match_from_start() # max 1 per starting point
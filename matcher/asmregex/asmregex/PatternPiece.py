@@ -5,9 +5,13 @@ __author__ = 'jordygennissen'
 
 # global 
 from enum import Enum
+import functools
 import logging
 import re
 
+# local
+from asmregex.Assembly import InstructionTable, opcode_at, args_at
+
 class PatternConstraintType(Enum):
     CONSTRAINT_TYPE_ASSIGN = 0
     CONSTRAINT_TYPE_CHECK_EQ = 1
@@ -48,24 +52,6 @@ class PatternConstraint:
   def id(self) -> str:
     return self.name
 
-class PatternConstraintStateStorage():
-  def __init__(self) -> None:
-    self.statestorage: Dict[str, str] = dict()
-
-  def reset_state(self, constraint: PatternConstraint) -> None:
-    del self.statestorage[constraint.id()]
-  
-  def set_state(self, constraint: PatternConstraint, state: str) -> None:
-    self.statestorage[constraint.id()] = state
-
-  def get_state(self, constraint: PatternConstraint) -> str:
-    constraint_id: str = constraint.id()
-    if constraint_id not in self.statestorage:
-      raise RuntimeError("PatternConstraint: Tried to get empty state. Make sure to have an assign constraint (=) before using the corresponding check constriant (!).")
-    return self.statestorage[constraint_id]
-
-constraint_state_storage: PatternConstraintStateStorage = PatternConstraintStateStorage()
-
 class PPType( Enum ):
   """Enumeration for the types of pieces inside an assembly regex """
   ASM = 0
@@ -115,8 +101,8 @@ class OrTracker( PatternPieceTracker ):
     return state
 
   def __setstate__(self, state):
-  # Restore instance attributes (i.e., filename and lineno).
-    pass
+    # Restore instance attributes (i.e., filename and lineno).
+    self.__dict__.update(state)
   
   def reset(self):
     """ Returns self, as this tracker is stateless at runtime """
@@ -316,6 +302,38 @@ class RepetitionTracker( PatternPieceTracker ):
     self.set_minmax(self.staticmin, self.staticmax)
     return self
 
+  # The functions below are the stateless counterparts of forced, allowed, choice() etc., used by the matcher:
+  # instead of updating min and max, it keeps the amount of full repetitions done (count) next to the tracker.
+
+  def forced_after(self, count):
+    """Returns whether another repetition is required after count full repetitions (see forced)"""
+    return bool(self.staticmin) and count < self.staticmin
+
+  def allowed_after(self, count):
+    """Returns whether another repetition is allowed after count full repetitions (see allowed)"""
+    return not self.staticmax or count < self.staticmax
+
+  def choice_after(self, count):
+    """Returns if we are allowed to both continue or repeat after count full repetitions (see choice())"""
+    return self.allowed_after(count) and not self.forced_after(count)
+
+  def loop_priority_after(self, count):
+    """Returns whether another repetition should be done after count full repetitions (see loop_priority())"""
+    if self.choice_after(count):
+      return not self.lazy
+    return self.forced_after(count)
+
+  def preferred_pptr_after(self, count):
+    """Returns the next pattern pointer to use minus one after count full repetitions (see get_preferred_pptr())"""
+    if not self.allowed_after(count) or self.lazy and not self.forced_after(count):
+      return self.end
+    return self.begin
+
+  def alternative_pptr_after(self, count):
+    """Returns the pptr value of the not preferred try after count full repetitions (see get_alternative_pptr())"""
+    assert(self.choice_after(count))
+    return self.begin if self.lazy else self.end
+
 class BeginPP ( PatternPiece ):
   """BeginPP is a PatternPiece denoting the beginning of a new subpattern
 
@@ -368,6 +386,10 @@ class AsmPP ( PatternPiece ):
   :attr args: max-2-element list of object containing a match(string) function (typically a precompiled regex) or None.
   :attr invert_arg: 2-element boolean list, telling whether any regex match should be logically inverted. Default False.
   :attr jmp: whether it should jump to the given address on a conditional jump after matching. Unused so far
+  :attr opcode_set: frozenset of opcode, as compiled by _compile()
+  :attr arg_checks: list of (index, regex, invert) for the argument conditions, as compiled by _compile()
+  :attr bound_checks: list of (argument index, name) of the equality constraints, as compiled by _compile()
+  :attr static ARG_MEMO_SIZE: the maximum number of operand tuples of which the argument check result is memoized
   :attr l: the AsmRegex logger
   :attr Type: inherited type specifying this is a PPType.ASM piece
   """
@@ -415,6 +437,7 @@ class AsmPP ( PatternPiece ):
       "ARMST" : ["str", "strb", "strh","stur", "sturb", "sturh","stp", "stnp", "stlr", "stlrb", "stlrh", "stlxp", "stlxr", "stlxrb", "stlxrh", "sttr", "sttrb", "sttrh", "stxp", "stxr", "stxrb", "stxrh"],
   }
   anylist = ['any']
+  ARG_MEMO_SIZE = 4096
 
   # patternstr should be a string as defined, either including or excluding the delimiting <>
   # EVERY PATTERN MUST END WITH A DOT AND POSSIBLE OPTIONS!
@@ -441,32 +464,60 @@ class AsmPP ( PatternPiece ):
     split.pop()
     for arg_idx in range(1, len(split)):
       self._parse_arg_append(split[arg_idx])
+    self._compile()
     
   # @staticmethod
   # def _match_regex(string, regex):
   #   match = regex.match(string)
   #   return match is not None
 
-  def _match_arg(self, index, asmobj) -> Tuple[bool, Optional[re.Match]]:
-    match_invert_arg = True if (index in self.invert_arg) and (self.invert_arg[index] == True) else False
-    self.l.debug('Matching arg-condition on arg ' + str(index+1))
-    self.l.debug(f"Pattern: {str(self.args)} vs ASM: {str(asmobj['args'])}")
-    if index >= len(self.args):
-      return (False, None)
-    if self.args[index] is None:
-      return (True, None)
-    if index >= len(asmobj['args']):
-      return (False, None)
-    if asmobj['args'][index] is None:
-      return (match_invert_arg, None)
-    if hasattr(self.args[index], "match") and callable(getattr(self.args[index], "match")):
-      # Python parsed Regex object
-      # include the arg invert option
-      match: re.Match = self.args[index].match(asmobj['args'][index])
-      return (xor(match is not None, match_invert_arg), match)
-    else:
-      raise NotImplementedError ( "Object has no match function." )
+  def _compile(self):
+    """Compiles the parsed placeholder into the checks used by match_instruction.
+
+    The opcodes become a frozenset, and the argument conditions a list of (index, regex, invert) checks that is
+    memoized per tuple of operands (see _check_args), as binaries repeat the same operands over and over.
+    """
+    self.match_any_opcode = self.opcode[0] == 'any' and not self.invert_opcode
+    self.opcode_set = frozenset(self.opcode)
+    self.arg_checks = [(index, arg, self.invert_arg.get(index, False))
+                       for index, arg in enumerate(self.args) if arg is not None]
+    for index, arg, invert in self.arg_checks:
+      if not (hasattr(arg, "match") and callable(getattr(arg, "match"))):
+        raise NotImplementedError ( "Object has no match function." )
+    self.bound_checks = [(constraint.arg_idx, constraint.id()) for constraint in self.constraints
+                         if constraint.ctype == PatternConstraintType.CONSTRAINT_TYPE_CHECK_EQ]
+    self._check_args_memo = functools.lru_cache(maxsize=AsmPP.ARG_MEMO_SIZE)(self._check_args)
 
+  def __getstate__(self):
+    # the memo is bound to this object, it is rebuilt by _compile()
+    state = self.__dict__.copy()
+    del state['_check_args_memo']
+    return state
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self._compile()
+
+  def _check_args(self, args):
+    """Checks the argument conditions on a tuple of operands (without constraints), see _check_args_memo
+
+    :param args: tuple of the operands of an instruction, cut off after the last argument condition
+    :return: dict from argument index to its re.Match object on a match, None if it didn't match
+    """
+    match_per_arg_idx: Dict[int, re.Match] = dict()
+    for index, arg, invert in self.arg_checks:
+      if index >= len(args):
+        return None
+      if args[index] is None:
+        if not invert:
+          return None
+        match_per_arg_idx[index] = None
+        continue
+      match = arg.match(args[index])
+      if (match is not None) == invert:
+        return None
+      match_per_arg_idx[index] = match
+    return match_per_arg_idx
 
   def match(self, asmobj):
     """Tries to match the assembly object to its known expression
@@ -474,59 +525,122 @@ class AsmPP ( PatternPiece ):
     :param asmobj: asmobj dict as used throughout the code
     :return: True on a match, False if it didn't match
     """
-    self.l.debug("Check if '" + asmobj['opcode'] + "' is in " + str(self.opcode) )
-    if self.opcode[0] == 'any' and not self.invert_opcode:
-      self.l.debug('Anything is possible')
-    elif xor(not asmobj['opcode'] in self.opcode, self.invert_opcode):  # Add the match invert possibility using xor
-      return False
+    return self.match_instruction(asmobj['opcode'], asmobj['args'])
 
-    match_per_arg_idx: Dict[int, re.Match] = dict()
-    for arg_idx, arg in enumerate(self.args):
-      if arg is None:
-        continue
-      match_success, match = self._match_arg(arg_idx, asmobj)
-      if not match_success:
-        if arg_idx < len(asmobj['args']):
-          self.l.debug('Not a match on arg ' + str(arg_idx) + ' "' + str(asmobj['args'][arg_idx]) + '"')
-        else:
-          self.l.debug('Not a match on arg ' + str(arg_idx) + ', there is no such arg.')
-        return False
-      else:
-        self.l.debug('Match success on ' + asmobj ['args'][arg_idx])
-      match_per_arg_idx[arg_idx] = match
+  def match_at(self, asmlist, index):
+    """Tries to match the instruction at index of a list of assembly objects or an InstructionTable.
+
+    Instructions of an InstructionTable are matched on its columns, without creating an assembly object.
+    :param asmlist: list of assembly objects or InstructionTable
+    :param index: index of the instruction in asmlist
+    :return: True on a match, False if it didn't match
+    """
+    if isinstance(asmlist, InstructionTable):
+      # only look up the arguments if the opcode matches
+      return self._match_opcode(asmlist.opcode_at(index)) and self._match_args(asmlist.args_at(index))
+    return self.match(asmlist[index])
+
+  def match_bound(self, asmlist, index, bindings):
+    """Tries to match the instruction at index (see match_at), given the constraint bindings of the matcher state
+
+    The bindings are never modified: a match that assigns a constraint returns a new dict (copy on write), so
+    the matcher can keep the bindings of every state it may backtrack to without copying them.
+    :param asmlist: list of assembly objects or InstructionTable
+    :param index: index of the instruction in asmlist
+    :param bindings: dict from constraint name to the bound operand (part) of the current matcher state
+    :return: the bindings after matching the instruction (bindings itself if nothing got assigned) on a match,
+             None if it didn't match
+    """
+    if not self.constraints:
+      return bindings if self.match_at(asmlist, index) else None
+    if not self._match_opcode(opcode_at(asmlist, index)):
+      return None
+    return self._bind_args(args_at(asmlist, index), bindings)
+
+  def match_instruction(self, opcode, args):
+    """Tries to match an instruction, given by its opcode and arguments, to its known expression
+
+    :param opcode: opcode string
+    :param args: list of argument strings
+    :return: True on a match, False if it didn't match
+    """
+    return self._match_opcode(opcode) and self._match_args(args)
+
+  def _match_opcode(self, opcode):
+    if self.match_any_opcode:
+      return True
+    # Add the match invert possibility
+    return (opcode in self.opcode_set) != self.invert_opcode
+
+  def _match_args(self, args):
+    """Matches the argument conditions and the constraints, the latter without any bindings (see match_bound)"""
+    if not self.constraints:
+      return not self.arg_checks or self._check_args_memo(tuple(args[:len(self.args)])) is not None
+    return self._bind_args(args, dict()) is not None
+
+  def _bind_args(self, args, bindings):
+    """Matches the argument conditions and the constraints, given the constraint bindings so far
+
+    An assign constraint binds its name to the capture group, an equality or inequality constraint compares the
+    capture group to the bound one. A constraint on a name that is not bound (yet) does not match.
+    :param args: list of argument strings
+    :param bindings: dict from constraint name to the bound operand (part), is not modified
+    :return: the bindings after matching on a match, None if it didn't match
+    """
+    debug = self.l.isEnabledFor(logging.DEBUG)
+    # the capture group of an equality constraint is part of the operand, so it can only be equal to the bound
+    # value if the operand contains it: cheaper to check than the argument conditions
+    for arg_idx, name in self.bound_checks:
+      bound = bindings.get(name)
+      if isinstance(bound, str) and arg_idx < len(args) and isinstance(args[arg_idx], str) \
+          and bound not in args[arg_idx]:
+        return None
+    match_per_arg_idx = self._check_args_memo(tuple(args[:len(self.args)]))
+    if match_per_arg_idx is None:
+      if debug:
+        self.l.debug(f"Not a match: pattern {str(self.args)} vs ASM: {str(args)}")
+      return None
     
     # check constraints
-    self.l.debug("checking constraints...")
+    copied = False
     for constraint in self.constraints:
       # get match object for the constrained arg_idx
       if not constraint.arg_idx in match_per_arg_idx:
-        self.l.debug("constrained argument does not provide a match object to compare with.")
-        return False
+        if debug:
+          self.l.debug("constrained argument does not provide a match object to compare with.")
+        return None
       match: re.Match = match_per_arg_idx[constraint.arg_idx]
       # get contents of constrained capture group
       match_data: str = match.group(constraint.capture_group)
 
-      # store data in / compare data with global constraint state storage
       if constraint.ctype == PatternConstraintType.CONSTRAINT_TYPE_ASSIGN:
-        # put match_data into the global constraint state store
-        constraint_state_storage.set_state(constraint, match_data)
-        self.l.debug(f"Stored constraint state: {str(constraint)} -> {match_data}")
+        if not copied:  # copy on write
+          bindings = dict(bindings)
+          copied = True
+        bindings[constraint.id()] = match_data
+        if debug:
+          self.l.debug(f"Bound constraint: {str(constraint)} -> {match_data}")
       elif constraint.ctype in [PatternConstraintType.CONSTRAINT_TYPE_CHECK_EQ, PatternConstraintType.CONSTRAINT_TYPE_CHECK_NEQ]:
-        stored_data = constraint_state_storage.get_state(constraint)
-        if stored_data == match_data and constraint.ctype == PatternConstraintType.CONSTRAINT_TYPE_CHECK_NEQ:
-          self.l.debug(f"Constraint state mismatch for {str(constraint)}: {stored_data} == {match_data}")
-          self.l.debug(f"No match!")
-          return False
-        elif stored_data != match_data and constraint.ctype == PatternConstraintType.CONSTRAINT_TYPE_CHECK_EQ:
-          self.l.debug(f"Constraint state mismatch for {str(constraint)}: {stored_data} != {match_data}")
-          self.l.debug(f"No match!")
-          return False
-        elif stored_data == match_data and constraint.ctype == PatternConstraintType.CONSTRAINT_TYPE_CHECK_EQ:
-          self.l.debug(f"Constraint state match for {str(constraint)}: {stored_data} == {match_data}")
-        elif stored_data != match_data and constraint.ctype == PatternConstraintType.CONSTRAINT_TYPE_CHECK_NEQ:
-          self.l.debug(f"Constraint state match for {str(constraint)}: {stored_data} != {match_data}")
-
-    return True  # it made it past all checks!
+        if constraint.id() not in bindings:
+          if debug:
+            self.l.debug(f"Constraint {str(constraint)} is not bound")
+          return None
+        bound_data = bindings[constraint.id()]
+        if (bound_data == match_data) != (constraint.ctype == PatternConstraintType.CONSTRAINT_TYPE_CHECK_EQ):
+          if debug:
+            self.l.debug(f"Constraint mismatch for {str(constraint)}: {bound_data} vs {match_data}")
+          return None
+
+    return bindings  # it made it past all checks!
+
+  def key(self):
+    """Returns a hashable summary of the opcode and argument conditions.
+
+    Pieces with the same key match the same instructions, as far as their constraints are not concerned.
+    """
+    return (tuple(self.opcode), self.invert_opcode,
+            tuple(None if arg is None else (arg.pattern, arg.flags) for arg in self.args),
+            tuple(sorted(self.invert_arg.items())))
 
   def _parse_op(self, instrstr):
     """ Reads and parses the opcode placeholder """
@@ -576,8 +690,8 @@ class AsmPP ( PatternPiece ):
       self.args.append(self.std_patterns[argstr[0:2]])
     elif argstr[0] == "I" and argstr[1:3] in self.std_patterns:
       self.l.debug('It\'s an inverted standard pattern!')
+      self.invert_arg[len(self.args)] = True
       self.args.append(self.std_patterns[argstr[1:3]])
-      self.invert_arg[index] = True
     else:
       self.l.debug('Not a standard pattern: "' + str(argstr) + '"')
       try:
@@ -1,25 +1,27 @@
 # global
-import sys
+import importlib
 
 # This is so it falls within the `asmregex' namespace already
 from .Assembly import *  # many
 from .PatternGenerator import PatternGenerator, MatchTableIterator  # all TODO: Remove when done, doesn't need to be in scope
 from .PatternMatcher import AssemblyMatcher, AssemblyMatcherIterator  # All there is
+from .PatternAutomaton import PatternAutomaton  # all
+from .DisassemblyCache import DisassemblyCache  # all
 from .PatternParser import PatternParser  # all
 from .PatternPiece import *  # many
 
 
-try:
-  import angr  # for testing purposes, because loadBinaries gets an angr Project to pass on to the loader.
-               # Note to self: WTF testing purposes?
-  from .BinaryLoaderAngr import BinaryLoader
-except ImportError as e:
-  try:
-    print("Angr not found with error %s, trying r2" % str(e), file = sys.stderr)
-    import r2pipe
-    from .BinaryLoaderRadare import BinaryLoader
-  except ImportError as e:
-    raise RuntimeError('No angr nor R2Pipe found. Can\'t load assembly code')
+def __getattr__(name):
+  """Imports the binary loader backend on first use of asmregex.BinaryLoader, as importing angr takes seconds.
+  Parsing and matching patterns does not need a backend.
+  """
+  if name == 'BinaryLoader':
+    from .PatternMatcher import binary_loader_backend
+    module, _ = binary_loader_backend()
+    loader = importlib.import_module(module).BinaryLoader
+    globals()['BinaryLoader'] = loader
+    return loader
+  raise AttributeError('module %r has no attribute %r' % (__name__, name))
 
 
 
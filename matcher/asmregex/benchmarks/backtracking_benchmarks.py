@@ -0,0 +1,72 @@
+"""Benchmarks of the backtracking matcher (AssemblyMatcherIterator) on patterns with many optional pieces
+
+Every optional piece is a choice point at which the matcher saves a state to backtrack to, so these patterns
+show the cost of saving and restoring states on long matches. Run from matcher/asmregex:
+
+  python -m benchmarks.backtracking_benchmarks [--size N] [--repeat N]
+"""
+import argparse
+import random
+import time
+
+from asmregex import InstructionTableBuilder, PatternParser
+from asmregex.PatternMatcher import AssemblyMatcherIterator
+
+# name -> (pattern, opcodes the haystack is randomly built from)
+BENCHMARKS = {
+  "lazy_run":          ("(<mov,>|<add,>)+<ret,>", ["mov", "add"] * 100 + ["ret"]),
+  "greedy_run":        ("(<mov,>|<add,>)G+<ret,>", ["mov", "add"] * 100 + ["ret"]),
+  "optional_chain":    ("(<mov,>?<add,>?<ldr,>?<str,><any,>?)+<ret,>", ["mov", "add", "ldr", "str"] * 50 + ["ret"]),
+  "optional_sequence": ("<mov,>?<add,>?<ldr,>?<str,>?<cmp,>?<mov,>?<add,>?<ldr,>?<str,>?<cmp,>?<ret,>",
+                        ["mov", "add", "ldr", "str", "cmp"] * 4 + ["ret"]),
+}
+
+
+def build_haystack(opcodes, size, seed=0):
+  """Builds an InstructionTable of size random instructions with the given opcodes
+
+  :param opcodes: list of opcodes to choose from (uniformly, so repeat an opcode to make it more likely)
+  :param size: amount of instructions
+  :param seed: seed of the random generator
+  :return: InstructionTable
+  """
+  rand = random.Random(seed)
+  builder = InstructionTableBuilder()
+  for i in range(0, size):
+    builder.append(rand.choice(opcodes), ["x%d" % rand.randint(0, 7)], 0x1000 + 4 * i)
+  return builder.build()
+
+
+def run_benchmark(name, size, repeat=1):
+  """Matches a benchmark pattern with the backtracking matcher
+
+  :param name: key in BENCHMARKS
+  :param size: amount of instructions in the haystack
+  :param repeat: amount of timed runs
+  :return: dict with the amount of matches, the amount of matched instructions and the fastest time
+  """
+  patternstr, opcodes = BENCHMARKS[name]
+  pattern = PatternParser().fromString(patternstr)
+  table = build_haystack(opcodes, size)
+  address_map = table.address_index()
+  best = None
+  for _ in range(0, repeat):
+    start = time.perf_counter()
+    matches = AssemblyMatcherIterator(pattern, asm_list=table, address_map=address_map).match_all()
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return {"matches": len(matches), "matched": sum(len(match) for match in matches), "time": best}
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--size", type=int, default=2000, help="amount of instructions per haystack")
+  parser.add_argument("--repeat", type=int, default=3, help="amount of timed runs, the fastest one is reported")
+  args = parser.parse_args()
+  for name in BENCHMARKS:
+    result = run_benchmark(name, args.size, args.repeat)
+    print("%-18s %6d matches %7d instructions %8.3fs" % (name, result["matches"], result["matched"], result["time"]))
+
+
+if __name__ == "__main__":
+  main()
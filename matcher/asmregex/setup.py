@@ -7,7 +7,7 @@ setup(name='asmregex',
       author='Jordy Gennissen',
       author_email='jordy.gennissen@rhul.ac.uk',
       license='CC 3.0 Non-commercial',
-      packages=find_namespace_packages(),  #['asmregex'],
+      packages=find_namespace_packages(include=['asmregex', 'asmregex.*']),  #['asmregex'],
       install_requires =['angr', 'numpy'], # angr or r2pipe, depending on the user
       dependency_links=[],
       zip_safe=False)
@@ -0,0 +1,58 @@
+from asmregex import AssemblyMatcher, InstructionTableBuilder, build_opcode_index
+
+# address of the first instruction of a built assembly, the others follow every 4 bytes
+BASE_ADDR = 0x1000
+
+def build_assembly(instructions, base=BASE_ADDR):
+  """Builds an InstructionTable from opcodes, "opcode arg, arg" strings or (opcode, args) tuples"""
+  builder = InstructionTableBuilder()
+  for i, instruction in enumerate(instructions):
+    if isinstance(instruction, str):
+      opcode, _, args = instruction.partition(" ")
+      args = [arg.strip() for arg in args.split(",")] if args else []
+    else:
+      opcode, args = instruction
+    builder.append(opcode, args, base + 4 * i)
+  return builder.build()
+
+class BinaryLoader(object):
+  """Stand-in for a binary loader backend (see PatternMatcher.BINARY_LOADERS) that disassembles every binary into
+  the same instructions, at the base address the binary is mapped at, and counts how often it is used"""
+
+  INSTRUCTIONS = ["mov x0", "add x1", "ret x2"]
+  instances = 0
+
+  def __init__(self, angrproject=None, bindir=None, includes=list()):
+    BinaryLoader.instances += 1
+    self.tables = [build_assembly(BinaryLoader.INSTRUCTIONS)]
+    self.tables.extend(build_assembly(BinaryLoader.INSTRUCTIONS, include.mapped_base) for include in includes)
+
+  def get_all(self):
+    return self.tables, [table.address_index() for table in self.tables]
+
+  def get_opcode_indices(self):
+    return [build_opcode_index(table) for table in self.tables]
+
+class MappedObject(object):
+  """Stand-in for an object mapped into an angr project (cle backend), e.g. a shared object in the includes"""
+
+  def __init__(self, binary, mapped_base):
+    self.binary = binary
+    self.mapped_base = mapped_base
+
+def load(patterns, *assemblies):
+  """Returns a matcher with the patterns (a pattern string for 'main', or a dict by name) and assemblies loaded"""
+  m = AssemblyMatcher()
+  if isinstance(patterns, str):
+    patterns = {"main": patterns}
+  for name, patternstr in patterns.items():
+    m.loadPattern(patternstr, pattern=name)
+  for instructions in assemblies:
+    m.loadAssembly(build_assembly(instructions))
+  return m
+
+def addresses(matches):
+  return [[asm["addr"] for asm in match] for match in matches]
+
+def as_tuples(asmlist):
+  return [(asm["opcode"], asm["args"], asm["addr"]) for asm in asmlist]
@@ -0,0 +1,109 @@
+import copy
+import pickle
+import unittest
+
+from asmregex import AsmPP
+from tests.assemblies import build_assembly
+
+class TestAsmPP(unittest.TestCase):
+
+  def test_opcode_set(self):
+    piece = AsmPP("<ALU,>")
+    self.assertEqual(piece.opcode_set, frozenset(AsmPP.std_opcodes["ALU"]))
+    self.assertFalse(piece.match_any_opcode)
+    self.assertTrue(piece.match_instruction("add", ["eax", "1"]))
+    self.assertTrue(piece.match_instruction("idiv", []))
+    self.assertFalse(piece.match_instruction("mov", ["eax", "1"]))
+    self.assertTrue(AsmPP("<mov,>").match_instruction("mov", []))
+    self.assertFalse(AsmPP("<mov,>").match_instruction("movzx", []))
+
+  def test_any_opcode(self):
+    piece = AsmPP("<any,>")
+    self.assertTrue(piece.match_any_opcode)
+    for opcode in ["mov", "any", "ret"]:
+      self.assertTrue(piece.match_instruction(opcode, []))
+
+  def test_inverted_opcode(self):
+    piece = AsmPP("<Imov,>")
+    self.assertFalse(piece.match_any_opcode)
+    self.assertFalse(piece.match_instruction("mov", ["eax", "ebx"]))
+    self.assertTrue(piece.match_instruction("add", ["eax", "ebx"]))
+    piece = AsmPP("<IPP,>")
+    self.assertFalse(piece.match_instruction("push", ["rbp"]))
+    self.assertTrue(piece.match_instruction("ret", []))
+    self.assertFalse(AsmPP("<Iany,>").match_any_opcode)
+
+  def test_args(self):
+    piece = AsmPP("<mov,DR,CC,>")
+    self.assertEqual([index for index, arg, invert in piece.arg_checks], [0, 1])
+    self.assertTrue(piece.match_instruction("mov", ["eax", "0x10"]))
+    self.assertFalse(piece.match_instruction("mov", ["[rax]", "0x10"]))
+    self.assertFalse(piece.match_instruction("mov", ["eax", "ebx"]))
+    self.assertFalse(piece.match_instruction("mov", ["eax"]))  # missing argument
+    self.assertTrue(piece.match_instruction("mov", ["eax", "1", "extra"]))
+    # only the second argument has a condition
+    piece = AsmPP("<mov,,x[0-9],>")
+    self.assertEqual([index for index, arg, invert in piece.arg_checks], [1])
+    self.assertTrue(piece.match_instruction("mov", ["anything", "x1"]))
+    self.assertFalse(piece.match_instruction("mov", ["x1", "w1"]))
+    self.assertTrue(AsmPP("<mov,,>").match_instruction("mov", []))
+
+  def test_args_memo(self):
+    piece = AsmPP("<mov,DR,CC,>")
+    for _ in range(0, 3):
+      self.assertTrue(piece.match_instruction("mov", ["eax", "0x10"]))
+      self.assertFalse(piece.match_instruction("mov", ["eax", "ebx"]))
+    # the arguments after the last condition do not take another entry
+    self.assertTrue(piece.match_instruction("mov", ["eax", "0x10", "extra"]))
+    info = piece._check_args_memo.cache_info()
+    self.assertEqual((info.misses, info.hits), (2, 5))
+    self.assertEqual(info.maxsize, AsmPP.ARG_MEMO_SIZE)
+    # the opcode is checked first, so the memo is not used
+    self.assertFalse(piece.match_instruction("add", ["ecx", "0x10"]))
+    self.assertEqual(piece._check_args_memo.cache_info().misses, 2)
+
+  def test_inverted_args(self):
+    piece = AsmPP("<jmp,ICC,>")
+    self.assertEqual(piece.invert_arg, {0: True})
+    self.assertTrue(piece.match_instruction("jmp", ["rax"]))
+    self.assertFalse(piece.match_instruction("jmp", ["0x400737"]))
+    # the invert belongs to the argument it is given for, not to the first one
+    piece = AsmPP("<mov,IDR,>")
+    self.assertEqual(piece.invert_arg, {0: True})
+    self.assertTrue(piece.match_instruction("mov", ["[rax]"]))
+    self.assertFalse(piece.match_instruction("mov", ["eax"]))
+    piece = AsmPP("<mov,DR,IDR,>")
+    self.assertEqual(piece.invert_arg, {1: True})
+    self.assertTrue(piece.match_instruction("mov", ["eax", "[rbx]"]))
+    self.assertFalse(piece.match_instruction("mov", ["eax", "ebx"]))
+    self.assertFalse(piece.match_instruction("mov", ["[rax]", "[rbx]"]))
+
+  def test_match_at(self):
+    table = build_assembly(["mov eax, 0x10", "mov eax, ebx", "add eax, 0x10"])
+    piece = AsmPP("<mov,DR,CC,>")
+    self.assertEqual([piece.match_at(table, i) for i in range(0, 3)], [True, False, False])
+    self.assertEqual([piece.match_at(list(table), i) for i in range(0, 3)], [True, False, False])
+    self.assertEqual([piece.match(asm) for asm in table], [True, False, False])
+
+  def test_key(self):
+    self.assertEqual(AsmPP("<mov,DR,CC,>").key(), AsmPP("<mov,DR,CC,>").key())
+    self.assertNotEqual(AsmPP("<mov,DR,>").key(), AsmPP("<mov,IDR,>").key())
+    self.assertNotEqual(AsmPP("<mov,>").key(), AsmPP("<Imov,>").key())
+
+  def test_pickle(self):
+    piece = AsmPP("<mov,IDR,x[0-9],>")
+    piece.match_instruction("mov", ["[rax]", "x1"])
+    self.assertNotIn("_check_args_memo", piece.__getstate__())
+    for restored in [pickle.loads(pickle.dumps(piece)), copy.deepcopy(piece)]:
+      self.assertEqual(restored.key(), piece.key())
+      self.assertEqual(restored.opcode_set, piece.opcode_set)
+      self.assertEqual(restored._check_args_memo.cache_info().currsize, 0)
+      self.assertTrue(restored.match_instruction("mov", ["[rax]", "x1"]))
+      self.assertFalse(restored.match_instruction("mov", ["eax", "x1"]))
+      self.assertFalse(restored.match_instruction("mov", ["[rax]", "w1"]))
+      # the memo of the copy is its own
+      self.assertIsNot(restored._check_args_memo, piece._check_args_memo)
+      self.assertEqual(piece._check_args_memo.cache_info().currsize, 1)
+
+if __name__ == "__main__":
+  unittest.main()
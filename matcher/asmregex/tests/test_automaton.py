@@ -0,0 +1,77 @@
+import copy
+import pickle
+import unittest
+
+from asmregex import OrTracker, PatternAutomaton, PatternParser
+from asmregex.PatternMatcher import AssemblyMatcherIterator
+from tests.assemblies import addresses, build_assembly, load
+
+PATTERNS = [
+  "<mov,>{1,3}<ret,>",
+  "<mov,>G{1,3}<ret,>",
+  "<mov,>{2}",
+  "<mov,>*<ret,>",
+  "<mov,>G*<ret,>",
+  "<mov,>?<add,>",
+  "<mov,>G?<add,>",
+  "<mov,>+",
+  "<mov,>G+",
+  "(<mov,><add,>?)+<ret,>",
+  "(<mov,>(<add,>)G*)G{1,2}<ret,>",
+  "((<mov,>)|(<add,>))<ret,>",
+  "(<mov,>|<add,>)+<ret,>",
+  "(<mov,>|<add,>)G+<ret,>",
+  "<any,><Imov,>",
+  # patterns that can match zero instructions
+  "<mov,>*",
+  "<mov,>G?",
+  "(<add,>?<mov,>?)?",
+]
+
+HAYSTACKS = [
+  ["mov", "ret"],
+  ["mov", "mov", "mov", "ret", "mov", "mov", "mov", "mov", "ret"],
+  ["mov", "add", "mov", "ret", "add", "add", "ret", "sub"],
+  ["add", "mov", "add", "mov", "mov", "add", "ret", "ret"],
+  ["sub", "sub", "ldr"],  # matches nothing but the nullable patterns
+]
+
+def backtrack(patternstr, opcodes):
+  m = load(patternstr, opcodes)
+  return AssemblyMatcherIterator(m.patterns["main"], m.asms[0], m.address_maps[0]).match_all()
+
+class TestAutomaton(unittest.TestCase):
+
+  def test_same_as_backtracking(self):
+    for patternstr in PATTERNS:
+      automaton = PatternAutomaton(PatternParser().fromString(patternstr))
+      for opcodes in HAYSTACKS:
+        self.assertEqual(addresses(automaton.match_all(build_assembly(opcodes))), addresses(backtrack(patternstr, opcodes)),
+                         "%s on %s" % (patternstr, " ".join(opcodes)))
+
+  def test_no_match(self):
+    asmlist = build_assembly(HAYSTACKS[-1])
+    self.assertEqual(PatternAutomaton(PatternParser().fromString("<mov,>+<ret,>")).match_all(asmlist), [])
+
+  def test_find_matches(self):
+    # loadPattern compiles patterns without constraints
+    m = load("<mov,>{1,3}<ret,>", HAYSTACKS[1])
+    self.assertIsNotNone(m.automata["main"])
+    self.assertEqual(addresses(m.find_matches()), addresses(backtrack("<mov,>{1,3}<ret,>", HAYSTACKS[1])))
+
+  def test_lazy_range(self):
+    # a lazy {1,3} counted every repetition twice, and never took its third repetition
+    opcodes = ["mov", "mov", "mov", "ret"]
+    self.assertEqual(addresses(backtrack("<mov,>{1,3}<ret,>", opcodes)), [[0x1000, 0x1004, 0x1008, 0x100c]])
+    self.assertEqual(addresses(backtrack("<mov,>{1,2}<ret,>", opcodes)), [[0x1004, 0x1008, 0x100c]])
+
+  def test_or_tracker_copy(self):
+    # OrTracker.__setstate__ dropped its state, breaking the copies of the tracker stack
+    tracker = OrTracker(begin=1, middle=3, end=5)
+    for restored in [copy.deepcopy(tracker), pickle.loads(pickle.dumps(tracker))]:
+      self.assertEqual((restored.begin, restored.middle, restored.end), (1, 3, 5))
+    opcodes = ["add", "ret", "mov", "ret"]
+    self.assertEqual(addresses(backtrack("((<mov,>)|(<add,>))<ret,>", opcodes)), [[0x1000, 0x1004], [0x1008, 0x100c]])
+
+if __name__ == "__main__":
+  unittest.main()
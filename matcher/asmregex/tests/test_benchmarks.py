@@ -0,0 +1,19 @@
+import unittest
+
+from asmregex import PatternAutomaton, PatternParser
+from benchmarks.backtracking_benchmarks import BENCHMARKS, build_haystack, run_benchmark
+
+class TestBacktrackingBenchmarks(unittest.TestCase):
+
+  def test_run_benchmark(self):
+    for name, (patternstr, opcodes) in BENCHMARKS.items():
+      result = run_benchmark(name, 500)
+      self.assertGreater(result["matches"], 0, name)
+      self.assertGreaterEqual(result["time"], 0.0)
+      # the backtracking matcher and the automaton return the same matches
+      matches = PatternAutomaton(PatternParser().fromString(patternstr)).match_all(build_haystack(opcodes, 500))
+      self.assertEqual(result["matches"], len(matches), name)
+      self.assertEqual(result["matched"], sum(len(match) for match in matches), name)
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from asmregex import AsmPP
+from tests.assemblies import addresses, build_assembly, load
+
+def find_matches(patternstr, instructions):
+  return addresses(load(patternstr, instructions).find_matches())
+
+class TestConstraints(unittest.TestCase):
+
+  def test_back_reference(self):
+    pattern = "<mov,(x[0-9]),,{0:1:*r}><sub,(x[0-9]),,{0:1:=r}>"
+    self.assertEqual(find_matches(pattern, ["mov x1, x2", "sub x1, x1", "mov x3, x1", "sub x1, x3"]), [[0x1000, 0x1004]])
+    pattern = "<mov,(x[0-9]),,{0:1:*r}><sub,(x[0-9]),,{0:1:!r}>"
+    self.assertEqual(find_matches(pattern, ["mov x1, x2", "sub x1, x1", "mov x3, x1", "sub x1, x3"]), [[0x1008, 0x100c]])
+
+  def test_binding_restored_on_backtracking(self):
+    # the add alternative binds r to x2 and fails on the sub, the any alternative has to see r bound to x1 again
+    pattern = "<mov,(x[0-9]),,{0:1:*r}>((<add,(x[0-9]),,{0:1:*r}>)|(<any,>))<sub,(x[0-9]),,{0:1:=r}>"
+    self.assertEqual(find_matches(pattern, ["mov x1", "add x2", "sub x1"]), [[0x1000, 0x1004, 0x1008]])
+    self.assertEqual(find_matches(pattern, ["mov x1", "add x2", "sub x2"]), [[0x1000, 0x1004, 0x1008]])
+
+  def test_bindings_per_match(self):
+    pattern = "<mov,(x[0-9]),,{0:1:*r}><any,>?<sub,(x[0-9]),,{0:1:=r}>"
+    self.assertEqual(find_matches(pattern, ["mov x1", "sub x2", "mov x2", "add x0", "sub x2"]), [[0x1008, 0x100c, 0x1010]])
+
+  def test_unbound_reference(self):
+    pattern = "(<mov,(x[0-9]),,{0:1:*r}>)?<sub,(x[0-9]),,{0:1:=r}>"
+    self.assertEqual(find_matches(pattern, ["sub x1", "mov x2", "sub x2"]), [[0x1004, 0x1008]])
+
+  def test_match_bound(self):
+    table = build_assembly(["mov x1", "sub x1", "sub x12", "sub x2"])
+    assign = AsmPP("<mov,(x[0-9]+),,{0:1:*r}>")
+    check = AsmPP("<sub,(x[0-9]+),,{0:1:=r}>")
+    bindings = dict()
+    bound = assign.match_bound(table, 0, bindings)
+    self.assertEqual(bound, {"r": "x1"})
+    self.assertEqual(bindings, dict())  # copy on write
+    self.assertIs(check.match_bound(table, 1, bound), bound)
+    self.assertIsNone(check.match_bound(table, 2, bound))
+    self.assertIsNone(check.match_bound(table, 3, bound))
+    self.assertIsNone(check.match_bound(table, 1, dict()))
+
+if __name__ == "__main__":
+  unittest.main()
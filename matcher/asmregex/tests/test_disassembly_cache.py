@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from asmregex import AssemblyMatcher, DisassemblyCache, PatternMatcher
+from tests.assemblies import BinaryLoader, MappedObject, addresses, as_tuples, build_assembly
+
+class TestDisassemblyCache(unittest.TestCase):
+
+  def setUp(self):
+    tmp = tempfile.TemporaryDirectory()
+    self.addCleanup(tmp.cleanup)
+    self.cache = DisassemblyCache(os.path.join(tmp.name, "cache"))
+    # a fake binary: the cache only hashes its content
+    self.binary = os.path.join(tmp.name, "binary")
+    self.write_binary(b"\x7fELF fake binary")
+    self.table = build_assembly(["mov x0", "add x1", "ret x2"])
+
+  def write_binary(self, content):
+    with open(self.binary, "wb") as binary:
+      binary.write(content)
+
+  def entries(self):
+    return sorted(os.listdir(self.cache.directory))
+
+  def test_miss(self):
+    self.assertIsNone(self.cache.load(self.binary, "loader-1"))
+    self.assertFalse(os.path.exists(self.cache.directory))
+
+  def test_store_and_hit(self):
+    self.cache.store(self.binary, "loader-1", self.table)
+    self.assertEqual(self.entries(), [DisassemblyCache.key(DisassemblyCache.digest(self.binary), "loader-1")])
+    loaded = self.cache.load(self.binary, "loader-1")
+    self.assertEqual(as_tuples(loaded), as_tuples(self.table))
+    self.assertIsInstance(loaded.opcode, np.memmap)
+
+  def test_store_twice(self):
+    self.cache.store(self.binary, "loader-1", self.table)
+    # an existing entry is kept as it is
+    self.cache.store(self.binary, "loader-1", build_assembly(["sub x0"]))
+    self.assertEqual(self.entries(), [DisassemblyCache.key(DisassemblyCache.digest(self.binary), "loader-1")])
+    self.assertEqual(as_tuples(self.cache.load(self.binary, "loader-1")), as_tuples(self.table))
+
+  def test_loader_version(self):
+    self.cache.store(self.binary, "loader-1", self.table)
+    self.assertNotEqual(DisassemblyCache.key(DisassemblyCache.digest(self.binary), "loader-1"), DisassemblyCache.key(DisassemblyCache.digest(self.binary), "loader-2"))
+    self.assertIsNone(self.cache.load(self.binary, "loader-2"))
+    self.assertIsNotNone(self.cache.load(self.binary, "loader-1"))
+
+  def test_binary_content(self):
+    self.cache.store(self.binary, "loader-1", self.table)
+    self.write_binary(b"\x7fELF changed binary")
+    self.assertIsNone(self.cache.load(self.binary, "loader-1"))
+    self.cache.store(self.binary, "loader-1", build_assembly(["sub x0"]))
+    self.assertEqual(len(self.entries()), 2)
+    self.assertEqual(self.cache.load(self.binary, "loader-1").opcodes, ["sub"])
+
+  def test_load_binary(self):
+    loaders = [("tests.assemblies", "tests.assemblies", "fake-1")]
+    with mock.patch.object(PatternMatcher, "BINARY_LOADERS", loaders), \
+         mock.patch.object(DisassemblyCache, "digest", wraps=DisassemblyCache.digest) as digest:
+      instances = BinaryLoader.instances
+      m = AssemblyMatcher().loadBinary(self.binary, cache=self.cache)
+      # the binary is hashed once for the lookup and for storing it
+      self.assertEqual(digest.call_count, 1)
+      self.assertEqual(BinaryLoader.instances, instances + 1)
+      cached = AssemblyMatcher().loadBinary(self.binary, cache=self.cache)
+      self.assertEqual(BinaryLoader.instances, instances + 1)
+    self.assertEqual(as_tuples(cached.asms[0]), as_tuples(m.asms[0]))
+    self.assertEqual(cached.opcode_indices, m.opcode_indices)
+
+  def test_load_binary_without_backend(self):
+    loaders = [("asmregex_missing_backend", "asmregex_missing_backend", "missing-1"),
+               ("asmregex_missing_backend", "asmregex_missing_backend", "missing-2")]
+    with mock.patch.object(PatternMatcher, "BINARY_LOADERS", loaders):
+      with self.assertRaises(RuntimeError):
+        AssemblyMatcher().loadBinary(self.binary, cache=self.cache)
+      # a hit does not need the loader, also if it was stored by another loader
+      self.cache.store(self.binary, "missing-2", self.table)
+      m = AssemblyMatcher().loadBinary(self.binary, cache=self.cache)
+    self.assertEqual(as_tuples(m.asms[0]), as_tuples(self.table))
+    self.assertEqual(m.address_maps[0][0x1004], 1)
+
+  def test_load_library_at_different_bases(self):
+    loaders = [("tests.assemblies", "tests.assemblies", "fake-1")]
+    library = os.path.join(os.path.dirname(self.binary), "library.so")
+    with open(library, "wb") as library_file:
+      library_file.write(b"\x7fELF fake library")
+    with mock.patch.object(PatternMatcher, "BINARY_LOADERS", loaders):
+      instances = BinaryLoader.instances
+      for base in [0x10000, 0x20000, 0x10000]:
+        m = AssemblyMatcher().loadBinaries(bindir=self.binary, includes=[MappedObject(library, base)], cache=self.cache)
+        self.assertEqual(addresses([m.asms[1]]), [[base, base + 4, base + 8]])
+        self.assertEqual(m.address_maps[1][base + 4], 1)
+      # a miss for each new base, a hit for the known one
+      self.assertEqual(BinaryLoader.instances, instances + 2)
+    # the binary, and the library at both bases
+    self.assertEqual(len(self.entries()), 3)
+
+  def test_default_directory(self):
+    with mock.patch.dict(os.environ, {"XDG_CACHE_HOME": "/tmp/xdg"}):
+      self.assertEqual(DisassemblyCache().directory, os.path.join("/tmp/xdg", "asmregex"))
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,54 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+import asmregex
+import asmregex.PatternMatcher as PatternMatcher
+from tests.assemblies import addresses, load
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# upper bound on the time `import asmregex' may take, angr alone takes several seconds
+IMPORT_TIME_LIMIT = 1.0
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import asmregex
+elapsed = time.perf_counter() - start
+print(json.dumps({"time": elapsed, "backends": [name for name in ("angr", "r2pipe") if name in sys.modules]}))
+"""
+
+def run_import():
+  out = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=ROOT, check=True, capture_output=True, text=True).stdout
+  return json.loads(out)
+
+class TestImport(unittest.TestCase):
+
+  def test_no_backend_imported(self):
+    self.assertEqual(run_import()["backends"], [])
+
+  def test_import_time(self):
+    # best of three, to not depend on a cold file system cache
+    elapsed = min(run_import()["time"] for _ in range(3))
+    print("import asmregex: %.3fs" % elapsed, file=sys.stderr)
+    self.assertLess(elapsed, IMPORT_TIME_LIMIT)
+
+  def test_match_without_backend(self):
+    m = load("<mov,eax,><add,>", ["mov eax, 0x1", "add eax, ebx", "ret"])
+    self.assertEqual(addresses(m.find_matches()), [[0x1000, 0x1004]])
+    self.assertNotIn("angr", sys.modules)
+
+  def test_missing_backend(self):
+    loaders = PatternMatcher.BINARY_LOADERS
+    PatternMatcher.BINARY_LOADERS = [("asmregex_missing_backend", "asmregex.BinaryLoaderAngr", "missing-1")]
+    try:
+      with self.assertRaises(RuntimeError):
+        asmregex.BinaryLoader
+    finally:
+      PatternMatcher.BINARY_LOADERS = loaders
+
+if __name__ == "__main__":
+  unittest.main()
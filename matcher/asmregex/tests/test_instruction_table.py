@@ -0,0 +1,98 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from asmregex import AddressIndex, AssemblyInstruction, AssemblyList, InstructionTable, build_opcode_index
+from tests.assemblies import as_tuples, build_assembly
+
+INSTRUCTIONS = [("mov", ["x1", "x2"]), ("ret", None), ("add", ["x1", "x1"]), ("mov", ["x2", "#1"]), ("ret", [])]
+
+class TestInstructionTable(unittest.TestCase):
+
+  def setUp(self):
+    self.table = build_assembly(INSTRUCTIONS)
+
+  def test_build(self):
+    self.assertEqual(len(self.table), 5)
+    # strings are interned
+    self.assertEqual(self.table.opcodes, ["mov", "ret", "add"])
+    self.assertEqual(self.table.operands, ["x1", "x2", "#1"])
+    self.assertEqual(self.table.opcode_at(3), "mov")
+    self.assertEqual(self.table.args_at(0), ["x1", "x2"])
+    self.assertEqual(self.table.arg_ids_at(2), [0, 0])
+
+  def test_no_args(self):
+    self.assertEqual(self.table.args_at(1), [])
+    self.assertEqual(self.table.args_at(4), [])
+    self.assertEqual(self.table[1]["disasm"], "ret")
+
+  def test_indexing(self):
+    asm = self.table[2]
+    self.assertIsInstance(asm, AssemblyInstruction)
+    self.assertEqual((asm["opcode"], asm["args"], asm["addr"]), ("add", ["x1", "x1"], 0x1008))
+    self.assertEqual(self.table[-1]["addr"], 0x1010)
+    self.assertEqual(self.table[-5]["addr"], 0x1000)
+    for index in [5, 100, -6]:
+      with self.assertRaises(IndexError):
+        self.table[index]
+    # iterating stops at the IndexError
+    self.assertEqual(len(list(self.table)), 5)
+
+  def test_slicing(self):
+    self.assertIsInstance(self.table[1:3], AssemblyList)
+    self.assertEqual([asm["addr"] for asm in self.table[1:3]], [0x1004, 0x1008])
+    self.assertEqual([asm["addr"] for asm in self.table[::2]], [0x1000, 0x1008, 0x1010])
+    self.assertEqual([asm["addr"] for asm in self.table[-2:]], [0x100c, 0x1010])
+    self.assertEqual(len(self.table[4:10]), 1)
+    self.assertEqual(len(self.table[3:1]), 0)
+
+  def test_from_instructions(self):
+    self.assertEqual(as_tuples(InstructionTable.from_instructions(list(self.table))), as_tuples(self.table))
+
+  def test_save_load(self):
+    with tempfile.TemporaryDirectory() as directory:
+      self.table.save(directory)
+      for mmap in [True, False]:
+        loaded = InstructionTable.load(directory, mmap=mmap)
+        self.assertEqual(as_tuples(loaded), as_tuples(self.table))
+        self.assertEqual(loaded.opcodes, self.table.opcodes)
+
+  def test_opcode_index(self):
+    expected = {"mov": [0, 3], "ret": [1, 4], "add": [2]}
+    self.assertEqual(self.table.opcode_index(), expected)
+    self.assertEqual(build_opcode_index(self.table), expected)
+    self.assertEqual(build_opcode_index(list(self.table)), expected)
+    self.assertEqual(build_opcode_index(build_assembly([])), dict())
+
+
+class TestAddressIndex(unittest.TestCase):
+
+  def test_sorted(self):
+    index = build_assembly(INSTRUCTIONS).address_index()
+    self.assertIsNone(index.order)
+    self.assertEqual(len(index), 5)
+    self.assertEqual(index[0x1008], 2)
+    self.assertEqual(dict(index), {0x1000: 0, 0x1004: 1, 0x1008: 2, 0x100c: 3, 0x1010: 4})
+
+  def test_unsorted(self):
+    addresses = [0x2000, 0x1000, 0x3000, 0x1800]
+    index = AddressIndex(np.array(addresses, dtype=np.uint64))
+    self.assertIsNotNone(index.order)
+    self.assertEqual([index[addr] for addr in addresses], [0, 1, 2, 3])
+    self.assertEqual(list(index), sorted(addresses))
+    self.assertEqual(dict(index), {addr: i for i, addr in enumerate(addresses)})
+
+  def test_missing(self):
+    index = AddressIndex(np.array([0x2000, 0x1000, 0x3000], dtype=np.uint64))
+    for addr in [0x1004, 0x0, 0x4000, -1, 2**64, "0x1000", None]:
+      with self.assertRaises(KeyError):
+        index[addr]
+      self.assertNotIn(addr, index)
+    self.assertIsNone(index.get(0x1004))
+    self.assertEqual(len(AddressIndex(np.array([], dtype=np.uint64))), 0)
+    with self.assertRaises(KeyError):
+      AddressIndex(np.array([], dtype=np.uint64))[0x1000]
+
+if __name__ == "__main__":
+  unittest.main()
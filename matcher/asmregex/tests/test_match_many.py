@@ -0,0 +1,44 @@
+import unittest
+
+from tests.assemblies import addresses, load
+
+PATTERNS = {
+  # share the <mov,x[0-9],> piece, which is checked once per instruction for both
+  "mov_add": "<mov,x[0-9],><add,>",
+  "mov_sub": "<mov,x[0-9],><any,>?<sub,>",
+  # can start anywhere
+  "any_ret": "<any,><ret,>",
+  "nullable": "<add,>*",
+  # constraints, matched by backtracking
+  "same_reg": "<mov,(x[0-9]),,{0:1:*r}><any,>{0,2}<sub,(x[0-9]),,{0:1:=r}>",
+}
+
+INSTRUCTIONS = [
+  "mov x1, x2", "add x1, x1", "sub x1, x2", "ret", "mov x2, #1", "ldr x3, [sp]", "sub x2, x2", "mov w3, x1",
+  "add x4, x4", "add x4, x4", "ret", "mov x5, x5", "sub x4, x5",
+]
+
+class TestMatchMany(unittest.TestCase):
+
+  def setUp(self):
+    self.m = load(PATTERNS, INSTRUCTIONS)
+
+  def test_pattern_mix(self):
+    self.assertEqual(self.m.patterns["mov_add"][1].key(), self.m.patterns["mov_sub"][1].key())
+    self.assertIsNone(self.m.first_opcodes["any_ret"])
+    self.assertIsNone(self.m.automata["same_reg"])
+
+  def test_same_as_find_matches(self):
+    many = self.m.match_many()
+    self.assertEqual(sorted(many), sorted(PATTERNS))
+    for name in PATTERNS:
+      self.assertEqual(addresses(many[name]), addresses(self.m.find_matches(pattern=name)), name)
+    self.assertEqual(addresses(many["same_reg"]), [[0x1000, 0x1004, 0x1008], [0x1010, 0x1014, 0x1018]])
+
+  def test_subset(self):
+    many = self.m.match_many(patterns=["mov_sub", "same_reg"])
+    self.assertEqual(sorted(many), ["mov_sub", "same_reg"])
+    self.assertEqual(addresses(many["mov_sub"]), addresses(self.m.find_matches(pattern="mov_sub")))
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,60 @@
+import random
+import unittest
+
+from asmregex import PatternAutomaton
+from tests.assemblies import addresses, load
+
+# bounded patterns, matched in chunks
+CHUNKED = [
+  "<mov,><any,>{0,3}<ret,>",
+  "<mov,>G{1,4}",
+  "(<mov,>|<add,>)G{1,3}<ret,>",
+  "<mov,>{0,2}",  # empty matches
+  "<add,>?<mov,>G?",  # empty matches
+]
+# matched per binary: unbounded and with constraints
+UNCHUNKED = [
+  "<mov,>+<ret,>",
+  "<mov,(x[0-9]),,{0:1:*r}><any,>?<sub,(x[0-9]),,{0:1:=r}>",
+]
+
+def random_instructions(seed, size):
+  rand = random.Random(seed)
+  return [(rand.choice(["mov", "mov", "add", "sub", "ret"]), ["x%d" % rand.randint(0, 2)]) for _ in range(0, size)]
+
+class TestParallel(unittest.TestCase):
+
+  def load(self, patternstr):
+    return load(patternstr, random_instructions(0, 40), random_instructions(1, 40))
+
+  def assertSameAsSequential(self, m, chunk_size, patternstr):
+    parallel = m.find_matches_parallel(jobs=2, chunk_size=chunk_size)
+    self.assertEqual(len(parallel), len(m.asms))
+    for assembly_id, matches in enumerate(parallel):
+      self.assertEqual(addresses(matches), addresses(m.find_matches(assembly_id=assembly_id)),
+                       "%s, chunk size %d, binary %d" % (patternstr, chunk_size, assembly_id))
+
+  def test_chunks(self):
+    for patternstr in CHUNKED:
+      m = self.load(patternstr)
+      self.assertIsNotNone(PatternAutomaton.max_span(m.patterns["main"]))
+      for chunk_size in range(1, 6):
+        self.assertSameAsSequential(m, chunk_size, patternstr)
+
+  def test_unchunked(self):
+    for patternstr in UNCHUNKED:
+      m = self.load(patternstr)
+      self.assertTrue(m.automata["main"] is None or PatternAutomaton.max_span(m.patterns["main"]) is None)
+      self.assertSameAsSequential(m, 2, patternstr)
+
+  def test_match_all_binaries(self):
+    m = self.load(CHUNKED[0])
+    self.assertEqual(addresses(m.match_all_binaries(jobs=2)), addresses(m.match_all_binaries(jobs=1)))
+
+  def test_unnested_pattern(self):
+    m = self.load("(<ret,>G*|<mov,>)")
+    self.assertIsNone(PatternAutomaton.max_span(m.patterns["main"]))
+    self.assertSameAsSequential(m, 2, "(<ret,>G*|<mov,>)")
+
+if __name__ == "__main__":
+  unittest.main()
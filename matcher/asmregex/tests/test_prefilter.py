@@ -0,0 +1,49 @@
+import unittest
+
+from asmregex import PatternAutomaton, PatternParser
+from tests.assemblies import addresses, load
+
+OPCODES = ["ret", "ret", "mov", "add", "ret", "mov", "sub"]
+
+def first_opcodes(patternstr):
+  return PatternAutomaton.first_opcodes(PatternParser().fromString(patternstr))
+
+class TestPrefilter(unittest.TestCase):
+
+  def test_anchor(self):
+    self.assertEqual(first_opcodes("<mov,><add,>"), frozenset(["mov"]))
+    self.assertEqual(load("<mov,><add,>", OPCODES).start_candidates(), [2, 5])
+
+  def test_nullable_first_piece(self):
+    self.assertEqual(first_opcodes("<mov,>?<add,>"), frozenset(["mov", "add"]))
+    self.assertEqual(load("<mov,>?<add,>", OPCODES).start_candidates(), [2, 3, 5])
+    # the whole pattern can match without instructions
+    self.assertIsNone(first_opcodes("<mov,>*"))
+    self.assertIsNone(load("<mov,>*", OPCODES).start_candidates())
+
+  def test_any_start(self):
+    self.assertIsNone(first_opcodes("<any,><mov,>"))
+    self.assertIsNone(first_opcodes("<Imov,><add,>"))
+    self.assertIsNone(load("<Imov,><add,>", OPCODES).start_candidates())
+
+  def test_or(self):
+    self.assertEqual(first_opcodes("((<mov,>)|(<sub,>))<ret,>"), frozenset(["mov", "sub"]))
+    self.assertEqual(load("((<mov,>)|(<sub,>))", OPCODES).start_candidates(), [2, 5, 6])
+    self.assertIsNone(first_opcodes("((<mov,>)|(<any,>))"))
+
+  def test_unnested_or(self):
+    # the parser does not nest this OR inside the repetition: the prefilter gives up instead of failing
+    m = load("(<ret,>G*|<mov,>)", ["ret", "ret", "mov", "add", "ret"])
+    self.assertIsNone(m.first_opcodes["main"])
+    self.assertEqual([[asm["opcode"] for asm in match] for match in m.find_matches()], [["ret", "ret"], [], [], ["ret"]])
+
+  def test_same_matches(self):
+    for patternstr in ["<mov,><add,>", "<mov,>?<add,>", "((<mov,>)|(<sub,>))", "<ret,>G+<mov,>"]:
+      m = load(patternstr, OPCODES)
+      self.assertIsNotNone(m.start_candidates())
+      with_prefilter = addresses(m.find_matches())
+      m.first_opcodes["main"] = None
+      self.assertEqual(with_prefilter, addresses(m.find_matches()), patternstr)
+
+if __name__ == "__main__":
+  unittest.main()
@@ -1,133 +1,453 @@
 from __future__ import annotations
 
-import itertools
-import sympy
+import os
+import numpy as np
 
+from concurrent.futures import ProcessPoolExecutor
 from typing import Optional, List, Dict, Tuple, TYPE_CHECKING
 if TYPE_CHECKING:
 	from classification.measurement import Measurement
 
-from .analysis_utils import occ1, occN, expected1, expectedN, relation2
+from classification.register_matrix import register_array
 
-def analyze_fuzzed_bits(classification: Dict[int, List[Measurement]], fuzzed_bits_idx: Tuple[int, int]) -> None:
-	# generate a list of registers in the bit table
-	# assumption: all testcases use the same set of registers
-	registers: Optional[List[str]] = None
-	for class_id, bittable in classification.items():
-		if len(bittable) > 0:
-			registers = list(bittable[0].register_contents().keys())
-			break
+from .analysis_utils import expected1, expectedN, relation2, relation3
+from .analysis_statistics import ClassStatistics
+from .analysis_results import ClassAnalysisResult, ConstraintResult, RelationResult, Relation3Result
+
+def analyze_fuzzed_bits(
+	classification: Dict[int, List[Measurement]], fuzzed_bits_idx: Tuple[int, int],
+	jobs: Optional[int] = None, triples: bool = False, registers: Optional[List[str]] = None
+) -> List[ClassAnalysisResult]:
+	"""
+	Analyzes the bit tables of all classes of a classification: finds
+	candidates, extracts constraints and relations and validates them. The
+	classes are independent of each other, so they are analyzed in a pool
+	of `jobs` worker processes.
+	
+	:param      classification:   The classification (class id -> bittable)
+	:type       classification:   Dict[int, List[Measurement]]
+	:param      fuzzed_bits_idx:  The range of fuzzed bits (lower bound
+	                              incl., upper bound excl.)
+	:type       fuzzed_bits_idx:  Tuple[int, int]
+	:param      jobs:             Number of worker processes. None: one per
+	                              CPU, 1: analyze in the calling process.
+	:type       jobs:             Optional[int]
+	:param      triples:          Also extract relations between triples
+	                              of registers
+	:type       triples:          bool
+	:param      registers:        The fuzzed registers to analyze. None:
+	                              all registers of the first testcase.
+	:type       registers:        Optional[List[str]]
+	
+	:returns:   One analysis result per class, ordered by class id
+	:rtype:     List[ClassAnalysisResult]
+	"""
+	if registers is None:
+		# generate a list of registers in the bit table
+		# assumption: all testcases use the same set of registers
+		for class_id, bittable in classification.items():
+			if len(bittable) > 0:
+				registers = list(bittable[0].register_contents().keys())
+				break
 	assert registers is not None
+
+	return analyze_register_arrays(
+		{class_id: register_array(bittable, registers) for class_id, bittable in classification.items()},
+		registers, fuzzed_bits_idx, jobs, triples
+	)
+
+def analyze_register_arrays(
+	register_arrays: Dict[int, Tuple[np.ndarray, np.ndarray]], registers: List[str],
+	fuzzed_bits_idx: Tuple[int, int], jobs: Optional[int] = None, triples: bool = False,
+	no_other_fuzzed_bits: int = 0
+) -> List[ClassAnalysisResult]:
+	"""
+	Variant of analyze_fuzzed_bits for classifications whose register
+	contents are given as arrays (see register_array and
+	RegisterMatrix.select) instead of lists of measurements.
+	
+	:param      register_arrays:  Class id -> (values, valid) of the
+	                              testcases of this class
+	:type       register_arrays:  Dict[int, Tuple[np.ndarray, np.ndarray]]
+	:param      registers:        The registers (columns of the arrays)
+	:type       registers:        List[str]
+	:param      fuzzed_bits_idx:  The range of fuzzed bits (lower bound
+	                              incl., upper bound excl.)
+	:type       fuzzed_bits_idx:  Tuple[int, int]
+	:param      jobs:             Number of worker processes. None: one per
+	                              CPU, 1: analyze in the calling process.
+	:type       jobs:             Optional[int]
+	:param      triples:          Also extract relations between triples
+	                              of registers
+	:type       triples:          bool
+	:param      no_other_fuzzed_bits:  Number of fuzzed bits in the
+	                                   registers of other groups (see
+	                                   ClassStatistics)
+	:type       no_other_fuzzed_bits:  int
+	
+	:returns:   One analysis result per class, ordered by class id
+	:rtype:     List[ClassAnalysisResult]
+	"""
+	class_ids: List[int] = sorted(register_arrays.keys())
+	if jobs is None:
+		jobs = os.cpu_count() or 1
+	jobs = min(jobs, len(class_ids))
+
+	if jobs <= 1:
+		return [
+			analyze_register_array(
+				class_id, *register_arrays[class_id], registers, fuzzed_bits_idx, triples, no_other_fuzzed_bits
+			)
+			for class_id in class_ids
+		]
+
+	# Analyze the bit tables in parallel. Submit the largest classes first
+	# such that the total runtime is dominated by the largest class only.
+	# Only the contents of the analyzed registers are sent to the worker
+	# processes.
+	with ProcessPoolExecutor(max_workers=jobs) as executor:
+		futures = {
+			class_id: executor.submit(
+				analyze_register_array, class_id, *register_arrays[class_id], registers, fuzzed_bits_idx, triples,
+				no_other_fuzzed_bits
+			)
+			for class_id in sorted(class_ids, key=lambda class_id: len(register_arrays[class_id][0]), reverse=True)
+		}
+		return [futures[class_id].result() for class_id in class_ids]
+
+def analyze_register_array(
+	class_id: int, values: np.ndarray, valid: np.ndarray, registers: List[str],
+	fuzzed_bits_idx: Tuple[int, int], triples: bool = False, no_other_fuzzed_bits: int = 0
+) -> ClassAnalysisResult:
+	"""
+	Analyzes a single class, given the register contents of its testcases
+	as arrays (see register_array).
+	
+	:param      class_id:         The class identifier
+	:type       class_id:         int
+	:param      values:           The register contents, one row per
+	                              testcase, one column per register
+	:type       values:           np.ndarray
+	:param      valid:            Whether the register was used in the
+	                              testcase, same shape as values
+	:type       valid:            np.ndarray
+	:param      registers:        The registers (columns)
+	:type       registers:        List[str]
+	:param      fuzzed_bits_idx:  The range of fuzzed bits (lower bound
+	                              incl., upper bound excl.)
+	:type       fuzzed_bits_idx:  Tuple[int, int]
+	:param      triples:          Also extract relations between triples
+	                              of registers
+	:type       triples:          bool
+	:param      no_other_fuzzed_bits:  Number of fuzzed bits in the
+	                                   registers of other groups (see
+	                                   ClassStatistics)
+	:type       no_other_fuzzed_bits:  int
+	
+	:returns:   The analysis result for this class
+	:rtype:     ClassAnalysisResult
+	"""
+	statistics: ClassStatistics = ClassStatistics(
+		registers, fuzzed_bits_idx, triples, no_other_fuzzed_bits
+	).add_array(values, valid)
+	return analyze_statistics(class_id, statistics)
+
+def analyze_statistics(
+	class_id: int, statistics: ClassStatistics, reference: Optional[ClassStatistics] = None
+) -> ClassAnalysisResult:
+	"""
+	Analyzes a single class based on its sufficient statistics (see
+	ClassStatistics).
+
+	The candidate selection compares the number of occurrences of each
+	value with the number expected if no hidden behavior occurred. By
+	default, this is the number expected for a complete campaign that
+	covers all combinations of fuzzed bits (see expectedN). If a reference
+	is given (the statistics over all testcases of all classes seen so
+	far), its counts are used instead. For a complete campaign, both are
+	equal; for a partial campaign, only the reference is meaningful.
+	
+	:param      class_id:    The class identifier
+	:type       class_id:    int
+	:param      statistics:  The statistics of this class
+	:type       statistics:  ClassStatistics
+	:param      reference:   The statistics of all classes (optional)
+	:type       reference:   Optional[ClassStatistics]
+	
+	:returns:   The analysis result for this class
+	:rtype:     ClassAnalysisResult
+	"""
+	registers: List[str] = statistics.registers
+	fuzzed_bits_idx: Tuple[int, int] = statistics.fuzzed_bits_idx
+	result: ClassAnalysisResult = ClassAnalysisResult(class_id, statistics.no_testcases)
+
+	# Step 1: Candidate Selection on single addresses. For each
+	# possible value of the fuzzed bits in each register, count and
+	# compare the number of occurrences in the bittable with the
+	# expected number if no hidden behavior occurred.
+	no_expected_testcases: int = expected1(len(registers), fuzzed_bits_idx, statistics.no_other_fuzzed_bits)
+	for register in registers:
+		expected = no_expected_testcases if reference is None else reference.hist1[register]
+		for bits_value in np.flatnonzero(statistics.hist1[register] != expected):
+			result.candidate_addr_bits.append((register, int(bits_value)))
+	
+	# Step 1': Candidate Selection on pairs of addresses. For each
+	# possible combination of values in all possible pairs of
+	# registers, count and compare the number of occurrences in the
+	# bittable with the expected number if no hidden behavior occurred.
+	no_expected_testcases = expectedN(2, len(registers), fuzzed_bits_idx, statistics.no_other_fuzzed_bits)
+	for (register1, register2), hist in statistics.hist2.items():
+		expected = no_expected_testcases if reference is None else reference.hist2[(register1, register2)]
+		for bits_value1, bits_value2 in zip(*np.nonzero(hist != expected)):
+			result.candidate_interrelated_addr_bits.append(((register1, int(bits_value1)), (register2, int(bits_value2))))
+
+	# Step 1'': Candidate Selection on triples of addresses, if enabled.
+	# The candidates are not stored in the result, since there may be up
+	# to 2^(3 * number of fuzzed bits) of them per register triple.
+	candidate_triples: Dict[Tuple[str, str, str], np.ndarray] = dict()
+	if statistics.triples:
+		candidate_triples = select_candidate_triples(statistics, reference)
+
+	# Step 2: Relation Extraction
+	result.constraints = extract_constraints(result.candidate_addr_bits, fuzzed_bits_idx)
+	result.relations = extract_relations(result.candidate_interrelated_addr_bits, fuzzed_bits_idx)
+	result.relations3 = extract_relations3(statistics, candidate_triples)
+
+	# Step 3: Relation Validation
+	validate_constraints(statistics, result.constraints)
+	validate_relations(statistics, result.relations)
+	validate_relations3(statistics, result.relations3)
+
+	return result
+
+def select_candidate_triples(
+	statistics: ClassStatistics, reference: Optional[ClassStatistics] = None
+) -> Dict[Tuple[str, str, str], np.ndarray]:
+	"""
+	Candidate Selection on triples of addresses: for each triple of
+	registers, find all combinations of values whose number of occurrences
+	differs from the expected number (see analyze_statistics).
+
+	Enumerating all 2^(3 * number of fuzzed bits) combinations is avoided
+	with an apriori-style pruning based on the pairwise joint histograms.
+	A triple (v1, v2, v3) cannot occur more often than any of its pairs
+	(v1, v2), (v1, v3) and (v2, v3). So:
+	- Triples that occurred are taken from the sparse histogram; their
+	  number is bounded by the number of testcases.
+	- Of the triples that did not occur, only those are candidates whose
+	  three pairs all occurred. If one of the pairs did not occur, the
+	  triple is already explained by a candidate pair.
+	
+	:param      statistics:  The statistics of this class (with triples)
+	:type       statistics:  ClassStatistics
+	:param      reference:   The statistics of all classes (optional)
+	:type       reference:   Optional[ClassStatistics]
+	
+	:returns:   The candidates per register triple, as packed keys (see
+	            ClassStatistics.pack_triple)
+	:rtype:     Dict[Tuple[str, str, str], np.ndarray]
+	"""
+	if len(statistics.hist3) == 0:
+		# less than three registers
+		return dict()
+	no_expected_testcases: int = expectedN(
+		3, len(statistics.registers), statistics.fuzzed_bits_idx, statistics.no_other_fuzzed_bits
+	)
+	no_fuzzed_bits: int = statistics.no_fuzzed_bits
+	candidate_triples: Dict[Tuple[str, str, str], np.ndarray] = dict()
+	for triple in statistics.hist3.keys():
+		register1, register2, register3 = triple
+		occurred12: np.ndarray = statistics.hist2[(register1, register2)] > 0
+		occurred13: np.ndarray = statistics.hist2[(register1, register3)] > 0
+		occurred23: np.ndarray = statistics.hist2[(register2, register3)] > 0
+		keys, counts = statistics.hist3_arrays(triple)
+
+		candidates: List[np.ndarray] = []
+		if reference is None:
+			candidates.append(keys[counts != no_expected_testcases])
+			# all triples that did not occur, but whose pairs did, one
+			# value of the first register at a time
+			for value1 in np.flatnonzero(occurred12.any(axis=1)):
+				not_occurred: np.ndarray = (
+					occurred12[value1][:, None] & occurred13[value1][None, :] & occurred23
+				).reshape(-1)
+				lo, hi = np.searchsorted(keys, [value1 << (2 * no_fuzzed_bits), (value1 + 1) << (2 * no_fuzzed_bits)])
+				not_occurred[keys[lo:hi] & ((1 << (2 * no_fuzzed_bits)) - 1)] = False
+				candidates.append((int(value1) << (2 * no_fuzzed_bits)) | np.flatnonzero(not_occurred))
+		else:
+			# the expected numbers are the (sparse) counts of the reference
+			reference_keys, reference_counts = reference.hist3_arrays(triple)
+			positions: np.ndarray = np.searchsorted(reference_keys, keys)
+			found: np.ndarray = positions < len(reference_keys)
+			found[found] = reference_keys[positions[found]] == keys[found]
+			expected: np.ndarray = np.zeros(len(keys), dtype=np.int64)
+			expected[found] = reference_counts[positions[found]]
+			candidates.append(keys[counts != expected])
+			not_occurred_keys: np.ndarray = reference_keys[~np.isin(reference_keys, keys)]
+			values1, values2, values3 = statistics.unpack_triples(not_occurred_keys)
+			candidates.append(not_occurred_keys[
+				occurred12[values1, values2] & occurred13[values1, values3] & occurred23[values2, values3]
+			])
+		candidate_triples[triple] = np.sort(np.concatenate(candidates))
+	return candidate_triples
+
+def extract_constraints(
+	candidate_addr_bits: List[Tuple[str, int]], fuzzed_bits_idx: Tuple[int, int]
+) -> List[ConstraintResult]:
+	"""
+	Relation Extraction for single candidate addresses: Find constraints
+	on single bits, i.e. all bits that are constant across all candidate
+	addresses of a register.
+	
+	:param      candidate_addr_bits:  The candidate (register, fuzzed bits)
+	                                  pairs
+	:type       candidate_addr_bits:  List[Tuple[str, int]]
+	:param      fuzzed_bits_idx:      The range of fuzzed bits (lower bound
+	                                  incl., upper bound excl.)
+	:type       fuzzed_bits_idx:      Tuple[int, int]
+	
+	:returns:   The constraints (not validated yet)
+	:rtype:     List[ConstraintResult]
+	"""
+	constraints: List[ConstraintResult] = []
+	for i in range(fuzzed_bits_idx[0], fuzzed_bits_idx[1]):
+		first: Dict[str, Optional[int]] = dict()
+		for register_name, addr_bits in candidate_addr_bits:
+			# addr_bits only contains the fuzzed bits, i.e. bit i of the
+			# address is bit (i - lower bound) of addr_bits.
+			bit: int = (addr_bits >> (i - fuzzed_bits_idx[0])) & 1
+			if register_name not in first:
+				first[register_name] = bit
+				continue
+			if first[register_name] is None:
+				continue
+			if first[register_name] != bit:
+				first[register_name] = None
+		for register_name, opt_bit in first.items():
+			if opt_bit is not None:
+				constraints.append(ConstraintResult(register_name, i, opt_bit))
+	return constraints
+
+def extract_relations(
+	candidate_interrelated_addr_bits: List[Tuple[Tuple[str, int], Tuple[str, int]]],
+	fuzzed_bits_idx: Tuple[int, int]
+) -> List[RelationResult]:
+	"""
+	Relation Extraction for candidate interrelated addresses. For each
+	previously collected pair of candidate interrelated addresses,
+	transform the relation into a linear equation y=ax+b mod |S_c|, where
+	x and y are the interrelated address bits. Collect these equations per
+	register pair. Then, for each register pair, try to solve the system
+	of equations (see `relation2`).
+	
+	:param      candidate_interrelated_addr_bits:  The candidate pairs
+	:type       candidate_interrelated_addr_bits:  List[Tuple[Tuple[str, int], Tuple[str, int]]]
+	:param      fuzzed_bits_idx:                   The range of fuzzed bits
+	                                               (lower bound incl., upper
+	                                               bound excl.)
+	:type       fuzzed_bits_idx:                   Tuple[int, int]
+	
+	:returns:   The relations (not validated yet)
+	:rtype:     List[RelationResult]
+	"""
+	points_per_regpair: Dict[Tuple[str, str], List[Tuple[int, int]]] = dict()
+	for cir1, cir2 in candidate_interrelated_addr_bits:
+		register1, bits_value1 = cir1
+		register2, bits_value2 = cir2
+		points_per_regpair.setdefault((register1, register2), []).append((bits_value1, bits_value2))
+
+	relations: List[RelationResult] = []
+	for (register1, register2), points in points_per_regpair.items():
+		if len(points) >= 2:
+			solution: Optional[Tuple[int, int]] = relation2(points, fuzzed_bits_idx)
+			if solution is not None:
+				relations.append(RelationResult(register1, register2, solution[0], solution[1]))
+	return relations
+
+def extract_relations3(
+	statistics: ClassStatistics, candidate_triples: Dict[Tuple[str, str, str], np.ndarray]
+) -> List[Relation3Result]:
+	"""
+	Relation Extraction for candidate triples of interrelated addresses:
+	for each register triple, try to express all candidates in a linear
+	equation z = a*x + b*y + c mod |S_c| (see `relation3`).
+	
+	:param      statistics:         The statistics of this class
+	:type       statistics:         ClassStatistics
+	:param      candidate_triples:  The candidates per register triple
+	:type       candidate_triples:  Dict[Tuple[str, str, str], np.ndarray]
+	
+	:returns:   The relations (not validated yet)
+	:rtype:     List[Relation3Result]
+	"""
+	relations: List[Relation3Result] = []
+	for (register1, register2, register3), keys in candidate_triples.items():
+		if len(keys) >= 3:
+			points: np.ndarray = np.stack(statistics.unpack_triples(keys), axis=1)
+			solution: Optional[Tuple[int, int, int]] = relation3(points, statistics.fuzzed_bits_idx)
+			if solution is not None:
+				relations.append(Relation3Result(register1, register2, register3, *solution))
+	return relations
+
+def validate_constraints(statistics: ClassStatistics, constraints: List[ConstraintResult]) -> None:
+	"""
+	Validates constraints: finds out how many of the values in the same
+	register have the same bit value at the relevant position. The match
+	counts are stored in the given constraint objects.
+	
+	:param      statistics:   The statistics of the bittable
+	:type       statistics:   ClassStatistics
+	:param      constraints:  The constraints
+	:type       constraints:  List[ConstraintResult]
+	
+	:returns:   -
+	:rtype:     None
+	"""
+	bits_values: np.ndarray = np.arange(statistics.no_values)
+	for constraint in constraints:
+		bit_index: int = constraint.bit_index - statistics.fuzzed_bits_idx[0]
+		satisfied: np.ndarray = ((bits_values >> bit_index) & 1) == constraint.bit_value
+		constraint.match_sat = int(statistics.hist1[constraint.register][satisfied].sum())
+		constraint.match_all = statistics.no_testcases
+
+def validate_relations(statistics: ClassStatistics, relations: List[RelationResult]) -> None:
+	"""
+	Validates relations: finds out for how many testcases the fuzzed bits
+	of both registers satisfy the relation. The match counts are stored in
+	the given relation objects.
+	
+	:param      statistics:  The statistics of the bittable
+	:type       statistics:  ClassStatistics
+	:param      relations:   The relations
+	:type       relations:   List[RelationResult]
+	
+	:returns:   -
+	:rtype:     None
+	"""
+	bits_values: np.ndarray = np.arange(statistics.no_values)
+	for relation in relations:
+		hist: np.ndarray = statistics.hist2[(relation.register_x, relation.register_y)]
+		expected_y: np.ndarray = (relation.a * bits_values + relation.b) & (statistics.no_values - 1)
+		relation.match_sat = int(hist[bits_values, expected_y].sum())
+		relation.match_all = statistics.no_testcases
+
+def validate_relations3(statistics: ClassStatistics, relations: List[Relation3Result]) -> None:
+	"""
+	Validates relations between three registers: finds out for how many
+	testcases the fuzzed bits of the three registers satisfy the relation.
+	The match counts are stored in the given relation objects.
+	
+	:param      statistics:  The statistics of the bittable
+	:type       statistics:  ClassStatistics
+	:param      relations:   The relations
+	:type       relations:   List[Relation3Result]
 	
-	no_fuzzed_bits: int = fuzzed_bits_idx[1] - fuzzed_bits_idx[0]
-
-	# Analyze the bit tables one by one
-	for class_id, bittable in classification.items():
-		# Step 1: Candidate Selection on single addresses. For each
-		# possible value of the fuzzed bits in each register, count and
-		# compare the number of occurrences in the bittable with the
-		# expected number if no hidden behavior occurred.
-		candidate_addr_bits: List[Tuple[str, int]] = []
-		no_expected_testcases: int = expected1(len(registers), fuzzed_bits_idx)
-		for register in registers:
-			for bits_value in range(1 << no_fuzzed_bits):
-				count: int = occ1(bittable, register, fuzzed_bits_idx, bits_value)
-				if count != no_expected_testcases:
-					candidate_addr_bits.append((register, bits_value))
-					print(f"Candidate address bits {candidate_addr_bits[-1]}")
-		
-		# Step 1': Candidate Selection on pairs of addresses. For each
-		# possible combination of values in all possible pairs of
-		# registers, count and compare the number of occurrences in the
-		# bittable with the expected number if no hidden behavior occurred.
-		candidate_interrelated_addr_bits: List[Tuple[Tuple[str, int],Tuple[str, int]]] = []
-		no_expected_testcases = expectedN(2, len(registers), fuzzed_bits_idx)
-		for register1, register2 in itertools.combinations(registers, 2):
-			for bits_value1, bits_value2 in itertools.product(range(1 << no_fuzzed_bits), range(1 << no_fuzzed_bits)):
-				count = occN(bittable, [register1, register2], [fuzzed_bits_idx, fuzzed_bits_idx], [bits_value1, bits_value2])
-				if count != no_expected_testcases:
-					candidate_interrelated_addr_bits.append(((register1, bits_value1), (register2, bits_value2)))
-					print(f"Candidate interrelated address bits {candidate_interrelated_addr_bits[-1]}")
-
-		# Step 2a: Relation Extraction for single candidate addresses: Find
-		# constraints on single bits or sequences of bits.
-		
-		# Find all bits that are constant across all candidate addresses.
-		constraints: List[Tuple[str, int, int]] = []
-		for i in range(fuzzed_bits_idx[0], fuzzed_bits_idx[1]):
-			first: Dict[str, Optional[int]] = dict()
-			for register_name, addr_bits in candidate_addr_bits:
-				bit: int = 0 if (addr_bits & (1 << i)) == 0 else 1
-				if register_name not in first:
-					first[register_name] = bit
-					continue
-				if first[register_name] is None:
-					continue
-				if first[register_name] != bit:
-					first[register_name] = None
-			for register_name, opt_bit in first.items():
-				if opt_bit is not None:
-					constraints.append((register_name, i, opt_bit))
-
-		print(f"Identified Constraints (bit index, bit value): {constraints}")
-
-		# Step 2b: Relation Extraction for candidate interrelated
-		# addresses. For each previously collected pair of candidate
-		# interrelated addresses, transform the relation into a linear
-		# equation y=ax+b mod |S_c|, where x and y are the interrelated
-		# address bits. Collect these equations per register pair. Then,
-		# for each register pair, try to solve the system of equations.
-		polynomials_per_regpair: Dict[str, List[sympy.Poly]] = dict()
-		symbols = sympy.symbols('a b')
-		for cir1, cir2 in candidate_interrelated_addr_bits:
-			register1, bits_value1 = cir1
-			register2, bits_value2 = cir2
-			polynomial: sympy.Poly = relation2(bits_value1, bits_value2, fuzzed_bits_idx, symbols)
-			polynomials_per_regpair.setdefault(f"{register1}_{register2}", []).append(polynomial)
-
-		relations: List[Tuple[str, int, int]] = []
-		for register_pair, polynomials in polynomials_per_regpair.items():
-			if len(polynomials) >= 2:
-				result: Dict[sympy.Symbol, int] = sympy.solve(polynomials, list(symbols))
-				if symbols[0] in result and symbols[1] in result:
-					relations.append((register_pair, result[symbols[0]], result[symbols[1]]))
-					print(f"Class {class_id}: Found relation: {register_pair}: y = {result[symbols[0]]} * x + {result[symbols[1]]}")
-
-		# Step 3: Relation Validation
-		# - Validate constraints (find out how may of the values in the
-		#   same register have the same bit value at the relevant position)
-		for register_name, i, bit in constraints:
-			cnt_constraints_sat: int = 0
-			cnt_constraints_all: int = 0
-			for measurement in bittable:
-				register_contents: Dict[str, int] = measurement.register_contents()
-				if (
-					register_name in register_contents
-					and (register_contents[register_name] & (1 << i)) == (bit << i)
-				):
-					cnt_constraints_sat += 1
-				cnt_constraints_all += 1
-			
-			print(f"Class {class_id}: constraint: {register_name}, bit {i} is {bit}" +
-				f" -- match rate: {cnt_constraints_sat}/{cnt_constraints_all} ({cnt_constraints_sat/cnt_constraints_all})")
-		
-		# - Validate Relations
-		for relation in relations:
-			cnt_rel_sat: int = 0
-			cnt_rel_all: int = 0
-
-			register_pair, value_a, value_b = relation
-			reg1, reg2 = register_pair.split("_")
-
-			for measurement in bittable:
-				register_contents = measurement.register_contents()
-				if (
-					reg1 in register_contents
-					and reg2 in register_contents
-					and register_contents[reg2] == (value_a * register_contents[reg1] + value_b) % (1 << no_fuzzed_bits)
-				):
-					cnt_rel_sat += 1
-				cnt_rel_all += 1
-			
-			print(f"Class {class_id}: relation {register_pair}: y = {value_a} * x + {value_b}" +
-				f" -- match rate: {cnt_rel_sat}/{cnt_rel_all} ({cnt_rel_sat/cnt_rel_all})")
\ No newline at end of file
+	:returns:   -
+	:rtype:     None
+	"""
+	for relation in relations:
+		keys, counts = statistics.hist3_arrays((relation.register_x, relation.register_y, relation.register_z))
+		x, y, z = statistics.unpack_triples(keys)
+		satisfied: np.ndarray = ((relation.a * x + relation.b * y + relation.c) & (statistics.no_values - 1)) == z
+		relation.match_sat = int(counts[satisfied].sum())
+		relation.match_all = statistics.no_testcases
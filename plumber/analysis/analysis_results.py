@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import json
+
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Tuple
+
+@dataclass
+class ConstraintResult:
+	"""
+	A constraint on a single bit of a register: in the analyzed class, bit
+	`bit_index` of `register` is expected to be `bit_value`.
+	"""
+	register: str
+	bit_index: int
+	bit_value: int
+	match_sat: int = 0
+	match_all: int = 0
+
+	def match_rate(self) -> float:
+		return self.match_sat / self.match_all if self.match_all > 0 else 0.0
+
+	def __str__(self) -> str:
+		return f"constraint: {self.register}, bit {self.bit_index} is {self.bit_value}" + \
+			f" -- match rate: {self.match_sat}/{self.match_all} ({self.match_rate()})"
+
+@dataclass
+class RelationResult:
+	"""
+	A linear relation between the fuzzed bits of two registers:
+	y = a * x + b mod 2^(number of fuzzed bits), where x are the fuzzed
+	bits of `register_x` and y are the fuzzed bits of `register_y`.
+	"""
+	register_x: str
+	register_y: str
+	a: int
+	b: int
+	match_sat: int = 0
+	match_all: int = 0
+
+	def match_rate(self) -> float:
+		return self.match_sat / self.match_all if self.match_all > 0 else 0.0
+
+	def register_pair(self) -> str:
+		return f"{self.register_x}_{self.register_y}"
+
+	def __str__(self) -> str:
+		return f"relation {self.register_pair()}: y = {self.a} * x + {self.b}" + \
+			f" -- match rate: {self.match_sat}/{self.match_all} ({self.match_rate()})"
+
+@dataclass
+class Relation3Result:
+	"""
+	A linear relation between the fuzzed bits of three registers:
+	z = a * x + b * y + c mod 2^(number of fuzzed bits), where x, y and z
+	are the fuzzed bits of `register_x`, `register_y` and `register_z`.
+	"""
+	register_x: str
+	register_y: str
+	register_z: str
+	a: int
+	b: int
+	c: int
+	match_sat: int = 0
+	match_all: int = 0
+
+	def match_rate(self) -> float:
+		return self.match_sat / self.match_all if self.match_all > 0 else 0.0
+
+	def register_triple(self) -> str:
+		return f"{self.register_x}_{self.register_y}_{self.register_z}"
+
+	def __str__(self) -> str:
+		return f"relation {self.register_triple()}: z = {self.a} * x + {self.b} * y + {self.c}" + \
+			f" -- match rate: {self.match_sat}/{self.match_all} ({self.match_rate()})"
+
+@dataclass
+class ClassAnalysisResult:
+	"""
+	Result of the analysis of one class (bittable) of a classification.
+	"""
+	class_id: int
+	no_testcases: int
+	candidate_addr_bits: List[Tuple[str, int]] = field(default_factory=list)
+	candidate_interrelated_addr_bits: List[Tuple[Tuple[str, int], Tuple[str, int]]] = field(default_factory=list)
+	constraints: List[ConstraintResult] = field(default_factory=list)
+	relations: List[RelationResult] = field(default_factory=list)
+	relations3: List[Relation3Result] = field(default_factory=list)
+
+	def to_dict(self) -> Dict[str, Any]:
+		return asdict(self)
+
+	def summary(self) -> str:
+		"""
+		Returns a human-readable summary of the analysis result (one line
+		per constraint and relation).
+
+		:returns:   Summary
+		:rtype:     str
+		"""
+		lines: List[str] = [f"Class {self.class_id}: {self.no_testcases} testcases"]
+		lines += [f"Class {self.class_id}: {constraint}" for constraint in self.constraints]
+		lines += [f"Class {self.class_id}: {relation}" for relation in self.relations]
+		lines += [f"Class {self.class_id}: {relation}" for relation in self.relations3]
+		return "\n".join(lines)
+
+def analysis_results_to_json(results: List[ClassAnalysisResult]) -> str:
+	"""
+	Serializes a list of analysis results to JSON.
+
+	:param      results:  The analysis results
+	:type       results:  List[ClassAnalysisResult]
+
+	:returns:   JSON representation
+	:rtype:     str
+	"""
+	return json.dumps([result.to_dict() for result in results], indent=2)
+
+def merge_analysis_results(results_per_group: List[List[ClassAnalysisResult]]) -> List[ClassAnalysisResult]:
+	"""
+	Merges the analysis results of disjoint groups of registers (e.g.
+	registers with different ranges of fuzzed bits) into one result per
+	class.
+	
+	:param      results_per_group:  The analysis results of each group
+	:type       results_per_group:  List[List[ClassAnalysisResult]]
+	
+	:returns:   One analysis result per class, ordered by class id
+	:rtype:     List[ClassAnalysisResult]
+	"""
+	merged: Dict[int, ClassAnalysisResult] = dict()
+	for results in results_per_group:
+		for result in results:
+			if result.class_id not in merged:
+				merged[result.class_id] = ClassAnalysisResult(result.class_id, result.no_testcases)
+			merged_result: ClassAnalysisResult = merged[result.class_id]
+			merged_result.candidate_addr_bits += result.candidate_addr_bits
+			merged_result.candidate_interrelated_addr_bits += result.candidate_interrelated_addr_bits
+			merged_result.constraints += result.constraints
+			merged_result.relations += result.relations
+			merged_result.relations3 += result.relations3
+	return [merged[class_id] for class_id in sorted(merged.keys())]
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import itertools
+import numpy as np
+
+from collections import Counter
+from typing import Dict, List, Tuple, Iterable
+
+class ClassStatistics:
+	"""
+	Sufficient statistics of a bittable for the analysis: for each
+	register, a histogram of the values of its fuzzed bits, and for each
+	pair of registers, the joint histogram of their fuzzed bits. All
+	steps of the analysis (candidate selection, relation extraction and
+	validation) only need these counts, so they can be updated one
+	testcase at a time and merged across processes.
+
+	hist1[register][v] is the number of testcases where the fuzzed bits
+	of register are v. hist2[(register1, register2)][v1, v2] is the number
+	of testcases where the fuzzed bits of register1 are v1 and those of
+	register2 are v2.
+
+	Optionally (triples=True), the joint histograms of all triples of
+	registers are collected as well. A dense triple histogram has
+	2^(3 * number of fuzzed bits) entries, most of which are zero for a
+	single class, so they are stored sparsely: hist3[(r1, r2, r3)] maps
+	the packed fuzzed bits (see pack_triple) of all triples that occurred
+	to their number of occurrences.
+
+	The registers may be one of several groups of registers with different
+	ranges of fuzzed bits. The fuzzed bits of the other groups
+	(no_other_fuzzed_bits) multiply the number of testcases per value of
+	this group.
+	"""
+	def __init__(
+		self, registers: List[str], fuzzed_bits_idx: Tuple[int, int], triples: bool = False,
+		no_other_fuzzed_bits: int = 0
+	) -> None:
+		self.registers: List[str] = registers
+		self.fuzzed_bits_idx: Tuple[int, int] = fuzzed_bits_idx
+		self.no_other_fuzzed_bits: int = no_other_fuzzed_bits
+		self.no_fuzzed_bits: int = fuzzed_bits_idx[1] - fuzzed_bits_idx[0]
+		self.no_values: int = 1 << self.no_fuzzed_bits
+		self.no_testcases: int = 0
+		self.hist1: Dict[str, np.ndarray] = {
+			register: np.zeros(self.no_values, dtype=np.int64)
+			for register in registers
+		}
+		self.hist2: Dict[Tuple[str, str], np.ndarray] = {
+			pair: np.zeros((self.no_values, self.no_values), dtype=np.int64)
+			for pair in itertools.combinations(registers, 2)
+		}
+		self.triples: bool = triples
+		self.hist3: Dict[Tuple[str, str, str], Counter[int]] = {
+			triple: Counter()
+			for triple in itertools.combinations(registers, 3)
+		} if triples else dict()
+
+	def fuzzed_bits(self, register_value: int) -> int:
+		"""
+		Extracts the fuzzed bits from a register value.
+
+		:param      register_value:  The register value
+		:type       register_value:  int
+
+		:returns:   The fuzzed bits
+		:rtype:     int
+		"""
+		return (register_value >> self.fuzzed_bits_idx[0]) & (self.no_values - 1)
+
+	def pack_triple(self, value1: int, value2: int, value3: int) -> int:
+		"""
+		Packs the fuzzed bits of three registers into a single key of
+		hist3.
+
+		:param      value1:  The fuzzed bits of the first register
+		:type       value1:  int
+		:param      value2:  The fuzzed bits of the second register
+		:type       value2:  int
+		:param      value3:  The fuzzed bits of the third register
+		:type       value3:  int
+
+		:returns:   The packed key
+		:rtype:     int
+		"""
+		return (value1 << (2 * self.no_fuzzed_bits)) | (value2 << self.no_fuzzed_bits) | value3
+
+	def unpack_triples(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+		"""
+		Inverse of pack_triple for an array of keys.
+
+		:param      keys:  The packed keys
+		:type       keys:  np.ndarray
+
+		:returns:   The fuzzed bits of the first, second and third register
+		:rtype:     Tuple[np.ndarray, np.ndarray, np.ndarray]
+		"""
+		mask: int = self.no_values - 1
+		return (
+			(keys >> (2 * self.no_fuzzed_bits)) & mask,
+			(keys >> self.no_fuzzed_bits) & mask,
+			keys & mask
+		)
+
+	def hist3_arrays(self, triple: Tuple[str, str, str]) -> Tuple[np.ndarray, np.ndarray]:
+		"""
+		Returns the sparse joint histogram of a register triple as two
+		arrays: the packed keys (sorted) and their counts.
+
+		:param      triple:  The register triple
+		:type       triple:  Tuple[str, str, str]
+
+		:returns:   (keys, counts)
+		:rtype:     Tuple[np.ndarray, np.ndarray]
+		"""
+		hist: Counter[int] = self.hist3[triple]
+		keys: np.ndarray = np.fromiter(hist.keys(), dtype=np.int64, count=len(hist))
+		counts: np.ndarray = np.fromiter(hist.values(), dtype=np.int64, count=len(hist))
+		order: np.ndarray = np.argsort(keys)
+		return keys[order], counts[order]
+
+	def add(self, register_contents: Dict[str, int]) -> None:
+		"""
+		Adds a single testcase to the statistics. Registers that are not
+		part of the statistics are ignored.
+
+		:param      register_contents:  The register contents of the
+		                                testcase
+		:type       register_contents:  Dict[str, int]
+
+		:returns:   -
+		:rtype:     None
+		"""
+		self._add_fuzzed_bits({
+			register: self.fuzzed_bits(register_contents[register])
+			for register in self.registers if register in register_contents
+		})
+
+	def add_row(self, values: np.ndarray, valid: np.ndarray) -> None:
+		"""
+		Adds a single testcase to the statistics, given as a row of a
+		register matrix (see RegisterMatrix.row). Variant of add for
+		measurements that are views into a register matrix.
+
+		:param      values:  The register contents of the testcase;
+		                     element j holds the contents of registers[j]
+		:type       values:  np.ndarray
+		:param      valid:   Whether the register was used in the
+		                     testcase, same shape as values
+		:type       valid:   np.ndarray
+
+		:returns:   -
+		:rtype:     None
+		"""
+		assert values.shape == valid.shape == (len(self.registers),)
+		bits: List[int] = (
+			(values >> np.uint64(self.fuzzed_bits_idx[0])) & np.uint64(self.no_values - 1)
+		).tolist()
+		used: List[bool] = valid.tolist()
+		self._add_fuzzed_bits({register: bits[j] for j, register in enumerate(self.registers) if used[j]})
+
+	def _add_fuzzed_bits(self, values: Dict[str, int]) -> None:
+		# values: register -> fuzzed bits, of the registers used in the
+		# testcase
+		for register, value in values.items():
+			self.hist1[register][value] += 1
+		for (register1, register2), hist in self.hist2.items():
+			if register1 in values and register2 in values:
+				hist[values[register1], values[register2]] += 1
+		for (register1, register2, register3), hist3 in self.hist3.items():
+			if register1 in values and register2 in values and register3 in values:
+				hist3[self.pack_triple(values[register1], values[register2], values[register3])] += 1
+		self.no_testcases += 1
+
+	def add_array(self, values: np.ndarray, valid: np.ndarray) -> ClassStatistics:
+		"""
+		Adds multiple testcases to the statistics at once. Vectorized
+		variant of add.
+
+		:param      values:  The register contents of the testcases, shape
+		                     (number of testcases, number of registers);
+		                     column j holds the contents of registers[j]
+		:type       values:  np.ndarray
+		:param      valid:   Whether the register was used in the
+		                     testcase, same shape as values
+		:type       valid:   np.ndarray
+
+		:returns:   self
+		:rtype:     ClassStatistics
+		"""
+		assert values.shape == valid.shape and values.shape[1] == len(self.registers)
+		bits: np.ndarray = (
+			(values >> np.uint64(self.fuzzed_bits_idx[0])) & np.uint64(self.no_values - 1)
+		).astype(np.int64)
+		column: Dict[str, int] = {register: j for j, register in enumerate(self.registers)}
+		for register, hist in self.hist1.items():
+			j: int = column[register]
+			hist += np.bincount(bits[valid[:, j], j], minlength=self.no_values)
+		for (register1, register2), hist in self.hist2.items():
+			j1, j2 = column[register1], column[register2]
+			rows: np.ndarray = valid[:, j1] & valid[:, j2]
+			hist += np.bincount(
+				bits[rows, j1] * self.no_values + bits[rows, j2], minlength=self.no_values * self.no_values
+			).reshape(self.no_values, self.no_values)
+		for (register1, register2, register3), hist3 in self.hist3.items():
+			j1, j2, j3 = column[register1], column[register2], column[register3]
+			rows = valid[:, j1] & valid[:, j2] & valid[:, j3]
+			keys, counts = np.unique(
+				self.pack_triple(bits[rows, j1], bits[rows, j2], bits[rows, j3]), return_counts=True
+			)
+			hist3.update(dict(zip(keys.tolist(), counts.tolist())))
+		self.no_testcases += values.shape[0]
+		return self
+
+	def add_all(self, all_register_contents: Iterable[Dict[str, int]]) -> ClassStatistics:
+		"""
+		Adds multiple testcases to the statistics.
+
+		:param      all_register_contents:  The register contents of the
+		                                    testcases
+		:type       all_register_contents:  Iterable[Dict[str, int]]
+
+		:returns:   self
+		:rtype:     ClassStatistics
+		"""
+		for register_contents in all_register_contents:
+			self.add(register_contents)
+		return self
+
+	def merge(self, other: ClassStatistics) -> ClassStatistics:
+		"""
+		Adds the counts of another statistics object (over the same
+		registers, fuzzed bits and orders) to this one.
+
+		:param      other:  The other statistics object
+		:type       other:  ClassStatistics
+
+		:returns:   self
+		:rtype:     ClassStatistics
+		"""
+		assert self.registers == other.registers and self.fuzzed_bits_idx == other.fuzzed_bits_idx
+		assert self.triples == other.triples and self.no_other_fuzzed_bits == other.no_other_fuzzed_bits
+		for register, hist in other.hist1.items():
+			self.hist1[register] += hist
+		for pair, hist in other.hist2.items():
+			self.hist2[pair] += hist
+		for triple, hist3 in other.hist3.items():
+			self.hist3[triple].update(hist3)
+		self.no_testcases += other.no_testcases
+		return self
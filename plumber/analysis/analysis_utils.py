@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-import sympy
+import numpy as np
+
 from typing import List, Optional, Tuple, Dict, Iterator, TYPE_CHECKING
 if TYPE_CHECKING:
 	from classification.measurement import Measurement
@@ -134,7 +135,7 @@ def occ1(
 	return len(list(select1(bittable, reg_name, bits_idx, bits_value)))
 
 def expectedN(
-	n: int, no_registers: int, bits_idx: Tuple[int, int]
+	n: int, no_registers: int, bits_idx: Tuple[int, int], no_other_fuzzed_bits: int = 0
 ) -> int:
 	"""
 	Returns the exepcted number of occurrences of each value if no
@@ -148,15 +149,20 @@ def expectedN(
 	:param      bits_idx:      The range of fuzzed bits  (lower bound
 	                           incl., upper bound excl.)
 	:type       bits_idx:      Tuple[int, int]
+	:param      no_other_fuzzed_bits:  Number of fuzzed bits of the
+	                                   campaign in registers outside of
+	                                   the bittable (fuzzed with other
+	                                   ranges of bits)
+	:type       no_other_fuzzed_bits:  int
 	
 	:returns:   Expected number of occurrences
 	:rtype:     int
 	"""
 	no_fuzzed_bits: int = bits_idx[1] - bits_idx[0]
-	return (1 << no_fuzzed_bits * (no_registers - n))
+	return (1 << (no_fuzzed_bits * (no_registers - n) + no_other_fuzzed_bits))
 
 def expected1(
-	no_registers: int, bits_idx: Tuple[int, int]
+	no_registers: int, bits_idx: Tuple[int, int], no_other_fuzzed_bits: int = 0
 ) -> int:
 	"""
 	Returns the exepcted number of occurrences if no undocumented behavior
@@ -167,32 +173,96 @@ def expected1(
 	:param      bits_idx:      The range of fuzzed bits  (lower bound
 	                           incl., upper bound excl.)
 	:type       bits_idx:      Tuple[int, int]
+	:param      no_other_fuzzed_bits:  Number of fuzzed bits of the
+	                                   campaign in registers outside of
+	                                   the bittable
+	:type       no_other_fuzzed_bits:  int
 	
 	:returns:   Expected number of occurrences
 	:rtype:     int
 	"""
-	return expectedN(1, no_registers, bits_idx)
+	return expectedN(1, no_registers, bits_idx, no_other_fuzzed_bits)
 
 def relation2(
-	addr1_bits: int, addr2_bits: int, bits_idx: Tuple[int, int], symbols: Tuple[sympy.Symbol,sympy.Symbol]
-) -> sympy.Poly:
-	"""
-	Expresses the relation between two addresses in a linear equation.
-	
-	:param      addr1_bits:  The fuzzed bits from address 1
-	:type       addr1_bits:  int
-	:param      addr2_bits:  The fuzzed bits from address 2
-	:type       addr2_bits:  int
-	:param      bits_idx:    The range of fuzzed bits  (lower bound incl.,
-	                         upper bound excl.)
-	:type       bits_idx:    Tuple
-	:param      symbols:     The sympy symbols
-	:type       symbols:     Tuple[sympy.Symbol,sympy.Symbol]
-	
-	:returns:   Sympy Polynomial that represents the linear relation
-	:rtype:     sympy.Poly
-	"""
-	return sympy.Poly(
-		symbols[0] * addr1_bits + symbols[1] - addr2_bits,
-		modulus=(1 << (bits_idx[1]-bits_idx[0]))
-	)
+	points: List[Tuple[int, int]], bits_idx: Tuple[int, int]
+) -> Optional[Tuple[int, int]]:
+	"""
+	Expresses the relation between two addresses in a linear equation
+	y = a * x + b mod 2^n, where x and y are the fuzzed bits of the two
+	addresses and n is the number of fuzzed bits. Each point (x, y) yields
+	one equation; the returned coefficients satisfy all of them.
+
+	The system is solved by exhaustive search over a, since a general
+	purpose solver does not honor the modulus: for each a, the first
+	equation determines b, which is then checked against all other
+	equations. If there are multiple solutions, the one with the smallest
+	a is returned.
+	
+	:param      points:    The fuzzed bits (x, y) of both addresses for all
+	                       candidate pairs
+	:type       points:    List[Tuple[int, int]]
+	:param      bits_idx:  The range of fuzzed bits  (lower bound incl.,
+	                       upper bound excl.)
+	:type       bits_idx:  Tuple[int, int]
+	
+	:returns:   (a, b) if the equations can be solved, None otherwise
+	:rtype:     Optional[Tuple[int, int]]
+	"""
+	if len(points) == 0:
+		return None
+	mask: int = (1 << (bits_idx[1] - bits_idx[0])) - 1
+	x0, y0 = points[0]
+	for a in range(mask + 1):
+		b: int = (y0 - a * x0) & mask
+		if all((a * x + b) & mask == y for x, y in points):
+			return (a, b)
+	return None
+
+def relation3(
+	points: np.ndarray, bits_idx: Tuple[int, int]
+) -> Optional[Tuple[int, int, int]]:
+	"""
+	Expresses the relation between three addresses in a linear equation
+	z = a * x + b * y + c mod 2^n, where x, y and z are the fuzzed bits of
+	the three addresses and n is the number of fuzzed bits. Each point
+	(x, y, z) yields one equation; the returned coefficients satisfy all
+	of them.
+
+	Like relation2, the system is solved by exhaustive search, here over
+	all (a, b): the first equation determines c, and the remaining
+	equations are checked in chunks, discarding all (a, b) that violate
+	an equation. Usually, only a few chunks are needed until either one
+	solution remains or none. If there are multiple solutions, the one
+	with the smallest (a, b) is returned.
+
+	Since there can be many candidate triples, the points are passed as
+	an array instead of a list of tuples.
+
+	:param      points:    The fuzzed bits (x, y, z) of the three addresses
+	                       for all candidate triples, shape (k, 3)
+	:type       points:    np.ndarray
+	:param      bits_idx:  The range of fuzzed bits  (lower bound incl.,
+	                       upper bound excl.)
+	:type       bits_idx:  Tuple[int, int]
+
+	:returns:   (a, b, c) if the equations can be solved, None otherwise
+	:rtype:     Optional[Tuple[int, int, int]]
+	"""
+	if len(points) == 0:
+		return None
+	mask: int = (1 << (bits_idx[1] - bits_idx[0])) - 1
+	a: np.ndarray = np.repeat(np.arange(mask + 1, dtype=np.int64), mask + 1)
+	b: np.ndarray = np.tile(np.arange(mask + 1, dtype=np.int64), mask + 1)
+	x0, y0, z0 = (int(v) for v in points[0])
+	c: np.ndarray = (z0 - a * x0 - b * y0) & mask
+	chunk_size: int = 64
+	for start in range(1, len(points), chunk_size):
+		x, y, z = (points[start:start + chunk_size, i].astype(np.int64) for i in range(3))
+		satisfied: np.ndarray = (
+			(a[:, None] * x[None, :] + b[:, None] * y[None, :] + c[:, None]) & mask
+		) == z[None, :]
+		keep: np.ndarray = np.asarray(satisfied.all(axis=1))
+		a, b, c = a[keep], b[keep], c[keep]
+		if len(a) == 0:
+			return None
+	return (int(a[0]), int(b[0]), int(c[0]))
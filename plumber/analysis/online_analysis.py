@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import numpy as np
+
+from typing import Optional, List, Dict, Tuple
+
+from .analysis_statistics import ClassStatistics
+from .analysis_functions import analyze_statistics
+from .analysis_results import ClassAnalysisResult
+
+class OnlineAnalyzer:
+	"""
+	Incremental variant of analyze_fuzzed_bits: keeps the sufficient
+	statistics (see ClassStatistics) of every class and of all testcases
+	combined, and updates them one testcase at a time. Candidates,
+	constraints and relations can be queried at any time; they are computed
+	from the statistics seen so far.
+
+	Since the campaign may be incomplete, the candidate selection compares
+	the counts of a class with the counts over all testcases seen so far
+	instead of the counts expected for a complete campaign (see
+	analyze_statistics). Once all testcases of a campaign that covers all
+	combinations of fuzzed bits were added, the results are the same as
+	those of analyze_fuzzed_bits.
+	"""
+	def __init__(
+		self, fuzzed_bits_idx: Tuple[int, int], registers: Optional[List[str]] = None, triples: bool = False
+	) -> None:
+		self.fuzzed_bits_idx: Tuple[int, int] = fuzzed_bits_idx
+		# also extract relations between triples of registers
+		self.triples: bool = triples
+		# if not given, the registers are taken from the first testcase.
+		# assumption: all testcases use the same set of registers
+		self.registers: Optional[List[str]] = registers
+		self.statistics_per_class: Dict[int, ClassStatistics] = dict()
+		self.statistics_all: Optional[ClassStatistics] = None
+
+	def no_testcases(self) -> int:
+		return 0 if self.statistics_all is None else self.statistics_all.no_testcases
+
+	def add(self, class_id: int, register_contents: Dict[str, int]) -> None:
+		"""
+		Adds a classified testcase.
+
+		:param      class_id:           The class of the testcase
+		:type       class_id:           int
+		:param      register_contents:  The register contents of the
+		                                testcase
+		:type       register_contents:  Dict[str, int]
+
+		:returns:   -
+		:rtype:     None
+		"""
+		if self.registers is None:
+			self.registers = list(register_contents.keys())
+		statistics_class, statistics_all = self._statistics(class_id, self.registers)
+		statistics_class.add(register_contents)
+		statistics_all.add(register_contents)
+
+	def add_row(self, class_id: int, values: np.ndarray, valid: np.ndarray) -> None:
+		"""
+		Adds a classified testcase, given as its row of a register matrix
+		over the registers of the analyzer (see Measurement.register_arrays).
+
+		:param      class_id:  The class of the testcase
+		:type       class_id:  int
+		:param      values:    The contents of the registers of the analyzer
+		:type       values:    np.ndarray
+		:param      valid:     Whether the register was used in the
+		                       testcase, same shape as values
+		:type       valid:     np.ndarray
+
+		:returns:   -
+		:rtype:     None
+		"""
+		if self.registers is None:
+			raise Exception("Adding rows requires the registers of the analyzer.")
+		statistics_class, statistics_all = self._statistics(class_id, self.registers)
+		statistics_class.add_row(values, valid)
+		statistics_all.add_row(values, valid)
+
+	def _statistics(self, class_id: int, registers: List[str]) -> Tuple[ClassStatistics, ClassStatistics]:
+		# the statistics of the class and of all testcases, created on
+		# first use
+		if self.statistics_all is None:
+			self.statistics_all = ClassStatistics(registers, self.fuzzed_bits_idx, self.triples)
+		if class_id not in self.statistics_per_class:
+			self.statistics_per_class[class_id] = ClassStatistics(registers, self.fuzzed_bits_idx, self.triples)
+		return self.statistics_per_class[class_id], self.statistics_all
+
+	def analyze_class(self, class_id: int) -> ClassAnalysisResult:
+		"""
+		Returns the current candidates, constraints and relations of a
+		class.
+
+		:param      class_id:  The class identifier
+		:type       class_id:  int
+
+		:returns:   The analysis result for this class
+		:rtype:     ClassAnalysisResult
+		"""
+		if class_id not in self.statistics_per_class:
+			raise KeyError(f"No testcases in class {class_id} yet.")
+		return analyze_statistics(class_id, self.statistics_per_class[class_id], self.statistics_all)
+
+	def analyze(self) -> List[ClassAnalysisResult]:
+		"""
+		Returns the current analysis results of all classes seen so far,
+		ordered by class id.
+
+		:returns:   One analysis result per class
+		:rtype:     List[ClassAnalysisResult]
+		"""
+		return [self.analyze_class(class_id) for class_id in sorted(self.statistics_per_class.keys())]
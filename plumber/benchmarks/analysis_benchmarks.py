@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from analysis.analysis_results import ClassAnalysisResult
+from classification.classification_methods import BatchClassifier, build_batch_classifier, classify_batch
+from classification.measurement_batch import MeasurementBatch, BatchClassification
+from classifier_analyzer import list_experiment_dirs, fuzzed_register_groups, analyze_batch
+from utils.config import Config
+
+from benchmarks.synthetic_campaign import MEASUREMENT_METHODS, CampaignSpec, synthetic_spec, \
+	generate_campaign, classifier_config
+
+def run_benchmark(outdir: str, spec: CampaignSpec, jobs: Optional[int] = None) -> Dict[str, Any]:
+	"""
+	Generates a synthetic campaign and runs the classifier and analyzer on
+	it, as classifier_analyzer.py does in batch mode. Measures the duration
+	of loading (parsing the measurement logs and register contents),
+	classification and analysis, and checks whether the planted behavior
+	was recovered.
+
+	:param      outdir:  Output directory of the campaign (must be empty)
+	:type       outdir:  str
+	:param      spec:    The campaign parameters
+	:type       spec:    CampaignSpec
+	:param      jobs:    Number of worker processes for generating,
+	                     loading and analyzing. None: one per CPU.
+	:type       jobs:    Optional[int]
+
+	:returns:   Metrics of the benchmark
+	:rtype:     Dict[str, Any]
+	"""
+	start: float = time.perf_counter()
+	generate_campaign(outdir, spec, jobs)
+	config_path: str = os.path.join(outdir, "classifier.ini")
+	with open(config_path, "w") as config_file:
+		config_file.write(classifier_config(spec))
+	generated: float = time.perf_counter()
+
+	config: Config = Config(config_path)
+	classification_method: str = config.get_str_or_error("general", "classification_method")
+	batch_classifier: BatchClassifier = build_batch_classifier(classification_method, config)
+	batch: MeasurementBatch = MeasurementBatch.from_experiment_dirs(
+		list_experiment_dirs(outdir), spec.measurement_method, None, jobs
+	)
+	loaded: float = time.perf_counter()
+	classification: BatchClassification = classify_batch(batch, batch_classifier)
+	classified: float = time.perf_counter()
+	groups: Dict[Tuple[int, int], Optional[List[str]]] = fuzzed_register_groups(outdir, config)
+	results: List[ClassAnalysisResult] = analyze_batch(batch, classification, groups, jobs, False)
+	analyzed: float = time.perf_counter()
+
+	return {
+		"experiments": batch.no_experiments,
+		"classes": {str(class_id): len(indices) for class_id, indices in classification.indices.items()},
+		"generate": generated - start,
+		"load": loaded - generated,
+		"classify": classified - loaded,
+		"analyze": analyzed - classified,
+		"experiments_per_second": batch.no_experiments / max(analyzed - generated, 1e-9),
+		"recovered": spec.planted.recovered(results),
+	}
+
+def summary(results: Dict[str, Dict[str, Any]]) -> str:
+	name_width: int = max([len("benchmark")] + [len(name) for name in results.keys()])
+	lines: List[str] = [
+		f"{'benchmark':<{name_width}}  {'exps':>9}  {'generate [s]':>12}  {'load [s]':>9}  {'classify [s]':>12}" + \
+		f"  {'analyze [s]':>11}  {'exps/s':>9}  {'recovered':>9}"
+	]
+	for name, metrics in results.items():
+		lines.append(
+			f"{name:<{name_width}}  {metrics['experiments']:>9}  {metrics['generate']:>12.3f}  {metrics['load']:>9.3f}" + \
+			f"  {metrics['classify']:>12.3f}  {metrics['analyze']:>11.3f}  {metrics['experiments_per_second']:>9.0f}" + \
+			f"  {'yes' if metrics['recovered'] else 'NO':>9}"
+		)
+	return "\n".join(lines)
+
+if __name__ == "__main__":
+	argparser = argparse.ArgumentParser(
+		description="Benchmarks the classifier and analyzer (loading, classification, analysis) on synthetic" + \
+		" campaigns with planted relations and constraints, and checks that they are recovered."
+	)
+	argparser.add_argument(
+		"-m", "--measurement-method", choices=MEASUREMENT_METHODS, action="append", default=None,
+		help="Measurement method to benchmark; can be given several times. Default: all"
+	)
+	argparser.add_argument(
+		"-p", "--plant", choices=["relation", "constraint"], action="append", default=None,
+		help="Behavior to plant; can be given several times. Default: all"
+	)
+	argparser.add_argument(
+		"-n", "--experiments", type=int, default=1000,
+		help="Minimum number of experiments per campaign. Default: 1000"
+	)
+	argparser.add_argument(
+		"--binary", action="store_true",
+		help="Write the measurement logs in the binary UART protocol instead of text"
+	)
+	argparser.set_defaults(binary=False)
+	argparser.add_argument(
+		"-j", "--jobs", type=int, default=None,
+		help="Number of worker processes. Default: number of CPUs"
+	)
+	argparser.add_argument(
+		"-d", "--dir", type=str, default=None,
+		help="Directory to keep the generated campaigns in. Default: a temporary directory"
+	)
+	argparser.add_argument(
+		"-r", "--results", type=str, default=None, metavar="RESULTS_JSON_FILE",
+		help="Write the results to the specified json file"
+	)
+	args = argparser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmpdir:
+		basedir: str = tmpdir if args.dir is None else args.dir
+		results: Dict[str, Dict[str, Any]] = dict()
+		for measurement_method in args.measurement_method or MEASUREMENT_METHODS:
+			for kind in args.plant or ["relation", "constraint"]:
+				name: str = f"{measurement_method}_{kind}"
+				spec: CampaignSpec = synthetic_spec(
+					measurement_method, kind, args.experiments, protocol="binary" if args.binary else "text"
+				)
+				print(f"running {name}: {spec.no_experiments()} experiments, planted {spec.planted}")
+				results[name] = run_benchmark(os.path.join(basedir, name), spec, args.jobs)
+
+	print(summary(results))
+	if args.results:
+		with open(args.results, "w") as results_file:
+			results_file.write(json.dumps(results, indent=4))
+	if not all(metrics["recovered"] for metrics in results.values()):
+		print("planted behavior not recovered: " + ", ".join(name for name, metrics in results.items() if not metrics["recovered"]))
+		sys.exit(1)
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from typing import Any, Dict, List, Optional
+
+from gts.gts_parser import GTSParser
+from gts.codegen import CodeGeneratorARMA64, CodegenOffsetException
+from gts.ast_state import ExpansionState
+
+from utils.profiling import profiler
+
+# Representative GTSes, one per operator (and a large campaign for each
+# fuzzing operator). Name -> GTS.
+BENCHMARKS: Dict[str, str] = {
+	"power_loop":          "[M N]500",
+	"power_loop_variable": "[M_s=s1+i N]16,1,i",
+	"shuffle":             "(M_t=t1,s=s1 M_t=t2,s=s2 M_t=t3,s=s3 M_t=t4,s=s4 M_t=t5,s=s5 M_t=t6,s=s6)!",
+	"subset":              "([M]3 M_t=t1,s=s1 M_t=t2,s=s2 M_t=t3,s=s3 M_t=t4,s=s4 A B)S",
+	"merge":               "(M_t=t1,s=s1 M_t=t2,s=s2 M_t=t3,s=s3 M_t=t4,s=s4 : M_t=t5,s=s5 M_t=t6,s=s6 M_t=t7,s=s7 M_t=t8,s=s8)+",
+	"cache_line_fuzzing":  "<M_s=s1 M A>$",
+	"offset_fuzzing":      "<M_t=t1,s=s1 M>@",
+	"precondition":        "P(M_t=t1,s=s1 M_t=t2,s=s1) <M>$ M_t=t1,s=s1",
+}
+
+# metrics that are compared to the baseline; lower is better
+TIME_METRICS: List[str] = ["parse", "expand", "dedup", "codegen"]
+MEMORY_METRICS: List[str] = ["peak_memory"]
+
+# differences below these bounds are considered noise
+MIN_TIME_DIFFERENCE: float = 0.005 # seconds
+MIN_MEMORY_DIFFERENCE: int = 1024 * 1024 # bytes
+
+# number of code generation attempts per run, see run_pipeline. More than
+# main.py uses: e.g. power_loop_variable fails about every eighth attempt,
+# and a failed run aborts the whole suite.
+CODEGEN_RETRIES: int = 10
+
+DEFAULT_BASELINE_PATH: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+def run_pipeline(gts_str: str) -> Dict[str, Any]:
+	"""
+	Runs the GTS pipeline (parse, expand, codegen) once and measures the
+	duration of each phase. Deduplication is part of the expansion; code
+	generation includes a second expansion, which is not counted. The
+	shared profiler is enabled for the duration of the run.
+
+	:param      gts_str:  The GTS
+	:type       gts_str:  str
+
+	:returns:   Metrics of this run
+	:rtype:     Dict[str, Any]
+	"""
+	enabled: bool = profiler.enabled
+	profiler.reset()
+	profiler.enabled = True
+	try:
+		start: float = time.perf_counter()
+		parser: GTSParser = GTSParser()
+		parser.input(gts_str)
+		gts = parser.parse()
+		parsed: float = time.perf_counter()
+		gts.expand(ExpansionState(CodeGeneratorARMA64()))
+		expanded: float = time.perf_counter()
+		dedup: float = profiler.phases["dedup"].total if "dedup" in profiler.phases else 0.0
+		# retry as main.py does: sets and tags are chosen randomly, and
+		# arithmetic expressions on them may leave the allowed ranges. Only
+		# the successful attempt is measured.
+		generator: CodeGeneratorARMA64 = CodeGeneratorARMA64()
+		for retry in range(CODEGEN_RETRIES, 0, -1):
+			try:
+				codes = gts.codegen(generator, False)
+				break
+			except CodegenOffsetException:
+				if retry == 1:
+					raise
+				generator.reset()
+				profiler.phases.pop("codegen", None)
+		# a GTS without experiments never enters the codegen phase
+		codegen: float = profiler.phases["codegen"].total if "codegen" in profiler.phases else 0.0
+	finally:
+		profiler.enabled = enabled
+	return {
+		"experiments": len(codes),
+		"parse": parsed - start,
+		"expand": expanded - parsed,
+		"dedup": dedup,
+		"codegen": codegen,
+	}
+
+def run_benchmark(gts_str: str, repeat: int) -> Dict[str, Any]:
+	"""
+	Runs a benchmark: the durations are the minimum of `repeat` runs, the
+	peak memory is measured in a separate run with tracemalloc (which slows
+	down the pipeline).
+
+	:param      gts_str:  The GTS
+	:type       gts_str:  str
+	:param      repeat:   The number of timed runs
+	:type       repeat:   int
+
+	:returns:   The metrics of the benchmark
+	:rtype:     Dict[str, Any]
+	"""
+	runs: List[Dict[str, Any]] = [run_pipeline(gts_str) for _ in range(repeat)]
+	metrics: Dict[str, Any] = {"experiments": runs[0]["experiments"]}
+	for metric in TIME_METRICS:
+		metrics[metric] = min(run[metric] for run in runs)
+	metrics["experiments_per_second"] = metrics["experiments"] / max(metrics["expand"] + metrics["codegen"], 1e-9)
+
+	tracemalloc.start()
+	run_pipeline(gts_str)
+	metrics["peak_memory"] = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return metrics
+
+def compare(
+	results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float
+) -> List[str]:
+	"""
+	Compares benchmark results to a baseline.
+
+	:param      results:    Benchmark name -> metrics
+	:type       results:    Dict[str, Dict[str, Any]]
+	:param      baseline:   Benchmark name -> metrics of the baseline
+	:type       baseline:   Dict[str, Dict[str, Any]]
+	:param      tolerance:  Allowed relative slowdown (0.25: 25%)
+	:type       tolerance:  float
+
+	:returns:   Descriptions of all regressions (empty if there are none)
+	:rtype:     List[str]
+	"""
+	regressions: List[str] = []
+	for name, metrics in results.items():
+		if name not in baseline:
+			continue
+		reference: Dict[str, Any] = baseline[name]
+		if metrics["experiments"] != reference["experiments"]:
+			regressions.append(
+				f"{name}: number of experiments changed from {reference['experiments']} to {metrics['experiments']}"
+			)
+		for metric in TIME_METRICS + MEMORY_METRICS:
+			min_difference: float = MIN_TIME_DIFFERENCE if metric in TIME_METRICS else MIN_MEMORY_DIFFERENCE
+			if metrics[metric] > reference[metric] * (1 + tolerance) and \
+				metrics[metric] - reference[metric] > min_difference:
+				regressions.append(
+					f"{name}: {metric} regressed from {reference[metric]:.4g} to {metrics[metric]:.4g}" + \
+					f" ({metrics[metric] / reference[metric]:.2f}x)"
+				)
+	return regressions
+
+def summary(results: Dict[str, Dict[str, Any]], baseline: Optional[Dict[str, Dict[str, Any]]]) -> str:
+	name_width: int = max([len("benchmark")] + [len(name) for name in results.keys()])
+	lines: List[str] = [
+		f"{'benchmark':<{name_width}}  {'exps':>6}  {'parse [ms]':>10}  {'expand [ms]':>11}  {'dedup [ms]':>10}" + \
+		f"  {'codegen [ms]':>12}  {'exps/s':>9}  {'peak [MiB]':>10}  {'vs. baseline':>12}"
+	]
+	for name, metrics in results.items():
+		relative: str = "-"
+		if baseline is not None and name in baseline:
+			total: float = sum(metrics[metric] for metric in TIME_METRICS)
+			total_baseline: float = sum(baseline[name][metric] for metric in TIME_METRICS)
+			relative = f"{total / total_baseline:.2f}x" if total_baseline > 0 else "-"
+		lines.append(
+			f"{name:<{name_width}}  {metrics['experiments']:>6}  {1000 * metrics['parse']:>10.2f}" + \
+			f"  {1000 * metrics['expand']:>11.2f}  {1000 * metrics['dedup']:>10.2f}  {1000 * metrics['codegen']:>12.2f}" + \
+			f"  {metrics['experiments_per_second']:>9.0f}  {metrics['peak_memory'] / 2**20:>10.2f}  {relative:>12}"
+		)
+	return "\n".join(lines)
+
+if __name__ == "__main__":
+	argparser = argparse.ArgumentParser(
+		description="Benchmarks the GTS pipeline (parsing, expansion, deduplication, code generation)" + \
+		" and compares the results to a baseline of the same machine. If there is no baseline yet, the results" + \
+		" are stored as the baseline."
+	)
+	argparser.add_argument(
+		"-b", "--baseline", type=str, default=DEFAULT_BASELINE_PATH,
+		help="Baseline json file to compare with. Default: benchmarks/baseline.json"
+	)
+	argparser.add_argument(
+		"-u", "--update-baseline", action="store_true",
+		help="Store the results as the new baseline instead of comparing them to the baseline"
+	)
+	argparser.set_defaults(update_baseline=False)
+	argparser.add_argument(
+		"-n", "--repeat", type=int, default=3,
+		help="Number of timed runs per benchmark; the minimum is reported. Default: 3"
+	)
+	argparser.add_argument(
+		"-t", "--tolerance", type=float, default=0.25,
+		help="Allowed relative slowdown compared to the baseline. Default: 0.25"
+	)
+	argparser.add_argument(
+		"-k", "--filter", type=str, default=None, metavar="SUBSTRING",
+		help="Only run benchmarks whose name contains the specified substring"
+	)
+	argparser.add_argument(
+		"-r", "--results", type=str, default=None, metavar="RESULTS_JSON_FILE",
+		help="Write the results to the specified json file"
+	)
+	args = argparser.parse_args()
+
+	baseline: Optional[Dict[str, Dict[str, Any]]] = None
+	if os.path.isfile(args.baseline):
+		with open(args.baseline) as baseline_file:
+			baseline = json.loads(baseline_file.read())
+
+	results: Dict[str, Dict[str, Any]] = dict()
+	for name, gts_str in BENCHMARKS.items():
+		if args.filter is not None and args.filter not in name:
+			continue
+		print(f"running {name}: {gts_str}")
+		results[name] = run_benchmark(gts_str, args.repeat)
+
+	print(summary(results, baseline))
+	if args.results:
+		with open(args.results, "w") as results_file:
+			results_file.write(json.dumps(results, indent=4))
+
+	if args.update_baseline or baseline is None:
+		# keep the baseline of benchmarks that were not run
+		new_baseline: Dict[str, Dict[str, Any]] = dict() if baseline is None else baseline
+		new_baseline.update(results)
+		with open(args.baseline, "w") as baseline_file:
+			baseline_file.write(json.dumps(new_baseline, indent=4))
+		print(f"baseline written to {args.baseline}")
+	else:
+		regressions: List[str] = compare(results, baseline, args.tolerance)
+		for regression in regressions:
+			print(f"REGRESSION: {regression}")
+		if len(regressions) > 0:
+			sys.exit(1)
+		print("no regressions")
@@ -0,0 +1,342 @@
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import random
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from analysis.analysis_results import ClassAnalysisResult
+from classification.uart_frames import encode_cache_frame, encode_int_frame
+from gts.codegen import CodeGeneratorARMA64
+from utils.campaign import CampaignMetadata, write_campaign_metadata
+
+# Synthetic campaigns: experiment directories (uart.log, registers.json)
+# and campaign metadata as written by the instantiator and the executor,
+# without hardware. The fuzzed bits of all registers are enumerated
+# exhaustively (as the analyzer expects), and the measurement of each
+# experiment depends on a planted behavior: a relation between the fuzzed
+# bits of two registers or a constraint on one fuzzed bit of a register.
+# If the behavior holds, the address in the first register is cached
+# (cache), the experiment is slow (time) or the branch predictor
+# mispredicts (branch_predictor). The analyzer is expected to recover the
+# planted behavior.
+
+MEASUREMENT_METHODS: List[str] = ["cache", "time", "branch_predictor"]
+
+# fuzzed addresses are in the store area; the other lines of the cache dumps
+# (executor code, stack, ...) have tags below it
+STORE_BASE_ADDRESS: int = 0x80000000
+
+# experiments per worker task, see generate_campaign
+CHUNK_SIZE: int = 1000
+
+@dataclass
+class PlantedBehavior:
+	"""
+	The behavior planted into a synthetic campaign, on the fuzzed bits
+	(not the addresses) of the registers:
+	- relation: y = a * x + b mod 2^(number of fuzzed bits), with x and y
+	  the fuzzed bits of `registers[0]` and `registers[1]`,
+	- constraint: bit `bit_index` of the address in `registers[0]` is
+	  `bit_value`.
+	"""
+	kind: str
+	registers: List[str]
+	a: int = 3
+	b: int = 5
+	bit_index: int = 0
+	bit_value: int = 1
+
+	def holds(self, fuzzed_values: Dict[str, int], fuzzed_bits_idx: Tuple[int, int]) -> bool:
+		no_fuzzed_bits: int = fuzzed_bits_idx[1] - fuzzed_bits_idx[0]
+		x: int = fuzzed_values[self.registers[0]]
+		if self.kind == "relation":
+			return fuzzed_values[self.registers[1]] == (self.a * x + self.b) % (1 << no_fuzzed_bits)
+		elif self.kind == "constraint":
+			return (x >> (self.bit_index - fuzzed_bits_idx[0])) & 1 == self.bit_value
+		else:
+			raise Exception(f"Unknown planted behavior {self.kind}.")
+
+	def recovered(self, results: List[ClassAnalysisResult]) -> bool:
+		"""
+		Checks whether the analysis found the planted behavior in any class.
+
+		:param      results:  The analysis results of the campaign
+		:type       results:  List[ClassAnalysisResult]
+
+		:returns:   True if the behavior was recovered
+		:rtype:     bool
+		"""
+		for result in results:
+			if self.kind == "relation":
+				for relation in result.relations:
+					if (relation.register_x, relation.register_y, relation.a, relation.b) == \
+						(self.registers[0], self.registers[1], self.a, self.b):
+						return True
+			else:
+				for constraint in result.constraints:
+					if (constraint.register, constraint.bit_index) == (self.registers[0], self.bit_index):
+						return True
+		return False
+
+	def __str__(self) -> str:
+		if self.kind == "relation":
+			return f"relation {self.registers[0]}_{self.registers[1]}: y = {self.a} * x + {self.b}"
+		return f"constraint: {self.registers[0]}, bit {self.bit_index} is {self.bit_value}"
+
+@dataclass
+class CampaignSpec:
+	"""
+	Parameters of a synthetic campaign. The campaign has
+	2^(number of fuzzed bits * number of registers) experiments.
+	"""
+	measurement_method: str
+	planted: PlantedBehavior
+	fuzzed_bits_idx: Tuple[int, int] = CodeGeneratorARMA64.address_bits_set()
+	# fuzzed registers, in order of allocation
+	registers: List[str] = field(default_factory=lambda: ["x30", "x29"])
+	protocol: str = "text"
+	# cache lines that are in the cache dumps of all experiments, per level
+	no_baseline_lines: Dict[int, int] = field(default_factory=lambda: {1: 128, 2: 512})
+	# lines added to the dumps of single experiments
+	no_noise_lines: int = 8
+	seed: int = 0
+
+	def no_experiments(self) -> int:
+		return 1 << ((self.fuzzed_bits_idx[1] - self.fuzzed_bits_idx[0]) * len(self.registers))
+
+	def fuzzed_values(self, experiment: int) -> Dict[str, int]:
+		# experiment i enumerates the fuzzed bits of the registers as digits
+		# of i in base 2^(number of fuzzed bits)
+		no_fuzzed_bits: int = self.fuzzed_bits_idx[1] - self.fuzzed_bits_idx[0]
+		return {
+			register: (experiment >> (no_fuzzed_bits * i)) & ((1 << no_fuzzed_bits) - 1)
+			for i, register in enumerate(self.registers)
+		}
+
+	def addresses(self, fuzzed_values: Dict[str, int]) -> Dict[str, int]:
+		# each register points into its own (at least) 1 MiB of the store
+		# area
+		region_shift: int = max(20, self.fuzzed_bits_idx[1])
+		return {
+			register: STORE_BASE_ADDRESS | (i << region_shift) | (fuzzed_values[register] << self.fuzzed_bits_idx[0])
+			for i, register in enumerate(self.registers)
+		}
+
+def synthetic_spec(
+	measurement_method: str, kind: str, no_experiments: int, no_registers: int = 2,
+	lower_bit: int = CodeGeneratorARMA64.address_bits_set()[0], protocol: str = "text", seed: int = 0
+) -> CampaignSpec:
+	"""
+	Builds the parameters of a campaign with at least the given number of
+	experiments: the number of fuzzed bits is the smallest one that yields
+	enough experiments with the given number of registers.
+
+	:param      measurement_method:  cache, time or branch_predictor
+	:type       measurement_method:  str
+	:param      kind:                Planted behavior: relation or
+	                                 constraint
+	:type       kind:                str
+	:param      no_experiments:      Minimum number of experiments
+	:type       no_experiments:      int
+	:param      no_registers:        Number of fuzzed registers
+	:type       no_registers:        int
+	:param      lower_bit:           Lowest fuzzed address bit
+	:type       lower_bit:           int
+	:param      protocol:            Measurement log format: text or binary
+	:type       protocol:            str
+	:param      seed:                Seed of the noise in the measurements
+	:type       seed:                int
+
+	:returns:   The campaign parameters
+	:rtype:     CampaignSpec
+	"""
+	if measurement_method not in MEASUREMENT_METHODS:
+		raise Exception(f"Unknown measurement method {measurement_method}.")
+	if kind == "relation" and no_registers < 2:
+		raise Exception("A planted relation requires at least two registers.")
+	no_fuzzed_bits: int = max(2, math.ceil(math.log2(max(no_experiments, 2)) / no_registers))
+	registers: List[str] = [f"x{30 - i}" for i in range(no_registers)]
+	return CampaignSpec(
+		measurement_method,
+		PlantedBehavior(kind, registers[:2], bit_index=lower_bit + 1),
+		(lower_bit, lower_bit + no_fuzzed_bits),
+		registers,
+		protocol,
+		seed=seed
+	)
+
+def experiment_log(spec: CampaignSpec, experiment: int, baseline: Dict[int, List[Tuple[int, int]]]) -> bytes:
+	"""
+	Builds the measurement log (uart.log) of one experiment.
+
+	:param      spec:        The campaign parameters
+	:type       spec:        CampaignSpec
+	:param      experiment:  The experiment number
+	:type       experiment:  int
+	:param      baseline:    The cache lines of all experiments, per level
+	:type       baseline:    Dict[int, List[Tuple[int, int]]]
+
+	:returns:   The measurement log
+	:rtype:     bytes
+	"""
+	rng: random.Random = random.Random(spec.seed * 0x100000000 + experiment)
+	fuzzed_values: Dict[str, int] = spec.fuzzed_values(experiment)
+	holds: bool = spec.planted.holds(fuzzed_values, spec.fuzzed_bits_idx)
+	log: bytes = b"Booting...\nInit complete.\n"
+
+	if spec.measurement_method == "cache":
+		cache_contents: Dict[int, List[Tuple[int, int]]] = {
+			cache_level: lines + [
+				(rng.randrange(1 << 7), rng.randrange(STORE_BASE_ADDRESS >> 13))
+				for _ in range(spec.no_noise_lines)
+			]
+			for cache_level, lines in baseline.items()
+		}
+		if holds:
+			# the first address (in the register with the lowest number, see
+			# classifier_cache_exact_address) is cached
+			address: int = spec.addresses(fuzzed_values)[sorted(spec.registers, key=lambda name: int(name[1:]))[0]]
+			cache_contents[1].append((
+				(address & CodeGeneratorARMA64.mask_set()) >> CodeGeneratorARMA64.shift_set(),
+				(address & CodeGeneratorARMA64.mask_tag()) >> CodeGeneratorARMA64.shift_tag()
+			))
+		for cache_level, lines in cache_contents.items():
+			lines.sort(key=lambda line: line[0])
+			if spec.protocol == "binary":
+				log += encode_cache_frame(cache_level, lines)
+			else:
+				log += f"L{cache_level} output\nprint_cache_valid\n----\n".encode()
+				log += "".join(f"{set_no}\t::{way}\t:: tag: {tag_no:x}\n" for way, (set_no, tag_no) in enumerate(lines)).encode()
+				log += b"----\n"
+	else:
+		if spec.measurement_method == "time":
+			name, value = "time", rng.randrange(90, 110) + (100 if holds else 0)
+		else:
+			name, value = "mispredictions", rng.randrange(0, 3) + (10 if holds else 0)
+		if spec.protocol == "binary":
+			log += encode_int_frame(name, value)
+		else:
+			log += f"{name};{value}\n".encode()
+	return log + b"Experiment complete.\n"
+
+def generate_chunk(
+	outdir: str, spec: CampaignSpec, start: int, stop: int, baseline: Dict[int, List[Tuple[int, int]]]
+) -> None:
+	for experiment in range(start, stop):
+		experiment_dir: str = os.path.join(outdir, f"{experiment:08d}")
+		os.makedirs(experiment_dir, exist_ok=True)
+		with open(os.path.join(experiment_dir, "uart.log"), "wb") as uart_log_file:
+			uart_log_file.write(experiment_log(spec, experiment, baseline))
+		with open(os.path.join(experiment_dir, "registers.json"), "w") as registers_json_file:
+			registers_json_file.write(json.dumps(spec.addresses(spec.fuzzed_values(experiment))))
+
+def generate_campaign(outdir: str, spec: CampaignSpec, jobs: Optional[int] = None) -> None:
+	"""
+	Writes a synthetic campaign to the output directory: one directory per
+	experiment and the campaign metadata. The experiments are written in
+	chunks by a pool of `jobs` worker processes.
+
+	:param      outdir:  The output directory
+	:type       outdir:  str
+	:param      spec:    The campaign parameters
+	:type       spec:    CampaignSpec
+	:param      jobs:    Number of worker processes. None: one per CPU, 1:
+	                     write in the calling process.
+	:type       jobs:    Optional[int]
+	"""
+	os.makedirs(outdir, exist_ok=True)
+	rng: random.Random = random.Random(spec.seed)
+	baseline: Dict[int, List[Tuple[int, int]]] = {
+		cache_level: [(rng.randrange(1 << 7), rng.randrange(STORE_BASE_ADDRESS >> 13)) for _ in range(no_lines)]
+		for cache_level, no_lines in spec.no_baseline_lines.items()
+	}
+	metadata: CampaignMetadata = CampaignMetadata()
+	metadata.add_experiment({register: spec.fuzzed_bits_idx for register in spec.registers})
+	write_campaign_metadata(outdir, metadata)
+
+	no_experiments: int = spec.no_experiments()
+	chunks: List[Tuple[int, int]] = [
+		(start, min(start + CHUNK_SIZE, no_experiments)) for start in range(0, no_experiments, CHUNK_SIZE)
+	]
+	if jobs is None:
+		jobs = os.cpu_count() or 1
+	if jobs <= 1 or len(chunks) <= 1:
+		for start, stop in chunks:
+			generate_chunk(outdir, spec, start, stop, baseline)
+		return
+	with ProcessPoolExecutor(max_workers=jobs) as executor:
+		for future in [executor.submit(generate_chunk, outdir, spec, start, stop, baseline) for start, stop in chunks]:
+			future.result()
+
+def classifier_config(spec: CampaignSpec) -> str:
+	"""
+	Returns a classifier configuration that separates the experiments in
+	which the planted behavior holds from the others.
+
+	:param      spec:  The campaign parameters
+	:type       spec:  CampaignSpec
+
+	:returns:   The configuration (ini format)
+	:rtype:     str
+	"""
+	config: str = f"[general]\ncpu_architecture = ARMA64\nmeasurement_method = {spec.measurement_method}\n"
+	if spec.measurement_method == "cache":
+		return config + "classification_method = cache_exact_address\n\n" + \
+			"[method_cache_exact_address]\ncache_level = 1\nexpected_address_index = 0\n"
+	threshold: int = 150 if spec.measurement_method == "time" else 5
+	return config + "classification_method = int_threshold\n\n" + \
+		f"[method_int_threshold]\nthreshold = {threshold}\nrelation = ge\n"
+
+if __name__ == "__main__":
+	argparser = argparse.ArgumentParser(
+		description="Generates a synthetic campaign (measurement logs, register contents, campaign metadata)" + \
+		" with a planted relation or constraint, for testing and benchmarking the classifier and analyzer."
+	)
+	argparser.add_argument("outdir", help="Output directory of the campaign")
+	argparser.add_argument(
+		"-m", "--measurement-method", choices=MEASUREMENT_METHODS, default="cache",
+		help="Measurement method of the campaign. Default: cache"
+	)
+	argparser.add_argument(
+		"-p", "--plant", choices=["relation", "constraint"], default="relation",
+		help="Behavior to plant into the measurements. Default: relation"
+	)
+	argparser.add_argument(
+		"-n", "--experiments", type=int, default=1000,
+		help="Minimum number of experiments; the campaign has 2^(fuzzed bits * registers) experiments. Default: 1000"
+	)
+	argparser.add_argument(
+		"-r", "--registers", type=int, default=2,
+		help="Number of fuzzed registers. Default: 2"
+	)
+	argparser.add_argument(
+		"--binary", action="store_true",
+		help="Write the measurement logs in the binary UART protocol instead of text"
+	)
+	argparser.set_defaults(binary=False)
+	argparser.add_argument(
+		"-s", "--seed", type=int, default=0,
+		help="Seed of the noise in the measurements. Default: 0"
+	)
+	argparser.add_argument(
+		"-j", "--jobs", type=int, default=None,
+		help="Number of worker processes. Default: number of CPUs"
+	)
+	args = argparser.parse_args()
+
+	spec: CampaignSpec = synthetic_spec(
+		args.measurement_method, args.plant, args.experiments, args.registers,
+		protocol="binary" if args.binary else "text", seed=args.seed
+	)
+	print(f"generating {spec.no_experiments()} experiments, bits {spec.fuzzed_bits_idx[0]}..{spec.fuzzed_bits_idx[1] - 1} of {', '.join(spec.registers)}")
+	print(f"planted {spec.planted}")
+	generate_campaign(args.outdir, spec, args.jobs)
+	with open(os.path.join(args.outdir, "classifier.ini"), "w") as config_file:
+		config_file.write(classifier_config(spec))
+	print(f"classifier configuration written to {os.path.join(args.outdir, 'classifier.ini')}")
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import os
+
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from .uart_frames import CacheFrame, CacheDeltaFrame, decode_frames, encode_cache_frame, encode_cache_delta_frame
+
+# Most cache lines are the same in all experiments of a campaign (executor
+# code, stack, store base area). Thus, instead of the full cache dump of
+# each experiment, only the difference to a baseline dump of the campaign
+# can be stored: the baseline is stored once in the output directory, and
+# the uart.log of each experiment contains one delta frame per cache level
+# (see uart_frames.py).
+
+# name of the baseline dump, stored in the output directory
+CACHE_BASELINE_FILENAME: str = "cache_baseline.bin"
+
+# Dict[Cache Level, List[Tuple[set, tag]]], see MeasurementCache
+CacheContents = Dict[int, List[Tuple[int, int]]]
+
+def cache_delta(
+	baseline: List[Tuple[int, int]], contents: List[Tuple[int, int]]
+) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+	"""
+	Computes the cache lines that were added to and evicted from a baseline.
+
+	:param      baseline:  The cache lines of the baseline
+	:type       baseline:  List[Tuple[int, int]]
+	:param      contents:  The cache lines of the experiment
+	:type       contents:  List[Tuple[int, int]]
+
+	:returns:   (added, evicted)
+	:rtype:     Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]
+	"""
+	baseline_lines: Counter = Counter(baseline)
+	contents_lines: Counter = Counter(contents)
+	return list((contents_lines - baseline_lines).elements()), list((baseline_lines - contents_lines).elements())
+
+def apply_cache_delta(
+	baseline: List[Tuple[int, int]], added: List[Tuple[int, int]], evicted: List[Tuple[int, int]]
+) -> List[Tuple[int, int]]:
+	"""
+	Reconstructs the cache lines of an experiment from the baseline and the
+	delta. The lines are ordered by set; within a set, the baseline lines
+	precede the added lines.
+
+	:param      baseline:  The cache lines of the baseline
+	:type       baseline:  List[Tuple[int, int]]
+	:param      added:     The lines added to the baseline
+	:type       added:     List[Tuple[int, int]]
+	:param      evicted:   The lines evicted from the baseline
+	:type       evicted:   List[Tuple[int, int]]
+
+	:returns:   The cache lines of the experiment
+	:rtype:     List[Tuple[int, int]]
+	"""
+	evicted_lines: Counter = Counter(evicted)
+	contents: List[Tuple[int, int]] = []
+	for line in baseline:
+		if evicted_lines[line] > 0:
+			evicted_lines[line] -= 1
+		else:
+			contents.append(line)
+	if sum(evicted_lines.values()) > 0:
+		raise Exception("Cache delta evicts lines that are not part of the baseline.")
+	return sorted(contents + added, key=lambda line: line[0])
+
+def encode_cache_delta_log(baseline: CacheContents, cache_contents: CacheContents) -> bytes:
+	"""
+	Encodes the cache contents of an experiment as measurement log with one
+	delta frame per cache level.
+
+	:param      baseline:        The baseline dump
+	:type       baseline:        CacheContents
+	:param      cache_contents:  The cache contents of the experiment
+	:type       cache_contents:  CacheContents
+
+	:returns:   The measurement log
+	:rtype:     bytes
+	"""
+	log: bytes = b"Init complete.\n"
+	for cache_level, lines in cache_contents.items():
+		added, evicted = cache_delta(baseline.get(cache_level, []), lines)
+		log += encode_cache_delta_frame(cache_level, added, evicted)
+	return log + b"Experiment complete.\n"
+
+def write_cache_baseline(outdir: str, baseline: CacheContents) -> None:
+	with open(os.path.join(outdir, CACHE_BASELINE_FILENAME), "wb") as baseline_file:
+		for cache_level, lines in baseline.items():
+			baseline_file.write(encode_cache_frame(cache_level, lines))
+
+@lru_cache(maxsize=4)
+def read_cache_baseline(outdir: str) -> CacheContents:
+	"""
+	Reads the baseline dump of a campaign. The baseline is read only once
+	per process and shared by all measurements of the campaign; it must not
+	be modified.
+
+	:param      outdir:  Output directory of the campaign
+	:type       outdir:  str
+
+	:returns:   The baseline dump
+	:rtype:     CacheContents
+	"""
+	path: str = os.path.join(outdir, CACHE_BASELINE_FILENAME)
+	if not os.path.isfile(path):
+		raise Exception(f"Could not find cache baseline {path} for cache delta.")
+	with open(path, "rb") as baseline_file:
+		return {
+			frame.level: frame.cache_contents()
+			for frame in decode_frames(baseline_file.read()) if isinstance(frame, CacheFrame)
+		}
+
+def reconstruct_cache_contents(outdir: str, frames: List[CacheDeltaFrame]) -> CacheContents:
+	"""
+	Reconstructs the cache contents of an experiment from its delta frames
+	and the baseline dump of the campaign.
+
+	:param      outdir:  Output directory of the campaign
+	:type       outdir:  str
+	:param      frames:  The delta frames of the experiment
+	:type       frames:  List[CacheDeltaFrame]
+
+	:returns:   The cache contents
+	:rtype:     CacheContents
+	"""
+	baseline: CacheContents = read_cache_baseline(outdir)
+	return {
+		frame.level: apply_cache_delta(
+			baseline.get(frame.level, []),
+			list(zip(frame.added["set"].tolist(), frame.added["tag"].tolist())),
+			list(zip(frame.evicted["set"].tolist(), frame.evicted["tag"].tolist()))
+		)
+		for frame in frames
+	}
@@ -1,28 +1,52 @@
 from __future__ import annotations
 
-from typing import Dict, List, Callable, Final, TYPE_CHECKING
+import operator
+import numpy as np
+
+from typing import Optional, Dict, List, Tuple, Callable, Final, TYPE_CHECKING
 if TYPE_CHECKING:
 	from .measurement import Measurement
 
 from .measurement import MeasurementCache, MeasurementInt
+from .measurement_batch import MeasurementBatch, BatchClassification, \
+	CACHE_LINE_EXPERIMENT, CACHE_LINE_LEVEL, CACHE_LINE_SET, CACHE_LINE_TAG
 
 from gts.codegen import CodeGeneratorARMA64
 from utils.config import Config
 
-def classificationmethod_cache_count(measurement: Measurement, config: Config) -> int:
-	assert isinstance(measurement, MeasurementCache)
+# A classifier maps a measurement to its class. Classifiers are built once
+# per campaign by the factories below, which resolve all configuration
+# options in advance, such that classifying a measurement does not access
+# the config anymore.
+Classifier = Callable[["Measurement"], int]
+
+# prefix of the config sections of named classifications, see
+# classification_configs
+CLASSIFICATION_SECTION_PREFIX: Final[str] = "classification:"
+
+# comparison operators for int_threshold
+RELATIONS: Final[Dict[str, Callable[[int, int], bool]]] = {
+	"lt": operator.lt,
+	"le": operator.le,
+	"eq": operator.eq,
+	"ge": operator.ge,
+	"gt": operator.gt,
+	"ne": operator.ne
+}
 
+def classifier_cache_count(config: Config, section: str) -> Classifier:
 	# read additional parameters from config
-	cache_level: int = config.get_int_or_error("method_cache_count", "cache_level")
+	cache_level: int = config.get_int_or_error(section, "cache_level")
 
-	if cache_level in measurement.cache_contents:
-		return len(measurement.cache_contents[cache_level])
-	else:
-		return 0
+	def classify(measurement: Measurement) -> int:
+		assert isinstance(measurement, MeasurementCache)
+		if cache_level in measurement.cache_contents:
+			return len(measurement.cache_contents[cache_level])
+		else:
+			return 0
+	return classify
 
-def classificationmethod_cache_exact_address(measurement: Measurement, config: Config) -> int:
-	assert isinstance(measurement, MeasurementCache)
-	
+def classifier_cache_exact_address(config: Config, section: str) -> Classifier:
 	# read the CPU architecture from config to determine tag/set offsets
 	cpu_architecture: str = config.get_str_or_error("general", "cpu_architecture")
 	if cpu_architecture == "ARMA64":
@@ -34,66 +58,273 @@ def classificationmethod_cache_exact_address(measurement: Measurement, config: C
 		raise Exception("Unknown CPU architecture")
 	
 	# read additional parameters from config
-	cache_level: int = config.get_int_or_error("method_cache_exact_address", "cache_level")
-	expected_address_index: int = config.get_int_or_error("method_cache_exact_address", "expected_address_index")
-
-	# get dict of registers; sort addresses stored in registers by the register name
-	register_contents: Dict[str, int] = measurement.register_contents()
-	register_contents_sorted: List[int] = [
-		address for reg_name, address in sorted(
-			register_contents.items(), key=lambda x: int(x[0][1:])
-		)
-	]
-	
-	# try to find the selected address in the cache dump
-	if expected_address_index < len(register_contents_sorted):
-		expected_address: int = register_contents_sorted[expected_address_index]
+	cache_level: int = config.get_int_or_error(section, "cache_level")
+	expected_address_index: int = config.get_int_or_error(section, "expected_address_index")
+
+	# Register names sorted by their number, per set of used registers.
+	# Usually, all measurements use the same registers, so they only have
+	# to be sorted once.
+	sorted_register_names: Dict[Tuple[str, ...], List[str]] = dict()
 
-		expected_set_no: int = (expected_address & mask_set) >> shift_set
-		expected_tag_no: int = (expected_address & mask_tag) >> shift_tag
+	def classify(measurement: Measurement) -> int:
+		assert isinstance(measurement, MeasurementCache)
+
+		# get dict of registers; select the address stored in the register
+		# at the expected index when sorted by register name
+		register_contents: Dict[str, int] = measurement.register_contents()
+		register_names: Tuple[str, ...] = tuple(register_contents.keys())
+		if register_names not in sorted_register_names:
+			sorted_register_names[register_names] = sorted(register_names, key=lambda name: int(name[1:]))
+		register_names_sorted: List[str] = sorted_register_names[register_names]
 		
-		if cache_level in measurement.cache_contents:
-			for set_no, tag_no in measurement.cache_contents[cache_level]:
-				if set_no == expected_set_no and tag_no == expected_tag_no:
-					return 1
-	return 0
+		# try to find the selected address in the cache dump
+		if expected_address_index < len(register_names_sorted):
+			expected_address: int = register_contents[register_names_sorted[expected_address_index]]
+			if measurement.contains(
+				cache_level, (expected_address & mask_set) >> shift_set, (expected_address & mask_tag) >> shift_tag
+			):
+				return 1
+		return 0
+	return classify
 
-def classificationmethod_int_threshold(measurement: Measurement, config: Config) -> int:
-	assert isinstance(measurement, MeasurementInt)
-	
+def classifier_int_threshold(config: Config, section: str) -> Classifier:
 	# read additional parameters from config
-	threshold: int = config.get_int_or_error("method_int_threshold", "threshold")
-	relation: str = config.get_str_or_error("method_int_threshold", "relation")
-
-	if relation == "lt":
-		return 1 if measurement.value <  threshold else 0
-	elif relation == "le":
-		return 1 if measurement.value <= threshold else 0
-	elif relation == "eq":
-		return 1 if measurement.value == threshold else 0
-	elif relation == "ge":
-		return 1 if measurement.value >= threshold else 0
-	elif relation == "gt":
-		return 1 if measurement.value >  threshold else 0
-	elif relation == "ne":
-		return 1 if measurement.value != threshold else 0
+	threshold: int = config.get_int_or_error(section, "threshold")
+	relation: str = config.get_str_or_error(section, "relation")
+	if relation not in RELATIONS:
+		raise Exception(f"Threshold classification: Invalid relation {relation}.")
+	compare: Callable[[int, int], bool] = RELATIONS[relation]
+
+	def classify(measurement: Measurement) -> int:
+		assert isinstance(measurement, MeasurementInt)
+		return 1 if compare(measurement.value, threshold) else 0
+	return classify
+
+def classifier_int_pct_error(config: Config, section: str) -> Classifier:
+	bucket_size: int = config.get_int_or_error(section, "bucket_size")
+
+	def classify(measurement: Measurement) -> int:
+		assert isinstance(measurement, MeasurementInt)
+		assert measurement.value >= 0 and measurement.value <= 100
+		# put measurements into buckets of width `bucket_size`. The name of the
+		# bucket is its middle element.
+		# TODO: For bucket_size = 10, 100 maps to 105. OK?
+		return (measurement.value // bucket_size) * bucket_size + (bucket_size // 2)
+	return classify
+
+CLASSIFIER_FACTORIES: Final[Dict[str, Callable[[Config, str], Classifier]]] = {
+	"cache_count":         classifier_cache_count,
+	"cache_exact_address": classifier_cache_exact_address,
+	"int_threshold":       classifier_int_threshold,
+	"int_pct_error":       classifier_int_pct_error
+}
+
+def method_section(classification_method: str) -> str:
+	"""
+	Returns the name of the config section with the options of a
+	classification method, if the method is selected in the general section.
+	
+	:param      classification_method:  The classification method
+	:type       classification_method:  str
+	
+	:returns:   The section name
+	:rtype:     str
+	"""
+	return f"method_{classification_method}"
+
+def build_classifier(classification_method: str, config: Config, section: Optional[str] = None) -> Classifier:
+	"""
+	Builds the classifier for the given classification method. All
+	options of the method are read from the config at this point.
+	
+	:param      classification_method:  The classification method
+	:type       classification_method:  str
+	:param      config:                 The classifier configuration
+	:type       config:                 Config
+	:param      section:                The config section with the options
+	                                    of the method. None: the section of
+	                                    the method (see method_section).
+	:type       section:                Optional[str]
+	
+	:returns:   The classifier
+	:rtype:     Classifier
+	"""
+	if classification_method not in CLASSIFIER_FACTORIES:
+		raise Exception(f"Unknown classification method {classification_method}.")
+	return CLASSIFIER_FACTORIES[classification_method](
+		config, method_section(classification_method) if section is None else section
+	)
+
+def classification_configs(config: Config) -> Dict[str, Tuple[str, str]]:
+	"""
+	Returns the classifications to compute for a campaign. Each
+	classification is configured in a section [classification:NAME], which
+	contains the classification method (option classification_method) and
+	the options of the method. Thus, the same campaign can be classified by
+	several methods, or by one method with different options, at once. If
+	there are no such sections, the single classification method of the
+	general section is used, with its options in the section of the method.
+	
+	:param      config:  The classifier configuration
+	:type       config:  Config
+	
+	:returns:   Name of the classification -> (classification method,
+	            config section with the options of the method), in order
+	            of the config file
+	:rtype:     Dict[str, Tuple[str, str]]
+	"""
+	configs: Dict[str, Tuple[str, str]] = dict()
+	for section in config.sections():
+		if section.startswith(CLASSIFICATION_SECTION_PREFIX):
+			name: str = section[len(CLASSIFICATION_SECTION_PREFIX):]
+			configs[name] = (config.get_str_or_error(section, "classification_method"), section)
+	if len(configs) == 0:
+		classification_method: str = config.get_str_or_error("general", "classification_method")
+		configs[classification_method] = (classification_method, method_section(classification_method))
+	return configs
+
+# Batch classifiers map a batch of measurements to an array of classes (one
+# per experiment). They are built by the factories below, analogous to
+# the classifiers above, and produce the same classes.
+BatchClassifier = Callable[[MeasurementBatch], np.ndarray]
+
+def batch_classifier_cache_count(config: Config, section: str) -> BatchClassifier:
+	cache_level: int = config.get_int_or_error(section, "cache_level")
+
+	def classify(batch: MeasurementBatch) -> np.ndarray:
+		assert batch.cache_lines is not None
+		lines: np.ndarray = batch.cache_lines[batch.cache_lines[:, CACHE_LINE_LEVEL] == cache_level]
+		return np.bincount(lines[:, CACHE_LINE_EXPERIMENT], minlength=batch.no_experiments).astype(np.int64)
+	return classify
+
+def batch_classifier_cache_exact_address(config: Config, section: str) -> BatchClassifier:
+	cpu_architecture: str = config.get_str_or_error("general", "cpu_architecture")
+	if cpu_architecture == "ARMA64":
+		mask_set: int = CodeGeneratorARMA64.mask_set()
+		mask_tag: int = CodeGeneratorARMA64.mask_tag()
+		shift_set: int = CodeGeneratorARMA64.shift_set()
+		shift_tag: int = CodeGeneratorARMA64.shift_tag()
 	else:
-		raise Exception(r"Threshold classification: Invalid relation {relation}.")
+		raise Exception("Unknown CPU architecture")
+	
+	cache_level: int = config.get_int_or_error(section, "cache_level")
+	expected_address_index: int = config.get_int_or_error(section, "expected_address_index")
 
-def classificationmethod_int_pct_error(measurement: Measurement, config: Config) -> int:
-	assert isinstance(measurement, MeasurementInt)
-	assert measurement.value >= 0 and measurement.value <= 100
+	def classify(batch: MeasurementBatch) -> np.ndarray:
+		assert batch.cache_lines is not None
+		register_matrix = batch.register_matrix
+		# sort the columns of the register matrix by register name, then
+		# select the expected_address_index-th used register of each
+		# experiment
+		columns: List[int] = sorted(
+			range(len(register_matrix.registers)), key=lambda j: int(register_matrix.registers[j][1:])
+		)
+		class_ids: np.ndarray = np.zeros(batch.no_experiments, dtype=np.int64)
+		if len(columns) == 0:
+			return class_ids
+		values: np.ndarray = register_matrix.values[batch.register_rows][:, columns]
+		valid: np.ndarray = register_matrix.valid[batch.register_rows][:, columns]
+		selected: np.ndarray = valid & (np.cumsum(valid, axis=1) == expected_address_index + 1)
+		has_address: np.ndarray = np.asarray(selected.any(axis=1))
+		expected_address: np.ndarray = values[np.arange(batch.no_experiments), selected.argmax(axis=1)]
+		expected_set: np.ndarray = ((expected_address & np.uint64(mask_set)) >> np.uint64(shift_set)).astype(np.int64)
+		expected_tag: np.ndarray = ((expected_address & np.uint64(mask_tag)) >> np.uint64(shift_tag)).astype(np.int64)
+
+		# find the cache lines that match the expected address of their
+		# experiment
+		lines: np.ndarray = batch.cache_lines[batch.cache_lines[:, CACHE_LINE_LEVEL] == cache_level]
+		experiments: np.ndarray = lines[:, CACHE_LINE_EXPERIMENT]
+		hit: np.ndarray = has_address[experiments] \
+			& (lines[:, CACHE_LINE_SET] == expected_set[experiments]) \
+			& (lines[:, CACHE_LINE_TAG] == expected_tag[experiments])
+		class_ids[experiments[hit]] = 1
+		return class_ids
+	return classify
+
+def batch_classifier_int_threshold(config: Config, section: str) -> BatchClassifier:
+	threshold: int = config.get_int_or_error(section, "threshold")
+	relation: str = config.get_str_or_error(section, "relation")
+	if relation not in RELATIONS:
+		raise Exception(f"Threshold classification: Invalid relation {relation}.")
+	compare: Callable[[int, int], bool] = RELATIONS[relation]
+
+	def classify(batch: MeasurementBatch) -> np.ndarray:
+		assert batch.values is not None
+		return compare(batch.values, threshold).astype(np.int64) # type: ignore
+	return classify
 
-	bucket_size: int = config.get_int_or_error("method_int_pct_error", "bucket_size")
+def batch_classifier_int_pct_error(config: Config, section: str) -> BatchClassifier:
+	bucket_size: int = config.get_int_or_error(section, "bucket_size")
 
-	# put measurements into buckets of width `bucket_size`. The name of the
-	# bucket is its middle element.
-	# TODO: For bucket_size = 10, 100 maps to 105. OK?
-	return (measurement.value // bucket_size) * bucket_size + (bucket_size // 2)
+	def classify(batch: MeasurementBatch) -> np.ndarray:
+		assert batch.values is not None
+		assert ((batch.values >= 0) & (batch.values <= 100)).all()
+		return (batch.values // bucket_size) * bucket_size + (bucket_size // 2)
+	return classify
+
+BATCH_CLASSIFIER_FACTORIES: Final[Dict[str, Callable[[Config, str], BatchClassifier]]] = {
+	"cache_count":         batch_classifier_cache_count,
+	"cache_exact_address": batch_classifier_cache_exact_address,
+	"int_threshold":       batch_classifier_int_threshold,
+	"int_pct_error":       batch_classifier_int_pct_error
+}
+
+def build_batch_classifier(classification_method: str, config: Config, section: Optional[str] = None) -> BatchClassifier:
+	"""
+	Builds the batch classifier for the given classification method (see
+	build_classifier).
+	
+	:param      classification_method:  The classification method
+	:type       classification_method:  str
+	:param      config:                 The classifier configuration
+	:type       config:                 Config
+	:param      section:                The config section with the options
+	                                    of the method. None: the section of
+	                                    the method (see method_section).
+	:type       section:                Optional[str]
+	
+	:returns:   The batch classifier
+	:rtype:     BatchClassifier
+	"""
+	if classification_method not in BATCH_CLASSIFIER_FACTORIES:
+		raise Exception(f"Unknown classification method {classification_method}.")
+	return BATCH_CLASSIFIER_FACTORIES[classification_method](
+		config, method_section(classification_method) if section is None else section
+	)
+
+def classify_batch(batch: MeasurementBatch, batch_classifier: BatchClassifier) -> BatchClassification:
+	"""
+	Classifies a batch of measurements.
+	
+	:param      batch:             The batch of measurements
+	:type       batch:             MeasurementBatch
+	:param      batch_classifier:  The batch classifier
+	:type       batch_classifier:  BatchClassifier
+	
+	:returns:   The class of each experiment and the experiments of each
+	            class
+	:rtype:     BatchClassification
+	"""
+	return BatchClassification(batch_classifier(batch))
+
+# Classification methods that read their options on every call. Kept for
+# compatibility; build_classifier should be used to classify many
+# measurements.
+def classificationmethod_cache_count(measurement: Measurement, config: Config) -> int:
+	return classifier_cache_count(config, method_section("cache_count"))(measurement)
+
+def classificationmethod_cache_exact_address(measurement: Measurement, config: Config) -> int:
+	return classifier_cache_exact_address(config, method_section("cache_exact_address"))(measurement)
+
+def classificationmethod_int_threshold(measurement: Measurement, config: Config) -> int:
+	return classifier_int_threshold(config, method_section("int_threshold"))(measurement)
+
+def classificationmethod_int_pct_error(measurement: Measurement, config: Config) -> int:
+	return classifier_int_pct_error(config, method_section("int_pct_error"))(measurement)
 
 CLASSIFICATION_METHODS: Final[Dict[str, Callable[[Measurement, Config], int]]] = {
 	"cache_count":         classificationmethod_cache_count,
 	"cache_exact_address": classificationmethod_cache_exact_address,
 	"int_threshold":       classificationmethod_int_threshold,
 	"int_pct_error":       classificationmethod_int_pct_error
-}
\ No newline at end of file
+}
@@ -1,33 +1,116 @@
 from __future__ import annotations
 
 import abc
+import io
 import os
 import re
 import json
+import numpy as np
 
-from typing import Optional, Dict, List, Tuple, Match, TextIO
+from typing import Optional, Dict, List, Set, Tuple, Iterable, Match, TextIO, TYPE_CHECKING
+if TYPE_CHECKING:
+	from .register_matrix import RegisterMatrix
 
 from .measurement_utils import readline_or_raise_on_eof, expect_or_raise, \
 	move_until_str, move_until_regex
+from .uart_frames import Frame, CacheFrame, CacheDeltaFrame, IntFrame, FRAME_MAGIC, decode_frames
+from .cache_delta import reconstruct_cache_contents
+
+def pack_cache_line(set_no: int, tag_no: int) -> int:
+	"""
+	Packs the set and tag of a cache line into a single int, used as key of
+	the cache line index of MeasurementCache.
+
+	:param      set_no:  The set
+	:type       set_no:  int
+	:param      tag_no:  The tag
+	:type       tag_no:  int
+
+	:returns:   The packed cache line
+	:rtype:     int
+	"""
+	# tags in the cache dump may be wider than 32 bits, thus shift by 64
+	return (set_no << 64) | tag_no
 
 class Measurement(metaclass=abc.ABCMeta):
 	def __init__(self, experiment_dir: str) -> None:
 		self.experiment_dir: str = experiment_dir
 		self._register_contents: Optional[Dict[str, int]] = None
+		# if set, the register contents are a row of a register matrix
+		# shared by all measurements of the campaign (see
+		# attach_register_matrix)
+		self.register_matrix: Optional[RegisterMatrix] = None
+		self.register_row: int = -1
 
 		# start parsing the executor output
 		executor_output_file_path: str = os.path.join(experiment_dir, f"uart.log")
-		with open(executor_output_file_path, "r") as executor_output_file:
+		with open(executor_output_file_path, "rb") as executor_output_file:
+			executor_output: bytes = executor_output_file.read()
+		if FRAME_MAGIC in executor_output:
+			# binary protocol: decode the frames between the initial line
+			# ("Init complete.") and the final line ("Experiment complete.")
+			start: int = executor_output.find(b"Init complete.\n")
+			end: int = executor_output.rfind(b"Experiment complete.\n")
+			if start < 0 or end < start:
+				raise Exception("Error parsing executor output. Unexpected EOF.")
+			# delegrate further parsing to subclasses
+			self._parse_frames(decode_frames(executor_output[start:end]))
+		else:
+			executor_output_file_text: TextIO = io.StringIO(executor_output.decode("ascii", errors="replace"))
 			# search for initial line ("Init complete.")
-			move_until_str(executor_output_file, "Init complete.\n")
+			move_until_str(executor_output_file_text, "Init complete.\n")
 			# delegrate further parsing to subclasses
-			self._parse_specific(executor_output_file)
+			self._parse_specific(executor_output_file_text)
 
 	@abc.abstractmethod
 	def _parse_specific(self, executor_output_file: TextIO) -> None:
 		pass
 
+	@abc.abstractmethod
+	def _parse_frames(self, frames: List[Frame]) -> None:
+		pass
+
+	def attach_register_matrix(self, register_matrix: RegisterMatrix, register_row: int) -> None:
+		"""
+		Makes this measurement a view into a register matrix: the register
+		contents are read from the given row of the matrix instead of the
+		experiment's registers.json file.
+		
+		:param      register_matrix:  The register matrix
+		:type       register_matrix:  RegisterMatrix
+		:param      register_row:     The row of this experiment
+		:type       register_row:     int
+		
+		:returns:   -
+		:rtype:     None
+		"""
+		self.register_matrix = register_matrix
+		self.register_row = register_row
+		self._register_contents = None
+
+	def register_arrays(self, registers: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+		"""
+		Returns the contents of the given registers as arrays (see
+		RegisterMatrix.row). A view into a register matrix reads them from
+		its row of the matrix, without building a dict.
+
+		:param      registers:  The register names
+		:type       registers:  List[str]
+
+		:returns:   (values, valid), both of shape (len(registers),)
+		:rtype:     Tuple[np.ndarray, np.ndarray]
+		"""
+		if self.register_matrix is not None:
+			return self.register_matrix.row(self.register_row, registers)
+		register_contents: Dict[str, int] = self.register_contents()
+		values: np.ndarray = np.array([register_contents.get(register, 0) for register in registers], dtype=np.uint64)
+		valid: np.ndarray = np.array([register in register_contents for register in registers], dtype=bool)
+		return values, valid
+
 	def register_contents(self) -> Dict[str, int]:
+		if self.register_matrix is not None:
+			# not cached, to keep the measurement lightweight
+			return self.register_matrix.row_dict(self.register_row)
 		# when this function is called for the first time, the register
 		# contents are read from the experiment's register.json file. The
 		# contents are then cached to be reused in later calls.
@@ -43,10 +126,80 @@ class Measurement(metaclass=abc.ABCMeta):
 
 class MeasurementCache(Measurement):
 	def __init__(self, experiment_dir: str) -> None:
-		# Dict[Cache Level, List[Tuple[set, tag]]
-		self.cache_contents: Dict[int, List[Tuple[int, int]]] = dict()
+		# Dict[Cache Level, List[Tuple[set, tag]]; None while the contents
+		# of a differential dump have not been reconstructed yet (see
+		# cache_contents)
+		self._cache_contents: Optional[Dict[int, List[Tuple[int, int]]]] = dict()
+		# delta frames of a differential dump, relative to the baseline dump
+		# of the campaign (see cache_delta.py)
+		self._cache_delta_frames: List[CacheDeltaFrame] = []
+		# Dict[Cache Level, Set[packed cache line]], built on demand by
+		# cache_index() for constant-time lookups of cache lines
+		self._cache_index: Dict[int, Set[int]] = dict()
 		super().__init__(experiment_dir)
 
+	@property
+	def cache_contents(self) -> Dict[int, List[Tuple[int, int]]]:
+		# the contents of differential dumps are reconstructed from the
+		# baseline when they are accessed for the first time
+		if self._cache_contents is None:
+			self._cache_contents = reconstruct_cache_contents(
+				os.path.dirname(os.path.normpath(self.experiment_dir)), self._cache_delta_frames
+			)
+			self._cache_delta_frames = []
+		return self._cache_contents
+
+	def cache_index(self, cache_level: int) -> Set[int]:
+		"""
+		Returns the cache lines of a cache level as a set of packed cache
+		lines (see pack_cache_line). The set is built when it is requested
+		for the first time.
+
+		:param      cache_level:  The cache level
+		:type       cache_level:  int
+
+		:returns:   The packed cache lines; empty if the cache level was
+		            not dumped
+		:rtype:     Set[int]
+		"""
+		if cache_level not in self._cache_index:
+			self._cache_index[cache_level] = {
+				pack_cache_line(set_no, tag_no) for set_no, tag_no in self.cache_contents.get(cache_level, [])
+			}
+		return self._cache_index[cache_level]
+
+	def contains(self, cache_level: int, set_no: int, tag_no: int) -> bool:
+		"""
+		Checks whether a cache line is in the cache dump of a cache level.
+
+		:param      cache_level:  The cache level
+		:type       cache_level:  int
+		:param      set_no:       The set
+		:type       set_no:       int
+		:param      tag_no:       The tag
+		:type       tag_no:       int
+
+		:returns:   True if the cache line was cached
+		:rtype:     bool
+		"""
+		return pack_cache_line(set_no, tag_no) in self.cache_index(cache_level)
+
+	def contains_all(self, cache_level: int, lines: Iterable[Tuple[int, int]]) -> bool:
+		"""
+		Checks whether all of the given cache lines are in the cache dump of
+		a cache level.
+
+		:param      cache_level:  The cache level
+		:type       cache_level:  int
+		:param      lines:        The cache lines (set, tag)
+		:type       lines:        Iterable[Tuple[int, int]]
+
+		:returns:   True if all cache lines were cached
+		:rtype:     bool
+		"""
+		cache_index: Set[int] = self.cache_index(cache_level)
+		return all(pack_cache_line(set_no, tag_no) in cache_index for set_no, tag_no in lines)
+
 	def _parse_specific(self, file: TextIO) -> None:
 		while True:
 			# read lines until "Experiment complete"
@@ -65,6 +218,20 @@ class MeasurementCache(Measurement):
 		if len(self.cache_contents) == 0:
 			raise Exception("Error parsing executor output: No cache output found.")
 
+	def _parse_frames(self, frames: List[Frame]) -> None:
+		for frame in frames:
+			if isinstance(frame, CacheFrame):
+				self.cache_contents[frame.level] = frame.cache_contents()
+			elif isinstance(frame, CacheDeltaFrame):
+				self._cache_delta_frames.append(frame)
+
+		if len(self._cache_delta_frames) > 0:
+			if len(self.cache_contents) > 0:
+				raise Exception("Error parsing executor output: Full and differential cache dumps.")
+			self._cache_contents = None
+		elif len(self.cache_contents) == 0:
+			raise Exception("Error parsing executor output: No cache output found.")
+
 	def _parse_cache_contents(self, file: TextIO, this_cache_contents: List[Tuple[int, int]]) -> None:
 		# skip over the next two lines
 		expect_or_raise(file.readline(), "print_cache_valid")
@@ -97,4 +264,22 @@ class MeasurementInt(Measurement):
 		rx: Match[str] = move_until_regex(file, rf"^{self.name};(\d+)$")
 		result: int = int(rx.group(1))
 		expect_or_raise(file.readline(), "Experiment complete.")
-		self.value = result
\ No newline at end of file
+		self.value = result
+
+	def _parse_frames(self, frames: List[Frame]) -> None:
+		for frame in frames:
+			if isinstance(frame, IntFrame) and frame.name == self.name:
+				self.value = frame.value
+				return
+		raise Exception(f"Error parsing executor output: No {self.name} measurement found.")
+
+def load_measurement(experiment_dir: str, measurement_method: str) -> Measurement:
+	# parse measurement log into data structure
+	if measurement_method == "cache":
+		return MeasurementCache(experiment_dir)
+	elif measurement_method == "time":
+		return MeasurementInt(experiment_dir, "time")
+	elif measurement_method == "branch_predictor":
+		return MeasurementInt(experiment_dir, "mispredictions")
+	else:
+		raise Exception(f"Unknown measurement method {measurement_method}.")
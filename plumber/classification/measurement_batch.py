@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import os
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, List, Tuple, TYPE_CHECKING
+if TYPE_CHECKING:
+	from .measurement import Measurement
+
+from .measurement import MeasurementCache, MeasurementInt, load_measurement
+from .register_matrix import RegisterMatrix
+
+# upper bound for the number of experiments parsed by a worker process at
+# once, see MeasurementBatch.from_experiment_dirs
+MAX_CHUNK_SIZE: int = 1000
+
+# columns of MeasurementBatch.cache_lines
+CACHE_LINE_EXPERIMENT: int = 0
+CACHE_LINE_LEVEL: int = 1
+CACHE_LINE_SET: int = 2
+CACHE_LINE_TAG: int = 3
+
+class MeasurementBatch:
+	"""
+	The measurements of many experiments in arrays, for batch
+	classification:
+	- values[i] is the measured value of experiment i (MeasurementInt),
+	- cache_lines is an array of shape (number of cache lines, 4), with one
+	  row (experiment, cache level, set, tag) per cache line that was
+	  found in the cache dump of an experiment (MeasurementCache),
+	- the register contents of experiment i are row register_rows[i] of
+	  register_matrix.
+	"""
+	def __init__(
+		self, no_experiments: int, register_matrix: RegisterMatrix, register_rows: np.ndarray,
+		values: Optional[np.ndarray] = None, cache_lines: Optional[np.ndarray] = None
+	) -> None:
+		assert len(register_rows) == no_experiments
+		self.no_experiments: int = no_experiments
+		self.register_matrix: RegisterMatrix = register_matrix
+		self.register_rows: np.ndarray = register_rows
+		self.values: Optional[np.ndarray] = values
+		self.cache_lines: Optional[np.ndarray] = cache_lines
+
+	@staticmethod
+	def from_measurements(measurements: List[Measurement]) -> MeasurementBatch:
+		"""
+		Collects the measurements of many experiments into a batch. If the
+		measurements are views into a common register matrix, the batch
+		refers to that matrix; otherwise, a register matrix is built from
+		their register contents.
+
+		:param      measurements:  The measurements (all of the same type)
+		:type       measurements:  List[Measurement]
+
+		:returns:   The batch
+		:rtype:     MeasurementBatch
+		"""
+		register_matrix: Optional[RegisterMatrix] = measurements[0].register_matrix if len(measurements) > 0 else None
+		register_rows: np.ndarray
+		if register_matrix is not None and all(m.register_matrix is register_matrix for m in measurements):
+			register_rows = np.fromiter((m.register_row for m in measurements), dtype=np.int64, count=len(measurements))
+		else:
+			register_matrix = RegisterMatrix.from_register_contents(
+				[m.experiment_dir for m in measurements], [m.register_contents() for m in measurements]
+			)
+			register_rows = np.arange(len(measurements), dtype=np.int64)
+
+		values, cache_lines = measurement_arrays(measurements)
+		return MeasurementBatch(len(measurements), register_matrix, register_rows, values, cache_lines)
+
+	@staticmethod
+	def from_experiment_dirs(
+		experiment_dirs: List[str], measurement_method: str,
+		register_matrix: Optional[RegisterMatrix] = None, jobs: Optional[int] = None
+	) -> MeasurementBatch:
+		"""
+		Parses the measurement logs (and, if no register matrix is given,
+		the registers.json files) of many experiments into a batch. The
+		experiments are split into ordered chunks which are parsed by a pool
+		of `jobs` worker processes; the workers only send the arrays of
+		their chunk back, not the parsed measurements.
+
+		:param      experiment_dirs:     The experiment directories
+		:type       experiment_dirs:     List[str]
+		:param      measurement_method:  The measurement method
+		:type       measurement_method:  str
+		:param      register_matrix:     The register matrix of the
+		                                 experiments (row i belongs to
+		                                 experiment_dirs[i]). None: build it
+		                                 from the registers.json files.
+		:type       register_matrix:     Optional[RegisterMatrix]
+		:param      jobs:                Number of worker processes. None:
+		                                 one per CPU, 1: parse in the calling
+		                                 process.
+		:type       jobs:                Optional[int]
+
+		:returns:   The batch
+		:rtype:     MeasurementBatch
+		"""
+		if jobs is None:
+			jobs = os.cpu_count() or 1
+		load_registers: bool = register_matrix is None
+
+		chunks: List[MeasurementBatch]
+		if jobs <= 1 or len(experiment_dirs) <= 1:
+			chunks = [load_batch_chunk(experiment_dirs, measurement_method, load_registers)]
+		else:
+			# several chunks per worker, such that workers that are done
+			# early (e.g. due to faster file reads) are given more work
+			chunk_size: int = max(1, min(MAX_CHUNK_SIZE, -(-len(experiment_dirs) // (4 * jobs))))
+			chunk_dirs: List[List[str]] = [
+				experiment_dirs[i:i + chunk_size] for i in range(0, len(experiment_dirs), chunk_size)
+			]
+			# executor.map returns the chunks in order of submission
+			with ProcessPoolExecutor(max_workers=jobs) as executor:
+				chunks = list(executor.map(
+					load_batch_chunk, chunk_dirs,
+					[measurement_method] * len(chunk_dirs), [load_registers] * len(chunk_dirs)
+				))
+		return MeasurementBatch.concatenate(chunks, register_matrix)
+
+	@staticmethod
+	def concatenate(batches: List[MeasurementBatch], register_matrix: Optional[RegisterMatrix] = None) -> MeasurementBatch:
+		"""
+		Concatenates the batches of consecutive chunks of experiments.
+
+		:param      batches:          The batches (all of the same type)
+		:type       batches:          List[MeasurementBatch]
+		:param      register_matrix:  The register matrix of all experiments
+		                              of the concatenated batch. None:
+		                              concatenate the register matrices of
+		                              the batches.
+		:type       register_matrix:  Optional[RegisterMatrix]
+
+		:returns:   The batch
+		:rtype:     MeasurementBatch
+		"""
+		no_experiments: int = sum(batch.no_experiments for batch in batches)
+		register_rows: np.ndarray = np.arange(no_experiments, dtype=np.int64)
+		if register_matrix is None:
+			register_matrix = RegisterMatrix.concatenate([
+				RegisterMatrix(
+					[batch.register_matrix.experiments[row] for row in batch.register_rows.tolist()],
+					batch.register_matrix.registers,
+					batch.register_matrix.values[batch.register_rows],
+					batch.register_matrix.valid[batch.register_rows]
+				)
+				for batch in batches
+			])
+
+		values: Optional[np.ndarray] = None
+		cache_lines: Optional[np.ndarray] = None
+		if all(batch.values is not None for batch in batches):
+			values = np.concatenate([batch.values for batch in batches])
+		elif all(batch.cache_lines is not None for batch in batches):
+			# cache lines refer to experiments by their index within the batch
+			offsets: np.ndarray = np.cumsum([0] + [batch.no_experiments for batch in batches[:-1]])
+			batch_cache_lines: List[np.ndarray] = [np.zeros((0, 4), dtype=np.int64)]
+			for batch, offset in zip(batches, offsets.tolist()):
+				assert batch.cache_lines is not None
+				batch_cache_lines.append(batch.cache_lines + np.array([offset, 0, 0, 0], dtype=np.int64))
+			cache_lines = np.concatenate(batch_cache_lines)
+		else:
+			raise Exception("Batch classification requires measurements of the same type.")
+		return MeasurementBatch(no_experiments, register_matrix, register_rows, values, cache_lines)
+
+def measurement_arrays(measurements: List[Measurement]) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+	"""
+	Collects the measured values (MeasurementInt) or the cache lines
+	(MeasurementCache) of many experiments into arrays, see MeasurementBatch.
+
+	:param      measurements:  The measurements (all of the same type)
+	:type       measurements:  List[Measurement]
+
+	:returns:   (values, cache_lines), one of them is None
+	:rtype:     Tuple[Optional[np.ndarray], Optional[np.ndarray]]
+	"""
+	values: Optional[np.ndarray] = None
+	cache_lines: Optional[np.ndarray] = None
+	if all(isinstance(m, MeasurementInt) for m in measurements):
+		values = np.fromiter(
+			(m.value for m in measurements if isinstance(m, MeasurementInt)), dtype=np.int64, count=len(measurements)
+		)
+	elif all(isinstance(m, MeasurementCache) for m in measurements):
+		cache_lines = np.array([
+			(i, cache_level, set_no, tag_no)
+			for i, m in enumerate(measurements) if isinstance(m, MeasurementCache)
+			for cache_level, lines in m.cache_contents.items()
+			for set_no, tag_no in lines
+		], dtype=np.int64).reshape(-1, 4)
+	else:
+		raise Exception("Batch classification requires measurements of the same type.")
+	return values, cache_lines
+
+def load_batch_chunk(experiment_dirs: List[str], measurement_method: str, load_registers: bool) -> MeasurementBatch:
+	"""
+	Parses a chunk of experiments into a batch. Runs in the worker
+	processes of MeasurementBatch.from_experiment_dirs.
+
+	:param      experiment_dirs:     The experiment directories of the chunk
+	:type       experiment_dirs:     List[str]
+	:param      measurement_method:  The measurement method
+	:type       measurement_method:  str
+	:param      load_registers:      Also parse the registers.json files. If
+	                                 False, the register matrix of the batch
+	                                 has no registers.
+	:type       load_registers:      bool
+
+	:returns:   The batch
+	:rtype:     MeasurementBatch
+	"""
+	measurements: List[Measurement] = [
+		load_measurement(experiment_dir, measurement_method) for experiment_dir in experiment_dirs
+	]
+	values, cache_lines = measurement_arrays(measurements)
+	register_matrix: RegisterMatrix
+	if load_registers:
+		register_matrix = RegisterMatrix.from_experiment_dirs(experiment_dirs)
+	else:
+		register_matrix = RegisterMatrix(
+			[os.path.basename(os.path.normpath(experiment_dir)) for experiment_dir in experiment_dirs], [],
+			np.zeros((len(experiment_dirs), 0), dtype=np.uint64), np.zeros((len(experiment_dirs), 0), dtype=bool)
+		)
+	return MeasurementBatch(
+		len(experiment_dirs), register_matrix, np.arange(len(experiment_dirs), dtype=np.int64), values, cache_lines
+	)
+
+class BatchClassification:
+	"""
+	Result of a batch classification: class_ids[i] is the class of
+	experiment i, and indices[class_id] are the (sorted) indices of all
+	experiments in class class_id.
+	"""
+	def __init__(self, class_ids: np.ndarray) -> None:
+		self.class_ids: np.ndarray = class_ids
+		self.indices: Dict[int, np.ndarray] = dict()
+		order: np.ndarray = np.argsort(class_ids, kind="stable")
+		unique_class_ids, starts = np.unique(class_ids[order], return_index=True)
+		for class_id, indices in zip(unique_class_ids.tolist(), np.split(order, starts[1:])):
+			self.indices[class_id] = indices
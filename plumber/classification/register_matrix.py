@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import os
+import json
+import numpy as np
+
+from typing import Any, Optional, Dict, List, Tuple, TYPE_CHECKING
+if TYPE_CHECKING:
+	from .measurement import Measurement
+
+# name of the consolidated register file, stored in the output directory
+REGISTER_MATRIX_FILENAME: str = "registers.npz"
+
+class RegisterMatrix:
+	"""
+	Register contents of all experiments of a campaign in a single matrix
+	(experiments x registers) of 64 bit values, instead of one dict of
+	arbitrary-precision ints per experiment.
+
+	values[i, j] is the content of register registers[j] in experiment
+	experiments[i]. Since the code generator maps equal values to the same
+	register, not every experiment uses every register; valid[i, j]
+	indicates whether register registers[j] was used in experiment
+	experiments[i] (if not, values[i, j] is 0).
+	"""
+	def __init__(self, experiments: List[str], registers: List[str], values: np.ndarray, valid: np.ndarray) -> None:
+		assert values.shape == valid.shape == (len(experiments), len(registers))
+		self.experiments: List[str] = experiments
+		self.registers: List[str] = registers
+		self.values: np.ndarray = values
+		self.valid: np.ndarray = valid
+		# register name -> column, experiment name -> row
+		self.register_index: Dict[str, int] = {register: j for j, register in enumerate(registers)}
+		self.experiment_index: Dict[str, int] = {experiment: i for i, experiment in enumerate(experiments)}
+
+	@staticmethod
+	def from_experiment_dirs(experiment_dirs: List[str]) -> RegisterMatrix:
+		"""
+		Builds the matrix from the registers.json files of the given
+		experiments, in one pass.
+
+		:param      experiment_dirs:  The experiment directories
+		:type       experiment_dirs:  List[str]
+
+		:returns:   The register matrix; the rows are named by the base
+		            names of the experiment directories
+		:rtype:     RegisterMatrix
+		"""
+		all_register_contents: List[Dict[str, int]] = []
+		for experiment_dir in experiment_dirs:
+			registers_json_file_path: str = os.path.join(experiment_dir, "registers.json")
+			if not os.path.isfile(registers_json_file_path):
+				raise Exception(f"Cound not find registers.json file in {experiment_dir}")
+			with open(registers_json_file_path) as registers_json_file:
+				all_register_contents.append(json.loads(registers_json_file.read()))
+		experiments: List[str] = [os.path.basename(os.path.normpath(experiment_dir)) for experiment_dir in experiment_dirs]
+		return RegisterMatrix.from_register_contents(experiments, all_register_contents)
+
+	@staticmethod
+	def from_register_contents(experiments: List[str], all_register_contents: List[Dict[str, int]]) -> RegisterMatrix:
+		"""
+		Builds the matrix from the register contents of each experiment.
+
+		:param      experiments:            The experiment names
+		:type       experiments:            List[str]
+		:param      all_register_contents:  The register contents (register
+		                                    name -> value) of each experiment
+		:type       all_register_contents:  List[Dict[str, int]]
+
+		:returns:   The register matrix
+		:rtype:     RegisterMatrix
+		"""
+		registers: List[str] = []
+		register_index: Dict[str, int] = dict()
+		for register_contents in all_register_contents:
+			for register in register_contents.keys():
+				if register not in register_index:
+					register_index[register] = len(registers)
+					registers.append(register)
+
+		values: np.ndarray = np.zeros((len(all_register_contents), len(registers)), dtype=np.uint64)
+		valid: np.ndarray = np.zeros((len(all_register_contents), len(registers)), dtype=bool)
+		for i, register_contents in enumerate(all_register_contents):
+			for register, value in register_contents.items():
+				values[i, register_index[register]] = value
+				valid[i, register_index[register]] = True
+		return RegisterMatrix(experiments, registers, values, valid)
+
+	def save(self, path: str, sources: Optional[np.ndarray] = None) -> None:
+		arrays: Dict[str, Any] = dict(
+			experiments=np.array(self.experiments, dtype=str),
+			registers=np.array(self.registers, dtype=str),
+			values=self.values,
+			valid=self.valid
+		)
+		if sources is not None:
+			arrays["sources"] = sources
+		with open(path, "wb") as matrix_file:
+			np.savez(matrix_file, **arrays)
+
+	@staticmethod
+	def load(path: str) -> RegisterMatrix:
+		with np.load(path) as data:
+			return RegisterMatrix(
+				[str(experiment) for experiment in data["experiments"]],
+				[str(register) for register in data["registers"]],
+				data["values"],
+				data["valid"]
+			)
+
+	@staticmethod
+	def sources(experiment_dirs: List[str]) -> np.ndarray:
+		"""
+		Returns the modification time and size of the registers.json file
+		of each experiment, to detect whether the consolidated register file
+		is outdated (e.g. because the campaign was instantiated again in the
+		same output directory). Missing files are marked with -1.
+
+		:param      experiment_dirs:  The experiment directories
+		:type       experiment_dirs:  List[str]
+
+		:returns:   (mtime in ns, size) per experiment, shape (len(experiment_dirs), 2)
+		:rtype:     np.ndarray
+		"""
+		sources: np.ndarray = np.full((len(experiment_dirs), 2), -1, dtype=np.int64)
+		for i, experiment_dir in enumerate(experiment_dirs):
+			try:
+				stat: os.stat_result = os.stat(os.path.join(experiment_dir, "registers.json"))
+			except FileNotFoundError:
+				continue
+			sources[i] = (stat.st_mtime_ns, stat.st_size)
+		return sources
+
+	def save_consolidated(self, outdir: str, experiment_dirs: List[str]) -> None:
+		"""
+		Stores the matrix as the consolidated register file of a campaign,
+		together with the state of the registers.json files it was built
+		from.
+
+		:param      outdir:           Output directory of the campaign
+		:type       outdir:           str
+		:param      experiment_dirs:  The experiment directories
+		:type       experiment_dirs:  List[str]
+
+		:returns:   -
+		:rtype:     None
+		"""
+		self.save(os.path.join(outdir, REGISTER_MATRIX_FILENAME), RegisterMatrix.sources(experiment_dirs))
+
+	@staticmethod
+	def load_consolidated(outdir: str, experiment_dirs: List[str]) -> Optional[RegisterMatrix]:
+		"""
+		Loads the consolidated register file of a campaign, if it exists and
+		was built from the current registers.json files of the given
+		experiments.
+
+		:param      outdir:           Output directory of the campaign
+		:type       outdir:           str
+		:param      experiment_dirs:  The experiment directories
+		:type       experiment_dirs:  List[str]
+
+		:returns:   The register matrix, or None
+		:rtype:     Optional[RegisterMatrix]
+		"""
+		path: str = os.path.join(outdir, REGISTER_MATRIX_FILENAME)
+		if not os.path.isfile(path):
+			return None
+		experiments: List[str] = [os.path.basename(os.path.normpath(experiment_dir)) for experiment_dir in experiment_dirs]
+		with np.load(path) as data:
+			if "sources" not in data or not np.array_equal(data["sources"], RegisterMatrix.sources(experiment_dirs)):
+				return None
+		register_matrix: RegisterMatrix = RegisterMatrix.load(path)
+		if register_matrix.experiments != experiments:
+			return None
+		return register_matrix
+
+	@staticmethod
+	def load_or_build(outdir: str, experiment_dirs: List[str]) -> RegisterMatrix:
+		"""
+		Loads the consolidated register file of a campaign. If it does not
+		exist yet or is outdated (see load_consolidated), the matrix is
+		built from the registers.json files instead and stored as the
+		consolidated register file for subsequent runs.
+
+		:param      outdir:           Output directory of the campaign
+		:type       outdir:           str
+		:param      experiment_dirs:  The experiment directories
+		:type       experiment_dirs:  List[str]
+
+		:returns:   The register matrix
+		:rtype:     RegisterMatrix
+		"""
+		register_matrix: Optional[RegisterMatrix] = RegisterMatrix.load_consolidated(outdir, experiment_dirs)
+		if register_matrix is None:
+			register_matrix = RegisterMatrix.from_experiment_dirs(experiment_dirs)
+			register_matrix.save_consolidated(outdir, experiment_dirs)
+		return register_matrix
+
+	@staticmethod
+	def concatenate(register_matrices: List[RegisterMatrix]) -> RegisterMatrix:
+		"""
+		Stacks the rows of several register matrices, e.g. built from
+		consecutive chunks of the experiments of a campaign. The registers
+		of the result are the union of the registers of all matrices, in
+		order of first appearance.
+
+		:param      register_matrices:  The register matrices
+		:type       register_matrices:  List[RegisterMatrix]
+
+		:returns:   The register matrix
+		:rtype:     RegisterMatrix
+		"""
+		registers: List[str] = []
+		register_index: Dict[str, int] = dict()
+		for register_matrix in register_matrices:
+			for register in register_matrix.registers:
+				if register not in register_index:
+					register_index[register] = len(registers)
+					registers.append(register)
+
+		experiments: List[str] = []
+		no_rows: int = sum(len(register_matrix.experiments) for register_matrix in register_matrices)
+		values: np.ndarray = np.zeros((no_rows, len(registers)), dtype=np.uint64)
+		valid: np.ndarray = np.zeros((no_rows, len(registers)), dtype=bool)
+		offset: int = 0
+		for register_matrix in register_matrices:
+			rows: slice = slice(offset, offset + len(register_matrix.experiments))
+			columns: List[int] = [register_index[register] for register in register_matrix.registers]
+			values[rows, columns] = register_matrix.values
+			valid[rows, columns] = register_matrix.valid
+			experiments.extend(register_matrix.experiments)
+			offset += len(register_matrix.experiments)
+		return RegisterMatrix(experiments, registers, values, valid)
+
+	def row_dict(self, row: int) -> Dict[str, int]:
+		"""
+		Returns the register contents of one experiment as a dict
+		(register name -> value), like registers.json.
+
+		:param      row:  The row of the experiment
+		:type       row:  int
+
+		:returns:   The register contents
+		:rtype:     Dict[str, int]
+		"""
+		return {
+			register: int(self.values[row, j])
+			for j, register in enumerate(self.registers) if self.valid[row, j]
+		}
+
+	def row(self, row: int, registers: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+		"""
+		Returns the values and valid flags of the given registers in one
+		experiment (see select).
+
+		:param      row:        The row of the experiment
+		:type       row:        int
+		:param      registers:  The register names
+		:type       registers:  List[str]
+
+		:returns:   (values, valid), both of shape (len(registers),)
+		:rtype:     Tuple[np.ndarray, np.ndarray]
+		"""
+		values, valid = self.select(np.array([row], dtype=np.int64), registers)
+		return values[0], valid[0]
+
+	def select(self, rows: np.ndarray, registers: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+		"""
+		Returns the values and valid flags of the given registers in the
+		given experiments. Registers that are not part of the matrix are
+		invalid in all experiments.
+
+		:param      rows:       The rows of the experiments
+		:type       rows:       np.ndarray
+		:param      registers:  The register names
+		:type       registers:  List[str]
+
+		:returns:   (values, valid), both of shape (len(rows), len(registers))
+		:rtype:     Tuple[np.ndarray, np.ndarray]
+		"""
+		values: np.ndarray = np.zeros((len(rows), len(registers)), dtype=np.uint64)
+		valid: np.ndarray = np.zeros((len(rows), len(registers)), dtype=bool)
+		for k, register in enumerate(registers):
+			if register in self.register_index:
+				values[:, k] = self.values[rows, self.register_index[register]]
+				valid[:, k] = self.valid[rows, self.register_index[register]]
+		return values, valid
+
+def register_array(bittable: List[Measurement], registers: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	Returns the contents of the given registers for all measurements of a
+	bittable as arrays (see RegisterMatrix.select). If the measurements
+	are views into a common register matrix, the arrays are sliced from
+	the matrix; otherwise, they are built from the register contents of
+	each measurement.
+
+	:param      bittable:   The bittable
+	:type       bittable:   List[Measurement]
+	:param      registers:  The register names
+	:type       registers:  List[str]
+
+	:returns:   (values, valid), both of shape (len(bittable), len(registers))
+	:rtype:     Tuple[np.ndarray, np.ndarray]
+	"""
+	register_matrix: Optional[RegisterMatrix] = bittable[0].register_matrix if len(bittable) > 0 else None
+	if register_matrix is not None and all(measurement.register_matrix is register_matrix for measurement in bittable):
+		rows: np.ndarray = np.fromiter(
+			(measurement.register_row for measurement in bittable), dtype=np.int64, count=len(bittable)
+		)
+		return register_matrix.select(rows, registers)
+
+	values: np.ndarray = np.zeros((len(bittable), len(registers)), dtype=np.uint64)
+	valid: np.ndarray = np.zeros((len(bittable), len(registers)), dtype=bool)
+	for i, measurement in enumerate(bittable):
+		register_contents: Dict[str, int] = measurement.register_contents()
+		for k, register in enumerate(registers):
+			if register in register_contents:
+				values[i, k] = register_contents[register]
+				valid[i, k] = True
+	return values, valid
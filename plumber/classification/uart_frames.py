@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import struct
+import zlib
+import numpy as np
+
+from dataclasses import dataclass
+from typing import List, Tuple, Union
+
+# Binary measurement protocol of the executor (see
+# executor/all/inc/uart_frame.h). Instead of printing cache dumps and
+# measured values as text lines, the executor can send them as frames:
+#
+#   magic    4 bytes  FRAME_MAGIC
+#   type     u8       FRAME_TYPE_*
+#   length   u32      length of the payload
+#   payload  length bytes
+#   checksum u32      Adler-32 of type, length and payload
+#
+# All integers are little endian. Payload of FRAME_TYPE_CACHE:
+#   level u8, count u32, count * (set u16, tag u32)
+# Payload of FRAME_TYPE_INT:
+#   name length u8, name (ASCII), value u64
+# Payload of FRAME_TYPE_CACHE_DELTA (cache lines added to and evicted from
+# a baseline dump, see cache_delta.py):
+#   level u8, added u32, evicted u32, (added + evicted) * (set u16, tag u32)
+#
+# The frames are embedded in the text output between "Init complete." and
+# "Experiment complete.".
+FRAME_MAGIC: bytes = b"\x00PLB"
+FRAME_TYPE_CACHE: int = 1
+FRAME_TYPE_INT: int = 2
+FRAME_TYPE_CACHE_DELTA: int = 3
+
+_FRAME_HEADER: struct.Struct = struct.Struct("<4sBI")
+_FRAME_CHECKSUM: struct.Struct = struct.Struct("<I")
+_CACHE_HEADER: struct.Struct = struct.Struct("<BI")
+_INT_VALUE: struct.Struct = struct.Struct("<Q")
+_CACHE_DELTA_HEADER: struct.Struct = struct.Struct("<BII")
+
+# one entry of the cache lines of a FRAME_TYPE_CACHE frame
+CACHE_LINE_DTYPE: np.dtype = np.dtype([("set", "<u2"), ("tag", "<u4")])
+
+@dataclass
+class CacheFrame:
+	"""
+	The valid lines of one cache level; lines is a structured array of
+	CACHE_LINE_DTYPE.
+	"""
+	level: int
+	lines: np.ndarray
+
+	def cache_contents(self) -> List[Tuple[int, int]]:
+		return list(zip(self.lines["set"].tolist(), self.lines["tag"].tolist()))
+
+@dataclass
+class IntFrame:
+	"""
+	A named integer measurement, e.g. a time measurement.
+	"""
+	name: str
+	value: int
+
+@dataclass
+class CacheDeltaFrame:
+	"""
+	The difference between the valid lines of one cache level and a
+	baseline dump; added and evicted are structured arrays of
+	CACHE_LINE_DTYPE.
+	"""
+	level: int
+	added: np.ndarray
+	evicted: np.ndarray
+
+Frame = Union[CacheFrame, IntFrame, CacheDeltaFrame]
+
+def encode_frame(frame_type: int, payload: bytes) -> bytes:
+	"""
+	Encodes a frame (header, payload and checksum), like the executor.
+
+	:param      frame_type:  The frame type
+	:type       frame_type:  int
+	:param      payload:     The payload
+	:type       payload:     bytes
+
+	:returns:   The encoded frame
+	:rtype:     bytes
+	"""
+	header: bytes = _FRAME_HEADER.pack(FRAME_MAGIC, frame_type, len(payload))
+	checksum: int = zlib.adler32(payload, zlib.adler32(header[len(FRAME_MAGIC):]))
+	return header + payload + _FRAME_CHECKSUM.pack(checksum)
+
+def encode_cache_frame(level: int, lines: List[Tuple[int, int]]) -> bytes:
+	entries: np.ndarray = np.array(lines, dtype=CACHE_LINE_DTYPE)
+	return encode_frame(FRAME_TYPE_CACHE, _CACHE_HEADER.pack(level, len(lines)) + entries.tobytes())
+
+def encode_int_frame(name: str, value: int) -> bytes:
+	name_bytes: bytes = name.encode("ascii")
+	return encode_frame(FRAME_TYPE_INT, bytes([len(name_bytes)]) + name_bytes + _INT_VALUE.pack(value))
+
+def encode_cache_delta_frame(level: int, added: List[Tuple[int, int]], evicted: List[Tuple[int, int]]) -> bytes:
+	entries: np.ndarray = np.array(added + evicted, dtype=CACHE_LINE_DTYPE)
+	return encode_frame(
+		FRAME_TYPE_CACHE_DELTA, _CACHE_DELTA_HEADER.pack(level, len(added), len(evicted)) + entries.tobytes()
+	)
+
+def decode_frame(frame_type: int, payload: bytes) -> Frame:
+	"""
+	Decodes the payload of a frame.
+
+	:param      frame_type:  The frame type
+	:type       frame_type:  int
+	:param      payload:     The payload
+	:type       payload:     bytes
+
+	:returns:   The decoded frame
+	:rtype:     Frame
+	"""
+	if frame_type == FRAME_TYPE_CACHE:
+		level, count = _CACHE_HEADER.unpack_from(payload)
+		if len(payload) != _CACHE_HEADER.size + count * CACHE_LINE_DTYPE.itemsize:
+			raise Exception("Error parsing executor output: Malformed cache frame.")
+		return CacheFrame(level, np.frombuffer(payload, dtype=CACHE_LINE_DTYPE, offset=_CACHE_HEADER.size))
+	elif frame_type == FRAME_TYPE_INT:
+		name_length: int = payload[0]
+		if len(payload) != 1 + name_length + _INT_VALUE.size:
+			raise Exception("Error parsing executor output: Malformed int frame.")
+		name: str = payload[1:1 + name_length].decode("ascii")
+		value: int = _INT_VALUE.unpack_from(payload, 1 + name_length)[0]
+		return IntFrame(name, value)
+	elif frame_type == FRAME_TYPE_CACHE_DELTA:
+		level, no_added, no_evicted = _CACHE_DELTA_HEADER.unpack_from(payload)
+		if len(payload) != _CACHE_DELTA_HEADER.size + (no_added + no_evicted) * CACHE_LINE_DTYPE.itemsize:
+			raise Exception("Error parsing executor output: Malformed cache delta frame.")
+		entries: np.ndarray = np.frombuffer(payload, dtype=CACHE_LINE_DTYPE, offset=_CACHE_DELTA_HEADER.size)
+		return CacheDeltaFrame(level, entries[:no_added], entries[no_added:])
+	else:
+		raise Exception(f"Error parsing executor output: Unknown frame type {frame_type}.")
+
+def decode_frames(data: bytes) -> List[Frame]:
+	"""
+	Decodes all frames in the output of the executor. Text between the
+	frames is skipped.
+
+	:param      data:  The output of the executor
+	:type       data:  bytes
+
+	:returns:   The frames, in order of appearance
+	:rtype:     List[Frame]
+	"""
+	frames: List[Frame] = []
+	position: int = data.find(FRAME_MAGIC)
+	while position >= 0:
+		if position + _FRAME_HEADER.size > len(data):
+			raise Exception("Error parsing executor output: EOF while parsing frame header.")
+		_, frame_type, length = _FRAME_HEADER.unpack_from(data, position)
+		payload_start: int = position + _FRAME_HEADER.size
+		payload_end: int = payload_start + length
+		if payload_end + _FRAME_CHECKSUM.size > len(data):
+			raise Exception("Error parsing executor output: EOF while parsing frame.")
+		checksum: int = _FRAME_CHECKSUM.unpack_from(data, payload_end)[0]
+		if zlib.adler32(data[position + len(FRAME_MAGIC):payload_end]) != checksum:
+			raise Exception("Error parsing executor output: Frame checksum mismatch.")
+		frames.append(decode_frame(frame_type, data[payload_start:payload_end]))
+		position = data.find(FRAME_MAGIC, payload_end + _FRAME_CHECKSUM.size)
+	return frames
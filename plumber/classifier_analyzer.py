@@ -2,17 +2,115 @@ from __future__ import annotations
 
 import argparse
 import os
+import time
+import numpy as np
 
 from typing import Dict, List, Tuple, Iterator, Optional, Any, TYPE_CHECKING
 if TYPE_CHECKING:
 	from classification.measurement import Measurement
 
-from classification.measurement import MeasurementCache, MeasurementInt
-from classification.classification_methods import CLASSIFICATION_METHODS
+from classification.measurement import load_measurement
+from classification.classification_methods import Classifier, BatchClassifier, build_classifier, \
+	build_batch_classifier, classify_batch, classification_configs
+from classification.measurement_batch import MeasurementBatch, BatchClassification
+from classification.register_matrix import RegisterMatrix
 
-from analysis.analysis_functions import analyze_fuzzed_bits
+from analysis.analysis_functions import analyze_register_arrays
+from analysis.analysis_results import ClassAnalysisResult, analysis_results_to_json, merge_analysis_results
+from analysis.online_analysis import OnlineAnalyzer
+
+from gts.codegen import CodeGeneratorARMA64
 
 from utils.config import Config
+from utils.campaign import CampaignMetadata, read_campaign_metadata
+from utils.profiling import profiler
+
+def list_experiment_dirs(outdir: str) -> List[str]:
+	experiment_dirs: List[str] = []
+	for experiment_dir in sorted(os.listdir(outdir)):
+		experiment_dir = os.path.join(outdir, experiment_dir)
+		if os.path.isdir(experiment_dir):
+			experiment_dirs.append(experiment_dir)
+	return experiment_dirs
+
+def fuzzed_register_groups(outdir: str, config: Config) -> Dict[Tuple[int, int], Optional[List[str]]]:
+	"""
+	Determines which registers and bits to analyze: the fuzzed registers,
+	grouped by their range of fuzzed bits, as recorded by the instantiator
+	in the campaign metadata. For campaigns without metadata, the range is
+	read from the config (section analysis, options fuzzed_bits_lower and
+	fuzzed_bits_upper) and defaults to cache line fuzzing; all registers
+	are analyzed.
+
+	:param      outdir:  Output directory of the campaign
+	:type       outdir:  str
+	:param      config:  The classifier configuration
+	:type       config:  Config
+
+	:returns:   Mapping range of fuzzed bits -> registers (None: all)
+	:rtype:     Dict[Tuple[int, int], Optional[List[str]]]
+	"""
+	metadata: Optional[CampaignMetadata] = read_campaign_metadata(outdir)
+	if metadata is not None:
+		if len(metadata.conflicting_registers) > 0:
+			print(
+				"Warning: skipping registers fuzzed with different bit ranges in different experiments:" + \
+				f" {', '.join(sorted(metadata.conflicting_registers))}"
+			)
+		groups: Dict[Tuple[int, int], Optional[List[str]]] = dict(metadata.registers_by_fuzzed_bits())
+		if len(groups) > 0:
+			return groups
+	
+	default_lower, default_upper = CodeGeneratorARMA64.address_bits_set() # cache line fuzzing
+	fuzzed_bits_lower: Optional[int] = config.get_int("analysis", "fuzzed_bits_lower")
+	fuzzed_bits_upper: Optional[int] = config.get_int("analysis", "fuzzed_bits_upper")
+	return {
+		(
+			default_lower if fuzzed_bits_lower is None else fuzzed_bits_lower,
+			default_upper if fuzzed_bits_upper is None else fuzzed_bits_upper
+		): None
+	}
+
+def analyze_batch(
+	batch: MeasurementBatch, classification: BatchClassification,
+	groups: Dict[Tuple[int, int], Optional[List[str]]], jobs: Optional[int], triples: bool
+) -> List[ClassAnalysisResult]:
+	# the testcases cover all combinations of the fuzzed bits of all groups,
+	# so each value of a group occurs once per combination of the others
+	no_fuzzed_bits: Dict[Tuple[int, int], int] = {
+		fuzzed_bits_idx: 0 if registers is None else (fuzzed_bits_idx[1] - fuzzed_bits_idx[0]) * len(registers)
+		for fuzzed_bits_idx, registers in groups.items()
+	}
+	results_per_group: List[List[ClassAnalysisResult]] = []
+	for fuzzed_bits_idx, registers in groups.items():
+		if registers is None:
+			registers = batch.register_matrix.registers
+		register_arrays: Dict[int, Tuple[np.ndarray, np.ndarray]] = {
+			class_id: batch.register_matrix.select(batch.register_rows[indices], registers)
+			for class_id, indices in classification.indices.items()
+		}
+		results_per_group.append(analyze_register_arrays(
+			register_arrays, registers, fuzzed_bits_idx, jobs, triples,
+			sum(no_fuzzed_bits.values()) - no_fuzzed_bits[fuzzed_bits_idx]
+		))
+	return merge_analysis_results(results_per_group)
+
+def classification_results_path(results_path: Optional[str], name: str, no_classifications: int) -> Optional[str]:
+	# with several classifications, the results of each classification are
+	# written to a separate file: results.json -> results.NAME.json
+	if results_path is None or no_classifications == 1:
+		return results_path
+	root, ext = os.path.splitext(results_path)
+	return f"{root}.{name}{ext}"
+
+def report(results: List[ClassAnalysisResult], results_path: Optional[str], name: Optional[str] = None) -> None:
+	if name is not None:
+		print(f"===== Classification {name} =====")
+	for result in results:
+		print(result.summary())
+	if results_path:
+		with open(results_path, "w") as results_file:
+			results_file.write(analysis_results_to_json(results))
 
 if __name__ == "__main__":
 	# parse command line arguments
@@ -27,51 +125,177 @@ if __name__ == "__main__":
 		"-c", "--config", type=str, default="classifier.ini",
 		help="Configuration file for the classifier. Default: classifier.ini"
 	)
+	argparser.add_argument(
+		"-j", "--jobs", type=int, default=None,
+		help="Number of worker processes for loading the experiments and for the analysis. Default: number of CPUs"
+	)
+	argparser.add_argument(
+		"-r", "--results", type=str, default=None, metavar="RESULTS_JSON_FILE",
+		help="Write the analysis results (constraints, relations, match rates) to the specified json file"
+	)
+	argparser.add_argument(
+		"-3", "--triples", action="store_true",
+		help="Also extract relations between triples of registers (z = a * x + b * y + c)." + \
+		" Increases memory usage and runtime of the analysis."
+	)
+	argparser.set_defaults(triples=False)
+	argparser.add_argument(
+		"-f", "--follow", action="store_true",
+		help="Online mode: classify and analyze the experiments while the campaign is still running." + \
+		" Waits for the measurement log of each experiment to appear and reports intermediate results."
+	)
+	argparser.set_defaults(follow=False)
+	argparser.add_argument(
+		"--report-every", type=int, default=100, metavar="N",
+		help="Online mode: report intermediate results every N experiments. Default: 100"
+	)
+	argparser.add_argument(
+		"--poll-interval", type=float, default=1.0, metavar="SECONDS",
+		help="Online mode: time to wait before checking for new measurement logs again. Default: 1.0"
+	)
+	argparser.add_argument(
+		"--profile", metavar="REPORT_JSON_FILE",
+		help="Records the time spent in each phase (loading, classification, analysis, reporting) and" + \
+		" writes the timing report to the specified json file. A summary table is printed at the end."
+	)
 	args = argparser.parse_args()
 
+	if args.profile:
+		profiler.enable()
+		profiler.write_report_at_exit(args.profile)
+
 	config: Config = Config(args.config)
-	
+
 	# ============ CLASSIFIER ===========
 
 	# classify experiments
 	# Possible improvement: find out measurement_method dynamically
 	measurement_method: str = config.get_str_or_error("general", "measurement_method")
-	classification_method: str = config.get_str_or_error("general", "classification_method")
-
-	# data structure to store the resulting classification
-	classification: Dict[int, List[Measurement]] = dict()
-
-	for experiment_dir in sorted(os.listdir(args.outdir)):
-		experiment_dir = os.path.join(args.outdir, experiment_dir)
-		if not os.path.isdir(experiment_dir):
-			continue
-		print(f"classifying experiment {experiment_dir}...")
-
-		# parse measurement log into data structure
-		if measurement_method == "cache":
-			measurement: Measurement = MeasurementCache(experiment_dir)
-		elif measurement_method == "time":
-			measurement = MeasurementInt(experiment_dir, "time")
-		elif measurement_method == "branch_predictor":
-			measurement = MeasurementInt(experiment_dir, "mispredictions")
-		else:
-			raise Exception(f"Unknown measurement method {measurement_method}.")
-
-		# classify measurement according to the selected classification method
-		if classification_method not in CLASSIFICATION_METHODS:
-			raise Exception(f"Unknown classification method {classification_method}.")
-
-		class_id: int = CLASSIFICATION_METHODS[classification_method](measurement, config)
-		classification.setdefault(class_id, []).append(measurement)
-		print(f"classified {experiment_dir} into class {class_id}.")
-
-	# ============ ANALYZER ===========
-	
-	# find out fuzzed bits
-	# Possible improvement: Store this with the GTS and read it from there,
-	# or at least read it from the config.
-	# fuzzed_bits_idx: Tuple[int, int] = (0,  6) # offset fuzzing
-	fuzzed_bits_idx: Tuple[int, int] = (6, 13) # cache line fuzzing
-	
-	# Analysis: find constraints and relations
-	analyze_fuzzed_bits(classification, fuzzed_bits_idx)
+	# name -> (classification method, config section with its options); all
+	# classifications are computed from the same parsed measurements
+	classifications: Dict[str, Tuple[str, str]] = classification_configs(config)
+	print(f"classifications: {', '.join(f'{name} ({method})' for name, (method, _) in classifications.items())}")
+
+	# find out fuzzed registers and bits
+	groups: Dict[Tuple[int, int], Optional[List[str]]] = fuzzed_register_groups(args.outdir, config)
+	for fuzzed_bits_idx, registers in groups.items():
+		print(f"analyzing bits {fuzzed_bits_idx[0]}..{fuzzed_bits_idx[1] - 1} of registers {'all' if registers is None else ', '.join(registers)}")
+
+	# the instantiator has created all experiment directories
+	experiment_dirs: List[str] = list_experiment_dirs(args.outdir)
+
+	if args.follow:
+		# ============ ONLINE CLASSIFIER AND ANALYZER ===========
+
+		# The instantiator creates all experiment directories before the
+		# runner starts, and the runner moves the measurement log of an
+		# experiment into place once the experiment is complete. Thus,
+		# classify each experiment as soon as its log appears, according to
+		# the selected classification methods (whose options are read from
+		# the config only once), and analyze it, until all experiments are
+		# done.
+		classifiers: Dict[str, Classifier] = {
+			name: build_classifier(method, config, section) for name, (method, section) in classifications.items()
+		}
+		# the registers.json files are written by the instantiator, so the
+		# register matrix is complete before the first experiment is done;
+		# the measurements are views into it
+		with profiler.phase("load"):
+			register_matrix: RegisterMatrix = RegisterMatrix.load_or_build(args.outdir, experiment_dirs)
+		group_registers: Dict[Tuple[int, int], List[str]] = {
+			fuzzed_bits_idx: register_matrix.registers if registers is None else registers
+			for fuzzed_bits_idx, registers in groups.items()
+		}
+		online_analyzers: Dict[str, List[OnlineAnalyzer]] = {
+			name: [
+				OnlineAnalyzer(fuzzed_bits_idx, registers, args.triples)
+				for fuzzed_bits_idx, registers in group_registers.items()
+			]
+			for name in classifications.keys()
+		}
+		no_processed: int = 0
+		no_experiments: int = len(experiment_dirs)
+		try:
+			# the runner completes the experiments in order, so only the log
+			# of the next experiment has to be checked
+			while no_processed < no_experiments:
+				experiment_dir: str = experiment_dirs[no_processed]
+				if not os.path.isfile(os.path.join(experiment_dir, "uart.log")):
+					time.sleep(args.poll_interval)
+					continue
+				experiment: str = os.path.basename(experiment_dir)
+				with profiler.phase("load", experiment):
+					measurement: Measurement = load_measurement(experiment_dir, measurement_method)
+					measurement.attach_register_matrix(register_matrix, no_processed)
+					rows: List[Tuple[np.ndarray, np.ndarray]] = [
+						measurement.register_arrays(registers) for registers in group_registers.values()
+					]
+				class_ids: Dict[str, int] = dict()
+				for name, classifier in classifiers.items():
+					with profiler.phase("classify", experiment):
+						class_ids[name] = classifier(measurement)
+					with profiler.phase("analyze", experiment):
+						for online_analyzer, (values, valid) in zip(online_analyzers[name], rows):
+							online_analyzer.add_row(class_ids[name], values, valid)
+				no_processed += 1
+				profiler.count("experiments")
+				print(f"classified {experiment_dir} into class {', '.join(f'{name}={class_id}' for name, class_id in class_ids.items())}.")
+
+				if no_processed % args.report_every == 0:
+					print(f"===== Intermediate results ({no_processed}/{no_experiments} experiments) =====")
+					for name in classifications.keys():
+						with profiler.phase("report"):
+							report(
+								merge_analysis_results([a.analyze() for a in online_analyzers[name]]),
+								classification_results_path(args.results, name, len(classifications)),
+								name if len(classifications) > 1 else None
+							)
+		except KeyboardInterrupt:
+			print("Interrupted.")
+
+		print(f"===== Results ({no_processed}/{no_experiments} experiments) =====")
+		for name in classifications.keys():
+			with profiler.phase("report"):
+				report(
+					merge_analysis_results([a.analyze() for a in online_analyzers[name]]),
+					classification_results_path(args.results, name, len(classifications)),
+					name if len(classifications) > 1 else None
+				)
+
+	else:
+		# classify all measurements at once according to the selected
+		# classification methods
+		batch_classifiers: Dict[str, BatchClassifier] = {
+			name: build_batch_classifier(method, config, section) for name, (method, section) in classifications.items()
+		}
+
+		# parse the measurement logs of all experiments into a batch, using
+		# the consolidated register file if it is up to date
+		consolidated: Optional[RegisterMatrix] = RegisterMatrix.load_consolidated(args.outdir, experiment_dirs)
+		print(f"loading {len(experiment_dirs)} experiments...")
+		with profiler.phase("load"):
+			batch: MeasurementBatch = MeasurementBatch.from_experiment_dirs(
+				experiment_dirs, measurement_method, consolidated, args.jobs
+			)
+			if consolidated is None:
+				batch.register_matrix.save_consolidated(args.outdir, experiment_dirs)
+		profiler.count("experiments", batch.no_experiments)
+
+		for name, batch_classifier in batch_classifiers.items():
+			print(f"classifying experiments ({name})...")
+			with profiler.phase("classify"):
+				classification: BatchClassification = classify_batch(batch, batch_classifier)
+			for class_id, indices in classification.indices.items():
+				print(f"class {class_id}: {len(indices)} experiments")
+			profiler.count("classes", len(classification.indices))
+
+			# ============ ANALYZER ===========
+
+			# Analysis: find constraints and relations
+			with profiler.phase("analyze"):
+				results: List[ClassAnalysisResult] = analyze_batch(batch, classification, groups, args.jobs, args.triples)
+			with profiler.phase("report"):
+				report(
+					results, classification_results_path(args.results, name, len(classifications)),
+					name if len(classifications) > 1 else None
+				)
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import os
 
-from typing import Union, Optional, Tuple, List, TYPE_CHECKING
+from typing import Union, Optional, Tuple, List, Dict, TYPE_CHECKING
 if TYPE_CHECKING:
 	from .ast_directives import Directive
 	from .ast_operators import Operator
@@ -13,6 +13,8 @@ from .ast_node import ASTNode, ASTNodeExpandable
 
 from .codegen import CodeGenerator, CGDestination
 
+from utils.profiling import profiler
+
 class Expression(ASTNodeExpandable):
 	"""
 	This class describes an expression, i.e. an AST node that contains any
@@ -80,8 +82,10 @@ class GTS(ASTNode):
 		assert self.expression is not None
 		return (precondition_expanded, expression_expanded)
 
-	def codegen(self, generator: CodeGenerator, deterministic: Union[bool, str]) -> List[Tuple[str, str, str]]:
-		result: List[Tuple[str, str, str]] = []
+	def codegen(
+		self, generator: CodeGenerator, deterministic: Union[bool, str]
+	) -> List[Tuple[str, str, str, Dict[str, Tuple[int, int]]]]:
+		result: List[Tuple[str, str, str, Dict[str, Tuple[int, int]]]] = []
 
 		# if deterministic and state json file exists, recover mappings before starting
 		if deterministic is not False:
@@ -92,28 +96,36 @@ class GTS(ASTNode):
 
 		# expand precondition and expression
 		state: ExpansionState = ExpansionState(generator)
-		expanded_precondition, expanded_expression = self.expand(state)
+		with profiler.phase("codegen_expand"):
+			expanded_precondition, expanded_expression = self.expand(state)
+		profiler.count("experiments", len(expanded_expression))
 		
 		# for each experiment, generate setup and main code section
-		for experiment in expanded_expression:
-			# reset generator state (if not deterministic)
-			generator.reset(reset_mappings=(deterministic is False))
-
-			# code generation for precondition
-			if expanded_precondition is not None:
-				# disallow sets in precondition; this is already handled in expand()
-				assert len(expanded_precondition) == 1
-		
-				generator.destination = CGDestination.PRECONDITION
-				for directive in expanded_precondition[0]:
-					directive.codegen(generator)
-
-			# code generation for expression
-			generator.destination = CGDestination.MAIN
-			for directive in experiment:
-				directive.codegen(generator)
+		for i, experiment in enumerate(expanded_expression):
+			with profiler.phase("codegen", f"{i:08d}"):
+				# reset generator state (if not deterministic)
+				generator.reset(reset_mappings=(deterministic is False))
+
+				# code generation for precondition
+				if expanded_precondition is not None:
+					# disallow sets in precondition; this is already handled in expand()
+					assert len(expanded_precondition) == 1
 			
-			result.append((generator.generate_setup(), generator.generate_main(), generator.generate_register_contents_json()))
+					generator.destination = CGDestination.PRECONDITION
+					for directive in expanded_precondition[0]:
+						directive.codegen(generator)
+
+				# code generation for expression
+				generator.destination = CGDestination.MAIN
+				for directive in experiment:
+					directive.codegen(generator)
+				
+				result.append((
+					generator.generate_setup(),
+					generator.generate_main(),
+					generator.generate_register_contents_json(),
+					generator.generate_fuzzed_bits()
+				))
 
 		# if deterministic, store the final state of code generation mappings
 		# in the specified json file
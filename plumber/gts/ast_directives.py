@@ -163,9 +163,12 @@ class DirectiveMemory(Directive):
 					raise SyntaxError("Invalid attribute: first value token does not match expected pattern for this kind of placeholder.")
 
 		self.address: AttributeAddress = AttributeAddress(attributes["s"], attributes["t"])
+		# range of address bits fuzzed by a fuzzing operator (lower bound
+		# incl., upper bound excl.); set by OperatorFuzz, None otherwise.
+		self.fuzzed_bits_idx: Optional[Tuple[int, int]] = None
 
 	def codegen(self, generator: CodeGenerator) -> None:
-		generator.memory_load(self.address)
+		generator.memory_load(self.address, self.fuzzed_bits_idx)
 
 	def to_str(self, indent: int) -> str:
 		result = ind(indent) + self.__class__.__name__ + "("
@@ -285,15 +285,14 @@ class OperatorFuzz(Operator):
 				# requested bits.
 				
 				# determine which bits to fuzz
-				num_fuzzed_bits: int = 0
+				fuzzed_bits_idx: Tuple[int, int]
 				if self.fuzz_type == "FUZZ_OFFSET_AT": # offset fuzzing
-					offset_bit_lower, offset_bit_upper = state.generator.address_bits_offset()
-					num_fuzzed_bits = offset_bit_upper - offset_bit_lower
+					fuzzed_bits_idx = state.generator.address_bits_offset()
 				elif self.fuzz_type == "FUZZ_CL_DOLLAR": # cache line fuzzing
-					set_bit_lower, set_bit_upper = state.generator.address_bits_set()
-					num_fuzzed_bits = set_bit_upper - set_bit_lower
+					fuzzed_bits_idx = state.generator.address_bits_set()
 				else:
 					raise SyntaxError("Unknown fuzz type")
+				num_fuzzed_bits: int = fuzzed_bits_idx[1] - fuzzed_bits_idx[0]
 				
 				# iterate over these bits; multiply the experiment such that
 				# every possible combination of the fuzzed bits is covered.
@@ -304,6 +303,8 @@ class OperatorFuzz(Operator):
 						offset = (offsets & (fuzzed_bits_mask << (num_fuzzed_bits * i))) >> (num_fuzzed_bits * i)
 						experiment_copy[location] = copy.deepcopy(experiment[location])
 						assert isinstance(experiment_copy[location], DirectiveMemory)
+						# remember the fuzzed bits for the campaign metadata
+						experiment_copy[location].fuzzed_bits_idx = fuzzed_bits_idx
 						if self.fuzz_type == "FUZZ_OFFSET_AT": # offset fuzzing
 							experiment_copy[location].address.offset.offset = offset
 							experiment_copy[location].address.set.override = 0
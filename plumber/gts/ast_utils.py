@@ -6,6 +6,8 @@ if TYPE_CHECKING:
 	from .ast_directives import Directive, DirectiveAttributeValueParts, DirectiveAttributeValuePart
 	from .ast_state import ExpansionState
 
+from utils.profiling import profiler
+
 def ind(indent: int) -> str:
 	"""
 	Helper function to indent to_str output properly.
@@ -32,11 +34,12 @@ def ast_list_unique(l: List[List[Directive]]) -> List[List[Directive]]:
 	"""
 	seen: Set[int] = set()
 	result: List[List[Directive]] = []
-	for elem in l:
-		elem_hash = ast_list_hash(elem)
-		if elem_hash not in seen:
-			seen.add(elem_hash)
-			result.append(elem)
+	with profiler.phase("dedup"):
+		for elem in l:
+			elem_hash = ast_list_hash(elem)
+			if elem_hash not in seen:
+				seen.add(elem_hash)
+				result.append(elem)
 	return result
 
 def ast_list_hash(l: Sequence[ASTNode]) -> int:
@@ -58,6 +58,8 @@ class CodeGenerator(metaclass=abc.ABCMeta):
 			self.table_operand_name_to_value: Dict[str, int] = dict()
 			self.table_condition_name_to_stored_operand_offset: Dict[str, int] = dict()
 		self.table_value_to_reg: Dict[int, str] = dict()
+		self.table_reg_to_value: Dict[str, int] = dict()
+		self.table_reg_to_fuzzed_bits: Dict[str, Tuple[int, int]] = dict()
 
 		# handle state of store_base_address etc.
 		if reset_mappings:
@@ -170,14 +172,31 @@ class CodeGenerator(metaclass=abc.ABCMeta):
 		                        register pool.
 		"""
 		if value not in self.table_value_to_reg:
-			if len(self.pool_register) > 0:
-				reg = self.pool_register.pop()
-				self.table_value_to_reg[value] = reg
-				self._write_code_set_up_register(reg, value)
-			else:
-				raise Exception("No register left.")
+			self.table_value_to_reg[value] = self._reserve_register(value)
 		return self.table_value_to_reg[value]
 
+	def _reserve_register(self, value: int) -> str:
+		"""
+		Reserves a general-purpose register of its own, even if another
+		register holds the same value, and sets it to the specified value in
+		the setup code.
+		
+		:param      value:      The value
+		:type       value:      int
+		
+		:returns:   Name of the reserved register
+		:rtype:     str
+		
+		:raises     Exception:  Raised if no registers are left in the
+		                        register pool.
+		"""
+		if len(self.pool_register) == 0:
+			raise Exception("No register left.")
+		reg: str = self.pool_register.pop()
+		self.table_reg_to_value[reg] = value
+		self._write_code_set_up_register(reg, value)
+		return reg
+
 	def _assign_stored_value_offset(self) -> int:
 		# ensure that we have the store base address stored in a register.
 		# if not, write it into the register that was reserved for this purpose.
@@ -246,7 +265,17 @@ class CodeGenerator(metaclass=abc.ABCMeta):
 		return self.code_main[:]
 
 	def generate_register_contents_json(self) -> str:
-		return json.dumps({regname: value for value, regname in self.table_value_to_reg.items()})
+		return json.dumps(self.table_reg_to_value)
+
+	def generate_fuzzed_bits(self) -> Dict[str, Tuple[int, int]]:
+		"""
+		Returns the registers that hold fuzzed addresses, together with the
+		range of fuzzed address bits (lower bound incl., upper bound excl.)
+
+		:returns:   Mapping register name -> range of fuzzed bits
+		:rtype:     Dict[str, Tuple[int, int]]
+		"""
+		return dict(self.table_reg_to_fuzzed_bits)
 
 	# Code generation functions for each of the directives (to be called from DirectiveXXX.codegen)
 	def arithmetic(self, op1: AttributeOperand, op2: AttributeOperand) -> None:
@@ -267,7 +296,7 @@ class CodeGenerator(metaclass=abc.ABCMeta):
 		value: int = 0 if condition_operand_stored.bool else 1
 		self._write_code_main_store_int(stored_operand_offset, value)
 
-	def memory_load(self, address: AttributeAddress) -> None:
+	def memory_load(self, address: AttributeAddress, fuzzed_bits_idx: Optional[Tuple[int, int]] = None) -> None:
 		set_no: int = 0
 		if address.set.override is None:
 			set_no = self._placeholder_to_set(address.set.placeholder())
@@ -308,7 +337,16 @@ class CodeGenerator(metaclass=abc.ABCMeta):
 			| (tag_no << self.shift_tag()) \
 			| (set_no << self.shift_set()) \
 			| (offset << self.shift_offset())	
-		reg_addr: str = self._map_value_to_register(addr)
+		reg_addr: str
+		if fuzzed_bits_idx is None:
+			reg_addr = self._map_value_to_register(addr)
+		else:
+			# a fuzzed address gets a register of its own, even if another
+			# address of this experiment happens to be equal. Thus, the
+			# register allocation is the same in all experiments, and each
+			# register holds the same fuzzed address throughout the campaign.
+			reg_addr = self._reserve_register(addr)
+			self.table_reg_to_fuzzed_bits[reg_addr] = fuzzed_bits_idx
 		self._write_code_memory_load(reg_addr)
 	
 	def nop(self) -> None:
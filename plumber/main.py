@@ -1,17 +1,22 @@
 import argparse
+import cProfile
 import sys
 import os
 import shutil
 import subprocess
 
-from typing import Final
+from typing import Final, Optional
 
 from gts.gts_parser import GTSParser
 from gts.codegen import CodeGeneratorARMA64, CodegenOffsetException
 from gts.ast_state import ExpansionState
 
 from utils.utils import format_str
+from utils.campaign import CampaignMetadata, write_campaign_metadata
+from utils.profiling import profiler
+from classification.measurement import MeasurementCache
 from classification.measurement_utils import read_measurement_method
+from classification.cache_delta import CacheContents, encode_cache_delta_log, write_cache_baseline
 
 if __name__ == "__main__":
 
@@ -45,16 +50,46 @@ if __name__ == "__main__":
 		" If this parameter is not provided, the generated code is written to stdout."
 	)
 
+	argparser.add_argument(
+		"--cache-delta", action="store_true",
+		help="Cache measurements only: store the cache dump of the first experiment as baseline of the" + \
+		" campaign, and only the difference to the baseline (added and evicted cache lines) for each" + \
+		" experiment. Reduces the size of the measurement logs and the time to parse them."
+	)
+	argparser.set_defaults(cache_delta=False)
+
+	argparser.add_argument(
+		"--profile", metavar="REPORT_JSON_FILE",
+		help="Records the time spent in each phase of the campaign (parsing, code generation, file" + \
+		" writes, executor build and run, ...), per phase and per experiment, and writes the timing" + \
+		" report to the specified json file. A summary table is printed at the end."
+	)
+
+	argparser.add_argument(
+		"--cprofile", metavar="STATS_FILE",
+		help="Runs the instantiator (parsing, expansion, code generation, file writes) under cProfile" + \
+		" and writes the profiling statistics to the specified file (readable with pstats)."
+	)
+
 	argparser.add_argument(
 		"gts", type=str,
 		help="String representation of a Generative Testcase Specification"
 	)
 	args = argparser.parse_args()
+
+	if args.profile:
+		profiler.enable()
+		profiler.write_report_at_exit(args.profile)
+	instantiator_profile: Optional[cProfile.Profile] = None
+	if args.cprofile:
+		instantiator_profile = cProfile.Profile()
+		instantiator_profile.enable()
 	
 	# parse GTS string and build AST
-	parser = GTSParser()
-	parser.input(args.gts)
-	gts = parser.parse()
+	with profiler.phase("parse"):
+		parser = GTSParser()
+		parser.input(args.gts)
+		gts = parser.parse()
 	
 	# print AST
 	if args.verbose:
@@ -64,7 +99,8 @@ if __name__ == "__main__":
 	# expand GTS: resolve all operators until the GTS only consists of sets
 	# of directives
 	generator = CodeGeneratorARMA64()
-	expanded = gts.expand(ExpansionState(generator))
+	with profiler.phase("expand"):
+		expanded = gts.expand(ExpansionState(generator))
 	
 	# print expanded GTS
 	if args.verbose:
@@ -104,16 +140,21 @@ if __name__ == "__main__":
 	if args.verbose or (not args.outdir):
 		print("===== Code Generation =====")
 	
-	for i, (code_setup, code_main, registers_json) in enumerate(codes):
+	# collect the fuzzed registers of all experiments for the analyzer
+	campaign_metadata: CampaignMetadata = CampaignMetadata()
+
+	for i, (code_setup, code_main, registers_json, fuzzed_bits) in enumerate(codes):
+		campaign_metadata.add_experiment(fuzzed_bits)
 		if args.outdir:
-			codedir: str = os.path.join(args.outdir, f"{i:08d}")
-			os.makedirs(codedir)
-			with open(os.path.join(codedir, "asm_setup.h"), "w") as code_setup_file:
-				code_setup_file.write(code_setup)
-			with open(os.path.join(codedir, "asm.h"), "w") as code_main_file:
-				code_main_file.write(code_main)
-			with open(os.path.join(codedir, "registers.json"), "w") as registers_json_file:
-				registers_json_file.write(registers_json)
+			with profiler.phase("write_files", f"{i:08d}"):
+				codedir: str = os.path.join(args.outdir, f"{i:08d}")
+				os.makedirs(codedir)
+				with open(os.path.join(codedir, "asm_setup.h"), "w") as code_setup_file:
+					code_setup_file.write(code_setup)
+				with open(os.path.join(codedir, "asm.h"), "w") as code_main_file:
+					code_main_file.write(code_main)
+				with open(os.path.join(codedir, "registers.json"), "w") as registers_json_file:
+					registers_json_file.write(registers_json)
 		if args.verbose or (not args.outdir):
 			print("==== SETUP ====")
 			print(code_setup)
@@ -124,6 +165,18 @@ if __name__ == "__main__":
 			print("==== REGISTERS ====")
 			print(registers_json)
 
+	if args.outdir:
+		write_campaign_metadata(args.outdir, campaign_metadata)
+		if len(campaign_metadata.conflicting_registers) > 0:
+			print(
+				"Warning: registers fuzzed with different bit ranges in different experiments" + \
+				f" cannot be analyzed: {', '.join(sorted(campaign_metadata.conflicting_registers))}"
+			)
+
+	if instantiator_profile is not None:
+		instantiator_profile.disable()
+		instantiator_profile.dump_stats(args.cprofile)
+
 	# ============ Trigger the TESTCASE RUNNER ===========
 
 	if not args.outdir:
@@ -138,10 +191,13 @@ if __name__ == "__main__":
 
 	# Parse Makefile.config to find the measurement method
 	measurement_method: str = read_measurement_method(PATH_EXECUTOR_MAKEFILE_CONFIG)
+	if args.cache_delta and measurement_method != "cache":
+		raise Exception("Differential cache dumps require the cache measurement method.")
+	cache_baseline: Optional[CacheContents] = None
 
 	# Run experiments, one after another
-	for experiment_dir in sorted(os.listdir(args.outdir)):
-		experiment_dir = os.path.join(args.outdir, experiment_dir)
+	for experiment in sorted(os.listdir(args.outdir)):
+		experiment_dir: str = os.path.join(args.outdir, experiment)
 		if not os.path.isdir(experiment_dir):
 			continue
 		print(f"running experiment {experiment_dir}...")
@@ -156,13 +212,33 @@ if __name__ == "__main__":
 			os.path.join(PATH_EXECUTOR_CODEDIR, "asm_setup.h")
 		)
 
-		# run the executor
-		executor_process = subprocess.Popen(["make", "-C", PATH_EXECUTOR_MAKEDIR, "clean", "runlog"])
-		executor_process.wait()
-		if executor_process.returncode != 0:
-			raise Exception(f"Executor process failed with returncode {executor_process.returncode}.")
+		# build and run the executor. Building and running are separate make
+		# invocations, such that their durations can be told apart; running
+		# includes loading the program via GDB and capturing the UART output.
+		for phase, make_targets in [("executor_build", ["clean", "all"]), ("executor_run", ["runlog"])]:
+			with profiler.phase(phase, experiment):
+				executor_process = subprocess.Popen(["make", "-C", PATH_EXECUTOR_MAKEDIR] + make_targets)
+				executor_process.wait()
+			if executor_process.returncode != 0:
+				raise Exception(f"Executor process failed with returncode {executor_process.returncode}.")
 		
-		# copy measurement log (uart.log) into experiment folder
-		path_measurement_logfile: str = os.path.join(experiment_dir, f"uart.log")
-		shutil.copy(PATH_EXECUTOR_LOGFILE, path_measurement_logfile)
+		# copy measurement log (uart.log) into experiment folder. Copy to a
+		# temporary file first and rename it afterwards, such that a
+		# concurrently running online classifier never reads a partial log.
+		with profiler.phase("store_log", experiment):
+			path_measurement_logfile: str = os.path.join(experiment_dir, f"uart.log")
+			path_measurement_logfile_tmp: str = os.path.join(experiment_dir, f"uart.log.tmp")
+			if args.cache_delta:
+				# store the difference to the baseline of the campaign; the
+				# cache dump of the first experiment is the baseline
+				cache_contents: CacheContents = MeasurementCache(PATH_EXECUTOR_MAKEDIR).cache_contents
+				if cache_baseline is None:
+					cache_baseline = cache_contents
+					write_cache_baseline(args.outdir, cache_baseline)
+				with open(path_measurement_logfile_tmp, "wb") as measurement_logfile:
+					measurement_logfile.write(encode_cache_delta_log(cache_baseline, cache_contents))
+			else:
+				shutil.copy(PATH_EXECUTOR_LOGFILE, path_measurement_logfile_tmp)
+			os.replace(path_measurement_logfile_tmp, path_measurement_logfile)
+		profiler.count("experiments_run")
 
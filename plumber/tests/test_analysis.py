@@ -0,0 +1,165 @@
+import json
+import unittest
+import numpy as np
+
+from typing import Dict, List, Optional, Tuple
+
+from analysis.analysis_functions import analyze_fuzzed_bits, extract_constraints
+from analysis.analysis_utils import relation2, relation3
+from analysis.analysis_results import ClassAnalysisResult, analysis_results_to_json
+from analysis.analysis_statistics import ClassStatistics
+from analysis.online_analysis import OnlineAnalyzer
+from classification.measurement_batch import MeasurementBatch, BatchClassification
+from classification.register_matrix import RegisterMatrix
+from classifier_analyzer import analyze_batch
+
+class FakeMeasurement:
+	def __init__(self, register_contents: Dict[str, int]) -> None:
+		self._register_contents = register_contents
+		self.register_matrix = None
+
+	def register_contents(self) -> Dict[str, int]:
+		return self._register_contents
+
+def build_classification(fuzzed_bits_idx: Tuple[int, int]) -> Dict[int, List[FakeMeasurement]]:
+	# two fuzzed registers; class 1 contains all testcases where
+	# y = x + 1 (mod 2^n), class 0 contains all others
+	shift, no_bits = fuzzed_bits_idx[0], fuzzed_bits_idx[1] - fuzzed_bits_idx[0]
+	classification: Dict[int, List[FakeMeasurement]] = dict()
+	for x in range(1 << no_bits):
+		for y in range(1 << no_bits):
+			class_id = 1 if y == (x + 1) % (1 << no_bits) else 0
+			classification.setdefault(class_id, []).append(FakeMeasurement({
+				"x30": 0x80000000 | (x << shift),
+				"x29": 0x80000000 | (y << shift),
+			}))
+	return classification
+
+def build_classification3(fuzzed_bits_idx: Tuple[int, int]) -> Dict[int, List[FakeMeasurement]]:
+	# three fuzzed registers; class 1 contains all testcases where
+	# z = x + 2y (mod 2^n), class 0 contains all others. The relation is
+	# invisible in the pairwise histograms.
+	shift, no_bits = fuzzed_bits_idx[0], fuzzed_bits_idx[1] - fuzzed_bits_idx[0]
+	classification: Dict[int, List[FakeMeasurement]] = dict()
+	for x in range(1 << no_bits):
+		for y in range(1 << no_bits):
+			for z in range(1 << no_bits):
+				class_id = 1 if z == (x + 2 * y) % (1 << no_bits) else 0
+				classification.setdefault(class_id, []).append(FakeMeasurement({
+					"x30": 0x80000000 | (x << shift),
+					"x29": 0x80000000 | (y << shift),
+					"x28": 0x80000000 | (z << shift),
+				}))
+	return classification
+
+class TestAnalysis(unittest.TestCase):
+
+	def test_relation2(self):
+		points = [(x, (3 * x + 5) % 16) for x in range(16)]
+		self.assertEqual(relation2(points, (6, 10)), (3, 5))
+		self.assertIsNone(relation2([(0, 1), (0, 2)], (6, 10)))
+
+	def test_relation3(self):
+		points = np.array([(x, y, (3 * x + 6 * y + 5) % 16) for x in range(16) for y in range(16)])
+		self.assertEqual(relation3(points, (6, 10)), (3, 6, 5))
+		self.assertIsNone(relation3(np.array([(0, 0, 1), (0, 0, 2), (1, 1, 1)]), (6, 10)))
+
+	def test_extract_constraints(self):
+		# bit 7 (= bit 1 of the fuzzed bits) is 1 for all candidates
+		constraints = extract_constraints([("x30", 0b010), ("x30", 0b011), ("x30", 0b110)], (6, 9))
+		self.assertEqual(
+			[(c.register, c.bit_index, c.bit_value) for c in constraints],
+			[("x30", 7, 1)]
+		)
+
+	def test_analyze_fuzzed_bits(self):
+		classification = build_classification((6, 9))
+		for jobs in [1, 2]:
+			results: List[ClassAnalysisResult] = analyze_fuzzed_bits(classification, (6, 9), jobs)
+			self.assertEqual([result.class_id for result in results], [0, 1])
+			self.assertEqual([result.no_testcases for result in results], [56, 8])
+			# pairs that satisfy the relation never occur in class 0
+			relations = results[0].relations
+			self.assertEqual(len(relations), 1)
+			self.assertEqual((relations[0].register_x, relations[0].register_y), ("x30", "x29"))
+			self.assertEqual((relations[0].a, relations[0].b), (1, 1))
+			self.assertEqual((relations[0].match_sat, relations[0].match_all), (0, 56))
+
+	def test_multiple_fuzzed_bit_ranges(self):
+		# x30 is fuzzed in bits 0-2, x29 and x28 in bits 6-8; the testcases
+		# cover all combinations. Class 1 contains all testcases where
+		# x28 = x29 + 1 (mod 8), independent of x30.
+		experiments: List[str] = []
+		all_register_contents: List[Dict[str, int]] = []
+		class_ids: List[int] = []
+		for x in range(8):
+			for y in range(8):
+				for z in range(8):
+					experiments.append(f"exp{len(experiments)}")
+					all_register_contents.append({"x30": 0x80000000 | x, "x29": 0x80000000 | (y << 6), "x28": 0x80000000 | (z << 6)})
+					class_ids.append(1 if z == (y + 1) % 8 else 0)
+		register_matrix = RegisterMatrix.from_register_contents(experiments, all_register_contents)
+		batch = MeasurementBatch(len(experiments), register_matrix, np.arange(len(experiments)))
+		groups: Dict[Tuple[int, int], Optional[List[str]]] = {(0, 3): ["x30"], (6, 9): ["x29", "x28"]}
+		results = analyze_batch(batch, BatchClassification(np.array(class_ids)), groups, 1, False)
+		self.assertEqual([result.no_testcases for result in results], [448, 64])
+		# the fuzzed bits of x30 multiply the testcases of each pair of x29
+		# and x28, which must not be mistaken for undocumented behavior
+		relations = results[0].relations
+		self.assertEqual(len(relations), 1)
+		self.assertEqual((relations[0].register_x, relations[0].register_y), ("x29", "x28"))
+		self.assertEqual((relations[0].a, relations[0].b), (1, 1))
+		self.assertEqual((relations[0].match_sat, relations[0].match_all), (0, 448))
+
+	def test_results_to_json(self):
+		results = analyze_fuzzed_bits(build_classification((6, 8)), (6, 8), 1)
+		serialized = json.loads(analysis_results_to_json(results))
+		self.assertEqual(len(serialized), 2)
+		self.assertEqual(serialized[0]["relations"][0]["a"], 1)
+
+	def test_online_analyzer(self):
+		classification = build_classification((6, 9))
+		online_analyzer = OnlineAnalyzer((6, 9))
+		# interleave the classes, as they would arrive during a campaign
+		testcases = sorted(
+			(measurement.register_contents()["x30"], measurement.register_contents()["x29"], class_id, measurement)
+			for class_id, measurements in classification.items() for measurement in measurements
+		)
+		for _, _, class_id, measurement in testcases:
+			online_analyzer.add(class_id, measurement.register_contents())
+		self.assertEqual(online_analyzer.no_testcases(), 64)
+		self.assertEqual(online_analyzer.analyze(), analyze_fuzzed_bits(classification, (6, 9), 1))
+		with self.assertRaises(KeyError):
+			online_analyzer.analyze_class(2)
+
+	def test_statistics_merge(self):
+		classification = build_classification((6, 9))
+		registers = ["x30", "x29"]
+		merged = ClassStatistics(registers, (6, 9))
+		for measurements in classification.values():
+			merged.merge(ClassStatistics(registers, (6, 9)).add_all(m.register_contents() for m in measurements))
+		self.assertEqual(merged.no_testcases, 64)
+		self.assertTrue((merged.hist1["x30"] == 8).all())
+		self.assertTrue((merged.hist2[("x30", "x29")] == 1).all())
+
+	def test_analyze_triples(self):
+		classification = build_classification3((6, 9))
+		results = analyze_fuzzed_bits(classification, (6, 9), 1, triples=True)
+		self.assertEqual([result.no_testcases for result in results], [448, 64])
+		# the triples that satisfy the relation never occur in class 0
+		self.assertEqual([relation.register_pair() for relation in results[0].relations], [])
+		relations3 = results[0].relations3
+		self.assertEqual(len(relations3), 1)
+		self.assertEqual(relations3[0].register_triple(), "x30_x29_x28")
+		self.assertEqual((relations3[0].a, relations3[0].b, relations3[0].c), (1, 2, 0))
+		self.assertEqual((relations3[0].match_sat, relations3[0].match_all), (0, 448))
+		# without triples, the relation is not found
+		self.assertEqual(analyze_fuzzed_bits(classification, (6, 9), 1)[0].relations3, [])
+
+	def test_online_analyzer_triples(self):
+		classification = build_classification3((6, 8))
+		online_analyzer = OnlineAnalyzer((6, 8), triples=True)
+		for class_id, measurements in classification.items():
+			for measurement in measurements:
+				online_analyzer.add(class_id, measurement.register_contents())
+		self.assertEqual(online_analyzer.analyze(), analyze_fuzzed_bits(classification, (6, 8), 1, triples=True))
@@ -0,0 +1,35 @@
+import unittest
+
+from benchmarks.gts_benchmarks import BENCHMARKS, compare, run_pipeline
+
+BASELINE = {
+	"shuffle": {"experiments": 6, "parse": 0.001, "expand": 0.1, "dedup": 0.05, "codegen": 0.2, "peak_memory": 2**20},
+}
+
+class TestBenchmarks(unittest.TestCase):
+
+	def test_run_pipeline(self):
+		metrics = run_pipeline("(M_t=t1,s=s1 M_t=t2,s=s2 M_t=t3,s=s3)!")
+		self.assertEqual(metrics["experiments"], 6)
+		for metric in ["parse", "expand", "dedup", "codegen"]:
+			self.assertGreaterEqual(metrics[metric], 0.0)
+
+	def test_run_pipeline_retry(self):
+		# the set offsets of the loop leave the allowed range in some runs,
+		# which must not abort the benchmark
+		for _ in range(30):
+			metrics = run_pipeline(BENCHMARKS["power_loop_variable"])
+			self.assertEqual(metrics["experiments"], 1)
+
+	def test_compare(self):
+		results = {"shuffle": dict(BASELINE["shuffle"])}
+		self.assertEqual(compare(results, BASELINE, 0.25), [])
+		# small absolute differences are noise
+		results["shuffle"]["parse"] = 0.003
+		self.assertEqual(compare(results, BASELINE, 0.25), [])
+		results["shuffle"]["codegen"] = 0.3
+		results["shuffle"]["experiments"] = 7
+		regressions = compare(results, BASELINE, 0.25)
+		self.assertEqual(len(regressions), 2)
+		self.assertIn("codegen", regressions[1])
+		self.assertEqual(compare(results, BASELINE, 1.0)[1:], [])
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+
+from classification.measurement import MeasurementCache
+from classification.cache_delta import cache_delta, apply_cache_delta, encode_cache_delta_log, write_cache_baseline
+
+BASELINE = {
+	1: [(0, 0x80000), (0, 0x80001), (5, 0x80002), (5, 0x80002), (9, 0x80003)],
+	2: [(100, 0x8000)],
+}
+CONTENTS = {
+	1: [(0, 0x80000), (3, 0x90000), (5, 0x80002), (9, 0x80003), (9, 0x90001)],
+	2: [(100, 0x8000)],
+}
+
+class TestCacheDelta(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def test_delta(self):
+		added, evicted = cache_delta(BASELINE[1], CONTENTS[1])
+		self.assertEqual(sorted(added), [(3, 0x90000), (9, 0x90001)])
+		self.assertEqual(sorted(evicted), [(0, 0x80001), (5, 0x80002)])
+		self.assertEqual(apply_cache_delta(BASELINE[1], added, evicted), CONTENTS[1])
+		self.assertEqual(cache_delta(BASELINE[2], CONTENTS[2]), ([], []))
+		with self.assertRaises(Exception):
+			apply_cache_delta(BASELINE[2], [], [(1, 2)])
+
+	def test_measurement_cache(self):
+		experiment_dir = os.path.join(self.tmpdir.name, "00000000")
+		os.makedirs(experiment_dir)
+		with open(os.path.join(experiment_dir, "uart.log"), "wb") as uart_log_file:
+			uart_log_file.write(encode_cache_delta_log(BASELINE, CONTENTS))
+		# the baseline is required to reconstruct the cache contents
+		with self.assertRaises(Exception):
+			MeasurementCache(experiment_dir).cache_contents
+		write_cache_baseline(self.tmpdir.name, BASELINE)
+		measurement = MeasurementCache(experiment_dir)
+		self.assertEqual(measurement.cache_contents, CONTENTS)
+		self.assertTrue(measurement.contains(1, 3, 0x90000))
+		self.assertFalse(measurement.contains(1, 0, 0x80001))
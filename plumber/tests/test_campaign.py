@@ -0,0 +1,51 @@
+import unittest
+
+from gts.gts_parser import GTSParser
+from gts.codegen import CodeGeneratorARMA64
+
+from utils.campaign import CampaignMetadata
+
+def codegen(gts_str: str):
+	parser = GTSParser()
+	parser.input(gts_str)
+	return parser.parse().codegen(CodeGeneratorARMA64(), False)
+
+class TestCampaignMetadata(unittest.TestCase):
+
+	def test_fuzzed_bits_cache_line(self):
+		metadata = CampaignMetadata()
+		for _, _, _, fuzzed_bits in codegen("M_s=s1 <M_s=s2 A>$"):
+			metadata.add_experiment(fuzzed_bits)
+		# only the memory directive within the fuzzing operator is fuzzed,
+		# the operands of A are not
+		self.assertEqual(len(metadata.fuzzed_bits), 1)
+		self.assertEqual(list(metadata.registers_by_fuzzed_bits().keys()), [CodeGeneratorARMA64.address_bits_set()])
+
+	def test_fuzzed_bits_not_fuzzed(self):
+		for _, _, _, fuzzed_bits in codegen("M_s=s1 M_s=s2"):
+			self.assertEqual(fuzzed_bits, dict())
+
+	def test_conflicting_registers(self):
+		metadata = CampaignMetadata()
+		metadata.add_experiment({"x30": (6, 13), "x29": (6, 13)})
+		metadata.add_experiment({"x30": (0, 6)})
+		metadata.add_experiment({"x30": (6, 13)})
+		self.assertEqual(metadata.fuzzed_bits, {"x29": (6, 13)})
+		self.assertEqual(metadata.conflicting_registers, {"x30"})
+
+	def test_multiple_fuzzed_bit_ranges(self):
+		metadata = CampaignMetadata()
+		for _, _, _, fuzzed_bits in codegen("<M_s=s1>@ <M_s=s2>$"):
+			metadata.add_experiment(fuzzed_bits)
+		# both addresses get a register of their own, even if their values
+		# coincide in some experiments
+		self.assertEqual(metadata.conflicting_registers, set())
+		self.assertEqual(len(metadata.registers_by_fuzzed_bits()), 2)
+		self.assertEqual(sorted(len(registers) for registers in metadata.registers_by_fuzzed_bits().values()), [1, 1])
+
+	def test_json(self):
+		metadata = CampaignMetadata({"x30": (0, 6), "x29": (6, 13), "x28": (6, 13)}, {"x27"})
+		restored = CampaignMetadata.from_json(metadata.to_json())
+		self.assertEqual(restored.fuzzed_bits, metadata.fuzzed_bits)
+		self.assertEqual(restored.conflicting_registers, {"x27"})
+		self.assertEqual(restored.registers_by_fuzzed_bits(), {(0, 6): ["x30"], (6, 13): ["x29", "x28"]})
@@ -0,0 +1,193 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from typing import Dict, List, Tuple
+
+from classification.measurement import MeasurementCache, MeasurementInt
+from classification.classification_methods import build_classifier, build_batch_classifier, \
+	classify_batch, classification_configs, CLASSIFICATION_METHODS
+from classification.measurement_batch import MeasurementBatch, BatchClassification
+from gts.codegen import CodeGeneratorARMA64
+from utils.config import Config
+
+def address(set_no: int, tag_no: int) -> int:
+	return (tag_no << CodeGeneratorARMA64.shift_tag()) | (set_no << CodeGeneratorARMA64.shift_set())
+
+class TestClassification(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.no_experiments = 0
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def config(self, ini: str) -> Config:
+		path = os.path.join(self.tmpdir.name, "classifier.ini")
+		with open(path, "w") as config_file:
+			config_file.write(ini)
+		return Config(path)
+
+	def experiment(self, uart_log: str, register_contents: Dict[str, int]) -> str:
+		experiment_dir = os.path.join(self.tmpdir.name, f"{self.no_experiments:08d}")
+		self.no_experiments += 1
+		os.makedirs(experiment_dir)
+		with open(os.path.join(experiment_dir, "uart.log"), "w") as uart_log_file:
+			uart_log_file.write("Init complete.\n" + uart_log + "Experiment complete.\n")
+		with open(os.path.join(experiment_dir, "registers.json"), "w") as registers_json_file:
+			registers_json_file.write(json.dumps(register_contents))
+		return experiment_dir
+
+	def measurement_int(self, value: int) -> MeasurementInt:
+		return MeasurementInt(self.experiment(f"time;{value}\n", dict()), "time")
+
+	def measurement_cache(self, lines: List[Tuple[int, int]], register_contents: Dict[str, int]) -> MeasurementCache:
+		uart_log = "L1 output\nprint_cache_valid\n----\n"
+		for set_no, tag_no in lines:
+			uart_log += f"{set_no}   ::0   :: tag: {tag_no:x}\n"
+		uart_log += "----\n"
+		return MeasurementCache(self.experiment(uart_log, register_contents))
+
+	def assertBatchEqual(self, method: str, config: Config, measurements) -> None:
+		# the batch classifier must produce the same classes as the
+		# classifier for single measurements
+		classifier = build_classifier(method, config)
+		class_ids = classify_batch(
+			MeasurementBatch.from_measurements(measurements), build_batch_classifier(method, config)
+		).class_ids
+		self.assertEqual(class_ids.tolist(), [classifier(m) for m in measurements])
+
+	def test_int_threshold(self):
+		measurements = [self.measurement_int(value) for value in [10, 50, 100]]
+		expected = {
+			"lt": [1, 0, 0], "le": [1, 1, 0], "eq": [0, 1, 0],
+			"ge": [0, 1, 1], "gt": [0, 0, 1], "ne": [1, 0, 1],
+		}
+		for relation, classes in expected.items():
+			config = self.config(f"[method_int_threshold]\nthreshold = 50\nrelation = {relation}\n")
+			classifier = build_classifier("int_threshold", config)
+			self.assertEqual([classifier(m) for m in measurements], classes)
+			self.assertEqual([CLASSIFICATION_METHODS["int_threshold"](m, config) for m in measurements], classes)
+			self.assertBatchEqual("int_threshold", config, measurements)
+		with self.assertRaises(Exception):
+			build_classifier("int_threshold", self.config("[method_int_threshold]\nthreshold = 50\nrelation = xy\n"))
+
+	def test_int_pct_error(self):
+		config = self.config("[method_int_pct_error]\nbucket_size = 10\n")
+		classifier = build_classifier("int_pct_error", config)
+		measurements = [self.measurement_int(value) for value in [0, 9, 10, 55]]
+		self.assertEqual([classifier(m) for m in measurements], [5, 5, 15, 55])
+		self.assertBatchEqual("int_pct_error", config, measurements)
+
+	def test_cache_count(self):
+		config = self.config("[method_cache_count]\ncache_level = 1\n")
+		classifier = build_classifier("cache_count", config)
+		measurements = [
+			self.measurement_cache([(1, 2), (3, 4)], dict()),
+			self.measurement_cache([], dict()),
+			self.measurement_cache([(1, 2)], dict()),
+		]
+		self.assertEqual([classifier(m) for m in measurements], [2, 0, 1])
+		self.assertBatchEqual("cache_count", config, measurements)
+		config = self.config("[method_cache_count]\ncache_level = 2\n")
+		self.assertEqual(build_classifier("cache_count", config)(measurements[0]), 0)
+		self.assertBatchEqual("cache_count", config, measurements)
+
+	def test_cache_exact_address(self):
+		config = self.config(
+			"[general]\ncpu_architecture = ARMA64\n" + \
+			"[method_cache_exact_address]\ncache_level = 1\nexpected_address_index = 1\n"
+		)
+		classifier = build_classifier("cache_exact_address", config)
+		# registers sorted by number: x9, x10, x11 -> index 1 is x10
+		register_contents = {"x11": address(5, 6), "x9": address(1, 2), "x10": address(3, 4)}
+		hit = self.measurement_cache([(1, 2), (3, 4)], register_contents)
+		miss = self.measurement_cache([(1, 2), (5, 6)], register_contents)
+		self.assertEqual([classifier(hit), classifier(miss)], [1, 0])
+		self.assertEqual([CLASSIFICATION_METHODS["cache_exact_address"](m, config) for m in [hit, miss]], [1, 0])
+		# an experiment that uses less registers than expected_address_index
+		few = self.measurement_cache([(1, 2)], {"x9": address(1, 2)})
+		self.assertBatchEqual("cache_exact_address", config, [hit, miss, few, hit])
+
+	def test_cache_lookup(self):
+		measurement = self.measurement_cache([(1, 2), (3, 4), (3, 0x1_0000_0002)], dict())
+		self.assertTrue(measurement.contains(1, 1, 2))
+		self.assertTrue(measurement.contains(1, 3, 0x1_0000_0002))
+		self.assertFalse(measurement.contains(1, 2, 1))
+		self.assertFalse(measurement.contains(2, 1, 2))
+		self.assertTrue(measurement.contains_all(1, [(3, 4), (1, 2)]))
+		self.assertFalse(measurement.contains_all(1, [(3, 4), (1, 4)]))
+		self.assertTrue(measurement.contains_all(1, []))
+
+	def test_classification_configs(self):
+		config = self.config(
+			"[general]\nclassification_method = cache_count\n" + \
+			"[method_cache_count]\ncache_level = 1\n"
+		)
+		self.assertEqual(classification_configs(config), {"cache_count": ("cache_count", "method_cache_count")})
+		config = self.config(
+			"[general]\ncpu_architecture = ARMA64\n" + \
+			"[classification:l2]\nclassification_method = cache_count\ncache_level = 2\n" + \
+			"[classification:l1]\nclassification_method = cache_count\ncache_level = 1\n" + \
+			"[classification:x10]\nclassification_method = cache_exact_address\ncache_level = 1\nexpected_address_index = 1\n"
+		)
+		configs = classification_configs(config)
+		self.assertEqual(list(configs.keys()), ["l2", "l1", "x10"])
+		self.assertEqual(configs["x10"], ("cache_exact_address", "classification:x10"))
+		# each classification reads the options of its own section
+		measurements = [
+			self.measurement_cache([(1, 2), (3, 4)], {"x9": address(1, 2), "x10": address(3, 4)}),
+			self.measurement_cache([(1, 2)], {"x9": address(1, 2), "x10": address(3, 4)}),
+		]
+		batch = MeasurementBatch.from_measurements(measurements)
+		expected = {"l2": [0, 0], "l1": [2, 1], "x10": [1, 0]}
+		for name, (method, section) in configs.items():
+			classifier = build_classifier(method, config, section)
+			self.assertEqual([classifier(m) for m in measurements], expected[name])
+			self.assertEqual(classify_batch(batch, build_batch_classifier(method, config, section)).class_ids.tolist(), expected[name])
+
+	def test_unknown_method(self):
+		with self.assertRaises(Exception):
+			build_classifier("unknown", self.config(""))
+
+	def assertBatchesEqual(self, batch: MeasurementBatch, expected: MeasurementBatch) -> None:
+		self.assertEqual(batch.no_experiments, expected.no_experiments)
+		for array, expected_array in [(batch.values, expected.values), (batch.cache_lines, expected.cache_lines)]:
+			if expected_array is None:
+				self.assertIsNone(array)
+			else:
+				self.assertEqual(array.tolist(), expected_array.tolist())
+		for row, expected_row in zip(batch.register_rows.tolist(), expected.register_rows.tolist()):
+			self.assertEqual(batch.register_matrix.row_dict(row), expected.register_matrix.row_dict(expected_row))
+
+	def test_batch_from_experiment_dirs(self):
+		measurements = [
+			self.measurement_cache([(1, 2), (3, 4)], {"x30": address(1, 2)}),
+			self.measurement_cache([], {"x29": address(3, 4)}),
+			self.measurement_cache([(5, 6)], {"x30": address(5, 6), "x28": 7}),
+			self.measurement_cache([(1, 2)], {"x27": 8}),
+			self.measurement_cache([(7, 8), (9, 10), (11, 12)], dict()),
+		]
+		experiment_dirs = [m.experiment_dir for m in measurements]
+		expected = MeasurementBatch.from_measurements(measurements)
+		for jobs in [1, 2]:
+			# parsed in ordered chunks by worker processes, with and without
+			# a given register matrix
+			self.assertBatchesEqual(MeasurementBatch.from_experiment_dirs(experiment_dirs, "cache", None, jobs), expected)
+			self.assertBatchesEqual(
+				MeasurementBatch.from_experiment_dirs(experiment_dirs, "cache", expected.register_matrix, jobs), expected
+			)
+		measurements = [self.measurement_int(value) for value in [3, 1, 4, 1, 5]]
+		self.assertBatchesEqual(
+			MeasurementBatch.from_experiment_dirs([m.experiment_dir for m in measurements], "time", None, 2),
+			MeasurementBatch.from_measurements(measurements)
+		)
+
+	def test_batch_classification_indices(self):
+		classification = BatchClassification(np.array([3, 1, 3, 0, 1, 3]))
+		self.assertEqual(sorted(classification.indices.keys()), [0, 1, 3])
+		self.assertEqual(classification.indices[3].tolist(), [0, 2, 5])
+		self.assertEqual(classification.indices[1].tolist(), [1, 4])
+		self.assertEqual(classification.indices[0].tolist(), [3])
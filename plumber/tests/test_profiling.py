@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from utils.profiling import Profiler
+
+class TestProfiling(unittest.TestCase):
+
+	def test_disabled(self):
+		profiler = Profiler()
+		with profiler.phase("parse", "00000000"):
+			pass
+		profiler.count("experiments")
+		self.assertEqual(profiler.phases, dict())
+		self.assertEqual(profiler.experiments, dict())
+		self.assertEqual(profiler.counters, dict())
+
+	def test_phases(self):
+		profiler = Profiler()
+		profiler.enable()
+		for experiment in ["00000000", "00000001"]:
+			with profiler.phase("codegen", experiment):
+				pass
+			with profiler.phase("codegen", experiment):
+				pass
+		with profiler.phase("parse"):
+			pass
+		profiler.count("experiments", 2)
+		with self.assertRaises(ValueError):
+			with profiler.phase("run", "00000002"):
+				raise ValueError()
+
+		self.assertEqual(profiler.phases["codegen"].count, 4)
+		self.assertEqual(profiler.phases["parse"].count, 1)
+		# phases that raise are recorded, too
+		self.assertEqual(profiler.phases["run"].count, 1)
+		self.assertEqual(sorted(profiler.experiments.keys()), ["00000000", "00000001", "00000002"])
+		self.assertEqual(sorted(profiler.experiments["00000000"].keys()), ["codegen"])
+		self.assertEqual(profiler.counters, {"experiments": 2})
+
+		summary = profiler.summary()
+		for name in ["codegen", "parse", "run", "experiments: 2"]:
+			self.assertIn(name, summary)
+
+		with tempfile.TemporaryDirectory() as tmpdir:
+			path = os.path.join(tmpdir, "profile.json")
+			profiler.write_report(path)
+			with open(path) as report_file:
+				report = json.loads(report_file.read())
+		self.assertEqual(report["phases"]["codegen"]["count"], 4)
+		self.assertEqual(report["counters"], {"experiments": 2})
+		self.assertIn("codegen", report["experiments"]["00000001"])
+
+	def test_nested_phases(self):
+		profiler = Profiler()
+		profiler.enable()
+		with profiler.phase("load"):
+			for _ in range(2):
+				with profiler.phase("parse"):
+					time.sleep(0.01)
+		load, parse = profiler.phases["load"], profiler.phases["parse"]
+		self.assertEqual(parse.exclusive, parse.total)
+		self.assertGreaterEqual(load.total, parse.total)
+		# the nested phase is only counted once
+		self.assertAlmostEqual(load.exclusive + parse.exclusive, load.total)
+		self.assertLess(load.exclusive, parse.total)
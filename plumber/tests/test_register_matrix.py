@@ -0,0 +1,142 @@
+import json
+import os
+import tempfile
+import unittest
+
+from typing import Dict, List
+
+from classification.register_matrix import RegisterMatrix, REGISTER_MATRIX_FILENAME, register_array
+from analysis.analysis_statistics import ClassStatistics
+from classification.measurement import MeasurementInt
+
+REGISTER_CONTENTS: List[Dict[str, int]] = [
+	{"x30": 0x80000040, "x29": 0x80000080, "x28": 0xfedcba9876543210},
+	{"x30": 0x800000c0, "x28": 0xfedcba9876543210},
+	{"x30": 0x80000000, "x29": 0x80000000, "x27": 1},
+]
+
+class FakeMeasurement:
+	def __init__(self, register_contents: Dict[str, int]) -> None:
+		self._register_contents = register_contents
+		self.register_matrix = None
+
+	def register_contents(self) -> Dict[str, int]:
+		return self._register_contents
+
+class TestRegisterMatrix(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.experiment_dirs: List[str] = []
+		for i, register_contents in enumerate(REGISTER_CONTENTS):
+			experiment_dir = os.path.join(self.tmpdir.name, f"{i:08d}")
+			os.makedirs(experiment_dir)
+			with open(os.path.join(experiment_dir, "registers.json"), "w") as registers_json_file:
+				registers_json_file.write(json.dumps(register_contents))
+			self.experiment_dirs.append(experiment_dir)
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def test_from_experiment_dirs(self):
+		register_matrix = RegisterMatrix.from_experiment_dirs(self.experiment_dirs)
+		self.assertEqual(register_matrix.registers, ["x30", "x29", "x28", "x27"])
+		self.assertEqual(register_matrix.experiments, ["00000000", "00000001", "00000002"])
+		self.assertEqual(register_matrix.values.shape, (3, 4))
+		for row, register_contents in enumerate(REGISTER_CONTENTS):
+			self.assertEqual(register_matrix.row_dict(row), register_contents)
+
+	def test_consolidated(self):
+		self.assertIsNone(RegisterMatrix.load_consolidated(self.tmpdir.name, self.experiment_dirs))
+		register_matrix = RegisterMatrix.from_experiment_dirs(self.experiment_dirs)
+		register_matrix.save_consolidated(self.tmpdir.name, self.experiment_dirs)
+		self.assertTrue(os.path.isfile(os.path.join(self.tmpdir.name, REGISTER_MATRIX_FILENAME)))
+		loaded = RegisterMatrix.load_consolidated(self.tmpdir.name, self.experiment_dirs)
+		self.assertIsNotNone(loaded)
+		self.assertEqual(loaded.registers, register_matrix.registers)
+		self.assertTrue((loaded.values == register_matrix.values).all())
+		self.assertTrue((loaded.valid == register_matrix.valid).all())
+		# the consolidated file is not used if the experiments differ
+		self.assertIsNone(RegisterMatrix.load_consolidated(self.tmpdir.name, self.experiment_dirs[:2]))
+
+	def test_consolidated_outdated(self):
+		RegisterMatrix.from_experiment_dirs(self.experiment_dirs).save_consolidated(self.tmpdir.name, self.experiment_dirs)
+		# the campaign is instantiated again in the same output directory
+		registers_json_file_path = os.path.join(self.experiment_dirs[1], "registers.json")
+		with open(registers_json_file_path, "w") as registers_json_file:
+			registers_json_file.write(json.dumps({"x30": 0x80000100}))
+		stat = os.stat(registers_json_file_path)
+		os.utime(registers_json_file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+		self.assertIsNone(RegisterMatrix.load_consolidated(self.tmpdir.name, self.experiment_dirs))
+
+	def test_concatenate(self):
+		register_matrix = RegisterMatrix.concatenate([
+			RegisterMatrix.from_experiment_dirs(self.experiment_dirs[:1]),
+			RegisterMatrix.from_experiment_dirs(self.experiment_dirs[1:])
+		])
+		self.assertEqual(register_matrix.registers, ["x30", "x29", "x28", "x27"])
+		self.assertEqual(register_matrix.experiments, ["00000000", "00000001", "00000002"])
+		for row, register_contents in enumerate(REGISTER_CONTENTS):
+			self.assertEqual(register_matrix.row_dict(row), register_contents)
+
+	def test_load_or_build(self):
+		register_matrix = RegisterMatrix.load_or_build(self.tmpdir.name, self.experiment_dirs)
+		self.assertTrue(os.path.isfile(os.path.join(self.tmpdir.name, REGISTER_MATRIX_FILENAME)))
+		loaded = RegisterMatrix.load_or_build(self.tmpdir.name, self.experiment_dirs)
+		self.assertTrue((loaded.values == register_matrix.values).all())
+		# the consolidated file is rebuilt if the experiments differ
+		rebuilt = RegisterMatrix.load_or_build(self.tmpdir.name, self.experiment_dirs[:2])
+		self.assertEqual(rebuilt.experiments, ["00000000", "00000001"])
+
+	def test_register_array(self):
+		register_matrix = RegisterMatrix.from_experiment_dirs(self.experiment_dirs)
+		views = [FakeMeasurement(dict()) for _ in REGISTER_CONTENTS]
+		for row, view in enumerate(views):
+			view.register_matrix = register_matrix
+			view.register_row = row
+		measurements = [FakeMeasurement(register_contents) for register_contents in REGISTER_CONTENTS]
+		registers = ["x29", "x30", "x26"]
+		values_views, valid_views = register_array(views[::-1], registers)
+		values, valid = register_array(measurements[::-1], registers)
+		self.assertTrue((values_views == values).all())
+		self.assertTrue((valid_views == valid).all())
+		self.assertEqual(valid.tolist(), [[True, True, False], [False, True, False], [True, True, False]])
+
+	def test_measurement_view(self):
+		register_matrix = RegisterMatrix.from_experiment_dirs(self.experiment_dirs)
+		registers = ["x29", "x30", "x26"]
+		for row, experiment_dir in enumerate(self.experiment_dirs):
+			with open(os.path.join(experiment_dir, "uart.log"), "w") as uart_log_file:
+				uart_log_file.write("Init complete.\ntime;1\nExperiment complete.\n")
+			measurement = MeasurementInt(experiment_dir, "time")
+			values, valid = measurement.register_arrays(registers)
+			measurement.attach_register_matrix(register_matrix, row)
+			values_view, valid_view = measurement.register_arrays(registers)
+			self.assertTrue((values_view == values).all())
+			self.assertTrue((valid_view == valid).all())
+			self.assertEqual(measurement.register_contents(), REGISTER_CONTENTS[row])
+
+	def test_add_row(self):
+		registers = ["x30", "x29", "x28"]
+		register_matrix = RegisterMatrix.from_register_contents([str(i) for i in range(3)], REGISTER_CONTENTS)
+		statistics_row = ClassStatistics(registers, (6, 9), triples=True)
+		for row in range(len(REGISTER_CONTENTS)):
+			statistics_row.add_row(*register_matrix.row(row, registers))
+		statistics_dict = ClassStatistics(registers, (6, 9), triples=True).add_all(REGISTER_CONTENTS)
+		self.assertEqual(statistics_row.no_testcases, statistics_dict.no_testcases)
+		for register in registers:
+			self.assertTrue((statistics_row.hist1[register] == statistics_dict.hist1[register]).all())
+		for pair in statistics_dict.hist2.keys():
+			self.assertTrue((statistics_row.hist2[pair] == statistics_dict.hist2[pair]).all())
+		self.assertEqual(statistics_row.hist3, statistics_dict.hist3)
+
+	def test_add_array(self):
+		registers = ["x30", "x29", "x28"]
+		values, valid = register_array([FakeMeasurement(c) for c in REGISTER_CONTENTS], registers)
+		statistics_array = ClassStatistics(registers, (6, 9), triples=True).add_array(values, valid)
+		statistics_dict = ClassStatistics(registers, (6, 9), triples=True).add_all(REGISTER_CONTENTS)
+		self.assertEqual(statistics_array.no_testcases, statistics_dict.no_testcases)
+		for register in registers:
+			self.assertTrue((statistics_array.hist1[register] == statistics_dict.hist1[register]).all())
+		for pair in statistics_dict.hist2.keys():
+			self.assertTrue((statistics_array.hist2[pair] == statistics_dict.hist2[pair]).all())
+		self.assertEqual(statistics_array.hist3, statistics_dict.hist3)
@@ -0,0 +1,27 @@
+import os
+import tempfile
+import unittest
+
+from benchmarks.synthetic_campaign import synthetic_spec
+from benchmarks.analysis_benchmarks import run_benchmark
+
+class TestSyntheticCampaign(unittest.TestCase):
+
+	def test_spec(self):
+		spec = synthetic_spec("time", "relation", 1000)
+		self.assertEqual(spec.no_experiments(), 1024)
+		self.assertEqual(spec.fuzzed_bits_idx, (6, 11))
+		self.assertEqual(spec.fuzzed_values(33), {"x30": 1, "x29": 1})
+		with self.assertRaises(Exception):
+			synthetic_spec("time", "relation", 1000, 1)
+
+	def test_recovered(self):
+		with tempfile.TemporaryDirectory() as tmpdir:
+			for measurement_method in ["cache", "time", "branch_predictor"]:
+				for kind in ["relation", "constraint"]:
+					for protocol in ["text", "binary"]:
+						spec = synthetic_spec(measurement_method, kind, 64, protocol=protocol)
+						outdir = os.path.join(tmpdir, f"{measurement_method}_{kind}_{protocol}")
+						metrics = run_benchmark(outdir, spec, 1)
+						self.assertEqual(metrics["experiments"], 64)
+						self.assertTrue(metrics["recovered"], outdir)
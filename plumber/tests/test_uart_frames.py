@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+from classification.measurement import MeasurementCache, MeasurementInt
+from classification.uart_frames import CacheFrame, IntFrame, decode_frames, encode_cache_frame, encode_int_frame
+
+LINES_L1 = [(0, 0x80000), (0, 0x80001), (17, 0xfffff), (127, 0x12345678)]
+LINES_L2 = [(1023, 0xabcdef)]
+
+class TestUartFrames(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def experiment(self, name: str, uart_log: bytes) -> str:
+		experiment_dir = os.path.join(self.tmpdir.name, name)
+		os.makedirs(experiment_dir)
+		with open(os.path.join(experiment_dir, "uart.log"), "wb") as uart_log_file:
+			uart_log_file.write(b"Init complete.\n" + uart_log + b"Experiment complete.\n")
+		return experiment_dir
+
+	def test_roundtrip(self):
+		data = b"text\n" + encode_cache_frame(1, LINES_L1) + b"more text\n" + \
+			encode_cache_frame(2, []) + encode_int_frame("time", 2**40 + 3)
+		frames = decode_frames(data)
+		self.assertEqual(len(frames), 3)
+		self.assertIsInstance(frames[0], CacheFrame)
+		self.assertEqual(frames[0].level, 1)
+		self.assertEqual(frames[0].cache_contents(), LINES_L1)
+		self.assertEqual(frames[1].cache_contents(), [])
+		self.assertEqual(frames[2], IntFrame("time", 2**40 + 3))
+
+	def test_corrupted(self):
+		frame = bytearray(encode_cache_frame(1, LINES_L1))
+		frame[-6] ^= 0x01
+		with self.assertRaises(Exception):
+			decode_frames(bytes(frame))
+		with self.assertRaises(Exception):
+			decode_frames(encode_int_frame("time", 1)[:-1])
+
+	def test_measurement_cache(self):
+		uart_log_text = b""
+		for level, lines in [(1, LINES_L1), (2, LINES_L2)]:
+			uart_log_text += f"L{level} output\nprint_cache_valid\n----\n".encode()
+			for set_no, tag_no in lines:
+				uart_log_text += f"{set_no}\t::0\t:: tag: {tag_no:x}\n".encode()
+			uart_log_text += b"----\n"
+		text = MeasurementCache(self.experiment("text", uart_log_text))
+		binary = MeasurementCache(self.experiment(
+			"binary", encode_cache_frame(1, LINES_L1) + encode_cache_frame(2, LINES_L2)
+		))
+		self.assertEqual(binary.cache_contents, text.cache_contents)
+		self.assertTrue(binary.contains(2, 1023, 0xabcdef))
+
+	def test_measurement_int(self):
+		experiment_dir = self.experiment("int", encode_int_frame("mispredictions", 3) + encode_int_frame("time", 42))
+		self.assertEqual(MeasurementInt(experiment_dir, "time").value, 42)
+		self.assertEqual(MeasurementInt(experiment_dir, "mispredictions").value, 3)
+		with self.assertRaises(Exception):
+			MeasurementInt(experiment_dir, "cycles")
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import json
+import os
+
+from typing import Dict, List, Optional, Set, Tuple
+
+# name of the campaign metadata file, stored next to gts.txt
+CAMPAIGN_METADATA_FILENAME: str = "campaign.json"
+
+class CampaignMetadata:
+	"""
+	Metadata of a testcase campaign that is needed by the analyzer, but
+	cannot be recovered from the measurements: the registers that hold
+	fuzzed addresses and the range of address bits that was fuzzed for
+	each of them.
+
+	Registers are allocated per experiment, so in a GTS that combines
+	different fuzzing operators, the same register may be fuzzed with
+	different bit ranges in different experiments. These registers cannot
+	be analyzed and are recorded as conflicting instead.
+	"""
+	def __init__(
+		self, fuzzed_bits: Optional[Dict[str, Tuple[int, int]]] = None,
+		conflicting_registers: Optional[Set[str]] = None
+	) -> None:
+		# register name -> range of fuzzed bits (lower bound incl., upper
+		# bound excl.)
+		self.fuzzed_bits: Dict[str, Tuple[int, int]] = dict() if fuzzed_bits is None else fuzzed_bits
+		self.conflicting_registers: Set[str] = set() if conflicting_registers is None else conflicting_registers
+
+	def add_experiment(self, fuzzed_bits: Dict[str, Tuple[int, int]]) -> None:
+		"""
+		Adds the fuzzed registers of one experiment to the campaign
+		metadata.
+
+		:param      fuzzed_bits:  Mapping register name -> range of fuzzed
+		                          bits, see
+		                          CodeGenerator.generate_fuzzed_bits
+		:type       fuzzed_bits:  Dict[str, Tuple[int, int]]
+
+		:returns:   -
+		:rtype:     None
+		"""
+		for register, fuzzed_bits_idx in fuzzed_bits.items():
+			if register in self.conflicting_registers:
+				continue
+			if register in self.fuzzed_bits and self.fuzzed_bits[register] != tuple(fuzzed_bits_idx):
+				del self.fuzzed_bits[register]
+				self.conflicting_registers.add(register)
+				continue
+			self.fuzzed_bits[register] = (fuzzed_bits_idx[0], fuzzed_bits_idx[1])
+
+	def registers_by_fuzzed_bits(self) -> Dict[Tuple[int, int], List[str]]:
+		"""
+		Groups the fuzzed registers by their range of fuzzed bits. Only
+		registers with the same range can be analyzed together.
+
+		:returns:   Mapping range of fuzzed bits -> registers (in order of
+		            allocation)
+		:rtype:     Dict[Tuple[int, int], List[str]]
+		"""
+		groups: Dict[Tuple[int, int], List[str]] = dict()
+		for register, fuzzed_bits_idx in self.fuzzed_bits.items():
+			groups.setdefault(fuzzed_bits_idx, []).append(register)
+		return groups
+
+	def to_json(self) -> str:
+		return json.dumps({
+			"fuzzed_bits": {register: list(fuzzed_bits_idx) for register, fuzzed_bits_idx in self.fuzzed_bits.items()},
+			"conflicting_registers": sorted(self.conflicting_registers)
+		}, indent=2)
+
+	@staticmethod
+	def from_json(json_str: str) -> CampaignMetadata:
+		state: Dict = json.loads(json_str)
+		return CampaignMetadata(
+			{
+				register: (fuzzed_bits_idx[0], fuzzed_bits_idx[1])
+				for register, fuzzed_bits_idx in state.get("fuzzed_bits", dict()).items()
+			},
+			set(state.get("conflicting_registers", []))
+		)
+
+def write_campaign_metadata(outdir: str, metadata: CampaignMetadata) -> None:
+	with open(os.path.join(outdir, CAMPAIGN_METADATA_FILENAME), "w") as metadata_file:
+		metadata_file.write(metadata.to_json())
+
+def read_campaign_metadata(outdir: str) -> Optional[CampaignMetadata]:
+	"""
+	Reads the campaign metadata from an output directory of the testcase
+	instantiator.
+
+	:param      outdir:  The output directory
+	:type       outdir:  str
+
+	:returns:   The campaign metadata, or None if the campaign was
+	            generated without metadata (by an older version)
+	:rtype:     Optional[CampaignMetadata]
+	"""
+	path: str = os.path.join(outdir, CAMPAIGN_METADATA_FILENAME)
+	if not os.path.isfile(path):
+		return None
+	with open(path) as metadata_file:
+		return CampaignMetadata.from_json(metadata_file.read())
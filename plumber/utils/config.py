@@ -1,6 +1,6 @@
 from configparser import ConfigParser
 
-from typing import Optional
+from typing import Optional, List
 
 class Config:
 
@@ -8,6 +8,9 @@ class Config:
 		self.config: ConfigParser = ConfigParser()
 		self.config.read(path)
 
+	def sections(self) -> List[str]:
+		return self.config.sections()
+
 	def get_str(self, section: str, option: str) -> Optional[str]:
 		return self.config.get(section=section, option=option, fallback=None)
 
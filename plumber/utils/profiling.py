@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import atexit
+import json
+import time
+
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+class PhaseStatistics:
+	"""
+	Accumulated durations of all runs of one phase. The total includes the
+	time spent in nested phases, the exclusive time does not.
+	"""
+	def __init__(self) -> None:
+		self.count: int = 0
+		self.total: float = 0.0
+		self.exclusive: float = 0.0
+		self.max: float = 0.0
+
+	def add(self, duration: float, exclusive: float) -> None:
+		self.count += 1
+		self.total += duration
+		self.exclusive += exclusive
+		self.max = max(self.max, duration)
+
+	def to_dict(self) -> Dict[str, Any]:
+		return {"count": self.count, "total": self.total, "exclusive": self.exclusive, "max": self.max}
+
+class Profiler:
+	"""
+	Lightweight instrumentation of a campaign: context-manager timers for
+	phases (parsing, code generation, executor runs, classification, ...)
+	and counters. Phases may be attributed to an experiment, such that the
+	report contains the time spent per phase and per experiment.
+
+	The profiler is disabled by default; then, phases and counters are
+	not recorded and cost next to nothing.
+	"""
+	def __init__(self) -> None:
+		self.enabled: bool = False
+		self.start_time: float = time.perf_counter()
+		# phase name -> statistics
+		self.phases: Dict[str, PhaseStatistics] = dict()
+		# experiment name -> phase name -> total duration
+		self.experiments: Dict[str, Dict[str, float]] = dict()
+		# counter name -> value
+		self.counters: Dict[str, int] = dict()
+		# time spent in nested phases, per currently running phase
+		self.nested: List[float] = []
+
+	def enable(self) -> None:
+		self.enabled = True
+		self.start_time = time.perf_counter()
+
+	def reset(self) -> None:
+		"""
+		Discards all recorded phases and counters.
+		"""
+		self.start_time = time.perf_counter()
+		self.phases = dict()
+		self.experiments = dict()
+		self.counters = dict()
+		self.nested = []
+
+	@contextmanager
+	def phase(self, name: str, experiment: Optional[str] = None) -> Iterator[None]:
+		"""
+		Measures the duration of the enclosed block as one run of a phase.
+		Phases may be nested; the duration of a nested phase is excluded
+		from the exclusive time of the enclosing phase.
+
+		:param      name:        The phase name
+		:type       name:        str
+		:param      experiment:  The experiment the phase belongs to, if any
+		:type       experiment:  Optional[str]
+		"""
+		if not self.enabled:
+			yield
+			return
+		start: float = time.perf_counter()
+		self.nested.append(0.0)
+		try:
+			yield
+		finally:
+			duration: float = time.perf_counter() - start
+			nested: float = self.nested.pop()
+			if len(self.nested) > 0:
+				self.nested[-1] += duration
+			if name not in self.phases:
+				self.phases[name] = PhaseStatistics()
+			self.phases[name].add(duration, duration - nested)
+			if experiment is not None:
+				experiment_phases: Dict[str, float] = self.experiments.setdefault(experiment, dict())
+				experiment_phases[name] = experiment_phases.get(name, 0.0) + duration
+
+	def count(self, name: str, n: int = 1) -> None:
+		if self.enabled:
+			self.counters[name] = self.counters.get(name, 0) + n
+
+	def report(self) -> Dict[str, Any]:
+		return {
+			"wall_time": time.perf_counter() - self.start_time,
+			"phases": {name: statistics.to_dict() for name, statistics in self.phases.items()},
+			"experiments": self.experiments,
+			"counters": self.counters,
+		}
+
+	def summary(self) -> str:
+		"""
+		Returns a table of all phases (number of runs, total, exclusive,
+		mean and maximum duration, share of the wall time) and the counters.
+		The share is based on the exclusive time, such that nested phases
+		are not counted twice.
+
+		:returns:   The summary table
+		:rtype:     str
+		"""
+		wall_time: float = time.perf_counter() - self.start_time
+		name_width: int = max([len("phase")] + [len(name) for name in self.phases.keys()])
+		lines: List[str] = [
+			f"{'phase':<{name_width}}  {'count':>8}  {'total [s]':>10}  {'self [s]':>10}  {'mean [ms]':>10}  {'max [ms]':>10}  {'share':>6}"
+		]
+		for name, statistics in sorted(self.phases.items(), key=lambda item: item[1].total, reverse=True):
+			lines.append(
+				f"{name:<{name_width}}  {statistics.count:>8}  {statistics.total:>10.3f}  {statistics.exclusive:>10.3f}" + \
+				f"  {1000 * statistics.total / statistics.count:>10.3f}  {1000 * statistics.max:>10.3f}" + \
+				f"  {100 * statistics.exclusive / wall_time if wall_time > 0 else 0.0:>5.1f}%"
+			)
+		lines.append(f"wall time: {wall_time:.3f} s")
+		for name, value in self.counters.items():
+			lines.append(f"{name}: {value}")
+		return "\n".join(lines)
+
+	def write_report(self, path: str) -> None:
+		with open(path, "w") as report_file:
+			report_file.write(json.dumps(self.report(), indent=4))
+
+	def write_report_at_exit(self, path: str) -> None:
+		"""
+		Writes the report to the given json file and prints the summary
+		table when the process exits, also if it exits early or due to an
+		error.
+
+		:param      path:  Path of the report file
+		:type       path:  str
+		"""
+		def write() -> None:
+			print("===== Profile =====")
+			print(self.summary())
+			self.write_report(path)
+		atexit.register(write)
+
+# profiler of the running process, shared by all modules
+profiler: Profiler = Profiler()